@@ -1,16 +1,12 @@
-import csv
-
 from django.contrib import messages
 from django.contrib.admin import helpers
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.mixins import PermissionRequiredMixin
 from django.http import HttpResponse
 from django.shortcuts import get_object_or_404, redirect
-from django.utils import timezone
 from django.utils.decorators import method_decorator
 from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as _
-from django.utils.translation import pgettext_lazy
 from django.views import View
 from django.views.generic import DetailView, FormView
 
@@ -22,6 +18,7 @@ from events.exceptions import RegistrationError
 from events.forms import FieldsForm
 from events.models import Event, EventRegistration
 from payments.models import Payment
+from utils.exports import streaming_csv_response
 
 
 @method_decorator(staff_member_required, name="dispatch")
@@ -138,94 +135,10 @@ class EventRegistrationsExport(View, PermissionRequiredMixin):
         :return: A CSV containing all registrations for the event
         """
         event = get_object_or_404(Event, pk=pk)
-        extra_fields = event.registrationinformationfield_set.all()
-        registrations = event.eventregistration_set.all()
-
-        header_fields = (
-            [
-                _("Name"),
-                _("Email"),
-                _("Paid"),
-                _("Present"),
-                _("Status"),
-                _("Phone number"),
-            ]
-            + [field.name for field in extra_fields]
-            + [_("Date"), _("Date cancelled")]
-        )
-
-        rows = []
-        if event.price == 0:
-            header_fields.remove(_("Paid"))
-        for registration in registrations:
-            if registration.member:
-                name = registration.member.get_full_name()
-            else:
-                name = registration.name
-            status = pgettext_lazy("registration status", "registered").capitalize()
-            cancelled = None
-            if registration.date_cancelled:
-                if registration.is_late_cancellation():
-                    status = pgettext_lazy(
-                        "registration status", "late cancellation"
-                    ).capitalize()
-                else:
-                    status = pgettext_lazy(
-                        "registration status", "cancelled"
-                    ).capitalize()
-                cancelled = timezone.localtime(registration.date_cancelled)
-
-            elif registration.queue_position:
-                status = pgettext_lazy("registration status", "waiting")
-            data = {
-                _("Name"): name,
-                _("Date"): timezone.localtime(registration.date),
-                _("Present"): _("Yes") if registration.present else "",
-                _("Phone number"): (
-                    registration.phone_number if registration.phone_number else ""
-                ),
-                _("Email"): (registration.email if registration.email else ""),
-                _("Status"): status,
-                _("Date cancelled"): cancelled,
-            }
-            if event.price > 0:
-                if registration.is_paid():
-                    data[_("Paid")] = registration.payment.get_type_display()
-                else:
-                    data[_("Paid")] = _("No")
-
-            data.update(
-                {
-                    field["field"].name: field["value"]
-                    for field in registration.information_fields
-                }
-            )
-            rows.append(data)
-
-        response = HttpResponse(content_type="text/csv")
-        writer = csv.DictWriter(response, header_fields)
-        writer.writeheader()
-
-        rows = sorted(
-            rows,
-            key=lambda row: (
-                row[_("Status")]
-                == pgettext_lazy(
-                    "registration status", "late cancellation"
-                ).capitalize(),
-                row[_("Date")],
-            ),
-            reverse=True,
+        return streaming_csv_response(
+            f"{slugify(event.title)}.csv", *services.export_registrations(event)
         )
 
-        for row in rows:
-            writer.writerow(row)
-
-        response["Content-Disposition"] = (
-            f'attachment; filename="{slugify(event.title)}.csv"'
-        )
-        return response
-
 
 @method_decorator(staff_member_required, name="dispatch")
 @method_decorator(organiser_only, name="dispatch")
@@ -74,11 +74,11 @@ class EventRegistrationQueuedFilter(filters.BaseFilterBackend):
 
         try:
             if strtobool(queued):
-                return queryset.exclude(queue_position=None)
+                return queryset.filter(date_cancelled=None, is_invited=False)
         except ValueError as e:
             raise ValidationError({"queued": "Invalid filter value."}) from e
 
-        return queryset.filter(queue_position=None)
+        return queryset.exclude(date_cancelled=None, is_invited=False)
 
     def get_schema_operation_parameters(self, view):
         return [
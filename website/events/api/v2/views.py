@@ -1,4 +1,4 @@
-from django.db.models import Prefetch, Q
+from django.db.models import Prefetch
 from django.utils import timezone
 
 from oauth2_provider.contrib.rest_framework import IsAuthenticatedOrTokenHasScope
@@ -22,7 +22,7 @@ from events.api.v2.serializers.external_event import ExternalEventSerializer
 from events.exceptions import RegistrationError
 from events.models import Event, EventRegistration, ExternalEvent
 from events.services import is_user_registered
-from members.models import Membership
+from members.models.member import current_membership_prefetch
 from thaliawebsite.api.v2.permissions import IsAuthenticatedOrTokenHasScopeForMethod
 from thaliawebsite.api.v2.serializers import EmptySerializer
 from utils.media.services import fetch_thumbnails
@@ -121,18 +121,11 @@ class EventRegistrationsView(ListAPIView):
 
     def get_queryset(self):
         if self.event:
-            today = timezone.now().date()
             return (
                 EventRegistration.objects.filter(event=self.event, date_cancelled=None)
                 .select_related("member__profile")
                 .prefetch_related(
-                    Prefetch(
-                        "member__membership_set",
-                        queryset=Membership.objects.filter(
-                            Q(until__isnull=True) | Q(until__gt=today), since__lte=today
-                        ).order_by("-since")[:1],
-                        to_attr="_current_membership",
-                    ),
+                    current_membership_prefetch("member__membership_set"),
                 )[: self.event.max_participants]
             )
         return EventRegistration.objects.none()
@@ -0,0 +1,154 @@
+from datetime import timedelta
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, When
+from django.db.models.functions import Greatest, NullIf
+from django.utils import timezone
+
+from events.models import Event, EventRegistration
+
+# The self-joining annotation that was used for the queue position before.
+SELF_JOIN_QUEUE_POSITION = Case(
+    When(
+        date_cancelled=None,
+        then=NullIf(
+            Greatest(
+                Count(
+                    "event__eventregistration",
+                    filter=Q(event__eventregistration__date_cancelled=None)
+                    & (
+                        Q(event__eventregistration__date__lt=F("date"))
+                        | Q(event__eventregistration__id__lte=F("id"))
+                        & Q(event__eventregistration__date__exact=F("date"))
+                    ),
+                )
+                - F("event__max_participants"),
+                0,
+            ),
+            0,
+        ),
+    ),
+    default=None,
+)
+
+# The annotation that counted the earlier registrations of each registration
+# in a correlated subquery, before the queue position used a window.
+COUNT_QUEUE_POSITION = Case(
+    When(
+        date_cancelled=None,
+        then=NullIf(
+            Greatest(
+                Subquery(
+                    EventRegistration.objects.filter(
+                        Q(date__lt=OuterRef("date"))
+                        | Q(date=OuterRef("date"), pk__lte=OuterRef("pk")),
+                        event=OuterRef("event"),
+                        date_cancelled=None,
+                    )
+                    .order_by()
+                    .values("event")
+                    .annotate(count=Count("*"))
+                    .values("count")
+                )
+                - F("event__max_participants"),
+                0,
+            ),
+            0,
+        ),
+    ),
+    default=None,
+)
+
+
+class Command(BaseCommand):
+    """Compare ways to determine queue positions on large synthetic events.
+
+    The synthetic events are created in a transaction that is rolled back
+    afterwards, so this can safely be run against a real database.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--events",
+            type=int,
+            default=5,
+            help="Number of synthetic events to create",
+        )
+        parser.add_argument(
+            "--registrations",
+            type=int,
+            default=600,
+            help="Number of registrations per event",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            events = self._create_events(options["events"], options["registrations"])
+            registrations = EventRegistration.objects.filter(event__in=events)
+
+            self._time(
+                "self-join annotation",
+                lambda: registrations.annotate(
+                    position=SELF_JOIN_QUEUE_POSITION
+                ).values_list("pk", "position"),
+            )
+            self._time(
+                "counting subquery annotation",
+                lambda: registrations.annotate(
+                    position=COUNT_QUEUE_POSITION
+                ).values_list("pk", "position"),
+            )
+            self._time(
+                "queue_position annotation",
+                lambda: registrations.select_properties("queue_position").values_list(
+                    "pk", "queue_position"
+                ),
+            )
+            self._time(
+                "self-join invited filter",
+                lambda: registrations.annotate(position=SELF_JOIN_QUEUE_POSITION)
+                .filter(date_cancelled=None, position=None)
+                .values_list("pk"),
+            )
+            self._time(
+                "is_invited window filter",
+                lambda: registrations.filter(is_invited=True).values_list("pk"),
+            )
+
+            transaction.set_rollback(True)
+
+    def _create_events(self, num_events, num_registrations):
+        now = timezone.now()
+        events = Event.objects.bulk_create(
+            Event(
+                title=f"Queue position benchmark {i}",
+                start=now,
+                end=now + timedelta(hours=1),
+                registration_start=now - timedelta(days=1),
+                registration_end=now,
+                cancel_deadline=now,
+                location="Benchmark",
+                price=0,
+                fine=0,
+                max_participants=num_registrations // 2,
+            )
+            for i in range(num_events)
+        )
+        EventRegistration.objects.bulk_create(
+            EventRegistration(
+                event=event,
+                name=f"Registration {i}",
+                date=now + timedelta(seconds=i // 2),
+                date_cancelled=now if i % 10 == 0 else None,
+            )
+            for event in events
+            for i in range(num_registrations)
+        )
+        return events
+
+    def _time(self, name, query):
+        start = perf_counter()
+        rows = len(query())
+        self.stdout.write(f"{name}: {rows} rows in {perf_counter() - start:.3f}s")
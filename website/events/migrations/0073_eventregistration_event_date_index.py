@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0072_remove_event_shift'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='eventregistration',
+            index=models.Index(fields=['event', 'date'], name='events_even_event_i_5a6a51_idx'),
+        ),
+    ]
@@ -283,14 +283,14 @@ class Event(models.Model):
     def participants(self):
         """Return the active participants."""
         if self.max_participants is not None:
-            return self.registrations.order_by("date")[: self.max_participants]
-        return self.registrations.order_by("date")
+            return self.registrations.order_by("date", "pk")[: self.max_participants]
+        return self.registrations.order_by("date", "pk")
 
     @property
     def queue(self):
         """Return the waiting queue."""
         if self.max_participants is not None:
-            return self.registrations.order_by("date")[self.max_participants :]
+            return self.registrations.order_by("date", "pk")[self.max_participants :]
         return []
 
     @property
@@ -1,15 +1,16 @@
 from django.core import validators
 from django.core.exceptions import ValidationError
 from django.db import models
-from django.db.models import Case, Count, F, Q, When
-from django.db.models.functions import Coalesce, Greatest, NullIf
+from django.db.models import Case, F, Q, Subquery, When, Window
+from django.db.models.functions import Coalesce, Greatest, NullIf, RowNumber
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from queryable_properties.managers import QueryablePropertiesManager
-from queryable_properties.properties import AnnotationProperty, queryable_property
+from queryable_properties.properties import queryable_property
 
 from payments.models import PaymentAmountField
+from payments.payables import PayableSnapshotMixin
 
 from .event import Event
 
@@ -21,7 +22,45 @@ def registration_member_choices_limit():
     )
 
 
-class EventRegistration(models.Model):
+class _RegistrationNumber(Subquery):
+    """Look up the number of a registration in a numbered queryset.
+
+    When the numbered queryset is filtered on the outer registration, Django
+    puts that filter inside the window, so the database numbers the rows again
+    for each registration. This only looks up the registration outside of the
+    window instead, so the numbering does not depend on the outer query and is
+    computed once.
+    """
+
+    def __init__(self, numbered, registration):
+        super().__init__(
+            numbered.order_by()
+            .annotate(registration=F("pk"))
+            .values("registration", "number"),
+            output_field=models.IntegerField(),
+        )
+        self.registration = registration
+
+    def get_source_expressions(self):
+        return [self.query, self.registration]
+
+    def set_source_expressions(self, exprs):
+        self.query, self.registration = exprs
+
+    def as_sql(self, compiler, connection, template=None, **extra_context):
+        numbered_sql, numbered_params = super().as_sql(compiler, connection)
+        registration_sql, registration_params = compiler.compile(self.registration)
+        alias = connection.ops.quote_name("numbered")
+        number = connection.ops.quote_name("number")
+        registration = connection.ops.quote_name("registration")
+        return (
+            f"(SELECT {alias}.{number} FROM {numbered_sql} {alias} "
+            f"WHERE {alias}.{registration} = {registration_sql})",
+            (*numbered_params, *registration_params),
+        )
+
+
+class EventRegistration(PayableSnapshotMixin, models.Model):
     """Describes a registration for an Event."""
 
     objects = QueryablePropertiesManager()
@@ -113,38 +152,55 @@ class EventRegistration(models.Model):
     def is_registered(self):
         return self.date_cancelled is None
 
-    queue_position = AnnotationProperty(
-        Case(
-            # Get queue position by counting amount of registrations with lower date and in case of same date lower id
-            # Subsequently cast to None if this is 0 or lower, in which case it isn't in the queue
-            # If the current registration is cancelled, also force it to None.
+    @classmethod
+    def _numbered_registrations(cls):
+        # Number the active registrations of each event by date (and in case
+        # of the same date by id) with a single window over all registrations,
+        # which is a lot cheaper than determining the position of each
+        # registration separately. The window does not depend on the outer
+        # query, so it is computed once, and it still numbers all registrations
+        # of an event when the outer query only selects some of them.
+        return cls.objects.filter(date_cancelled=None).annotate(
+            number=Window(
+                RowNumber(),
+                partition_by=F("event"),
+                order_by=(F("date").asc(), F("pk").asc()),
+            )
+        )
+
+    @queryable_property(annotation_based=True)
+    @classmethod
+    def queue_position(cls):
+        # The row number of the registration in its event, minus the number of
+        # participants. Subsequently cast to None if this is 0 or lower, in
+        # which case it isn't in the queue. If the registration is cancelled,
+        # also force it to None.
+        position = _RegistrationNumber(cls._numbered_registrations(), F("pk"))
+        return Case(
             When(
                 date_cancelled=None,
                 then=NullIf(
-                    Greatest(
-                        Count(
-                            "event__eventregistration",
-                            filter=Q(event__eventregistration__date_cancelled=None)
-                            & (
-                                Q(event__eventregistration__date__lt=F("date"))
-                                | Q(event__eventregistration__id__lte=F("id"))
-                                & Q(event__eventregistration__date__exact=F("date"))
-                            ),
-                        )
-                        - F("event__max_participants"),
-                        0,
-                    ),
+                    Greatest(position - F("event__max_participants"), 0),
                     0,
                 ),
             ),
             default=None,
         )
-    )
 
-    @property
+    @queryable_property
     def is_invited(self):
         return self.is_registered and not self.queue_position
 
+    @is_invited.filter(boolean=True)
+    @classmethod
+    def is_invited(cls):
+        queued = (
+            cls._numbered_registrations()
+            .filter(number__gt=F("event__max_participants"))
+            .values("pk")
+        )
+        return Q(date_cancelled=None) & ~Q(pk__in=queued)
+
     def is_external(self):
         return bool(self.name)
 
@@ -242,3 +298,4 @@ class EventRegistration(models.Model):
         verbose_name_plural = _("Registrations")
         ordering = ("date",)
         unique_together = (("member", "event"),)
+        indexes = [models.Index(fields=["event", "date"])]
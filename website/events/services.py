@@ -1,20 +1,36 @@
 from collections import OrderedDict
 from datetime import date, timedelta
 
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import (
+    BooleanField,
+    Case,
+    Count,
+    F,
+    OuterRef,
+    Q,
+    Subquery,
+    Value,
+    When,
+)
 from django.utils import timezone
 from django.utils.formats import localize
 from django.utils.translation import gettext_lazy as _
+from django.utils.translation import pgettext_lazy
 
 from events import emails, signals
 from events.exceptions import RegistrationError
 from events.models import (
+    BooleanRegistrationInformation,
     Event,
     EventRegistration,
+    IntegerRegistrationInformation,
     RegistrationInformationField,
+    TextRegistrationInformation,
     categories,
     status,
 )
+from utils.exports import EXPORT_CHUNK_SIZE
 from utils.snippets import datetime_to_lectureyear
 
 
@@ -284,20 +300,34 @@ def is_organiser(member, event):
 def create_registration(member, event):
     """Create a new user registration for an event.
 
+    The event is locked while registering, so concurrent registrations for the
+    same event are handled one at a time in the order in which they arrive.
+    Hence, the order of the registration dates, which determine the queue
+    positions, is the order in which the registrations were accepted.
+
     :param member: the user
     :param event: the event
-    :return: Return the registration if successful
+    :return: Return the registration if successful, with its queue position selected
     """
-    if event_permissions(member, event)["create_registration"]:
+    with transaction.atomic():
+        event = Event.objects.select_for_update().get(pk=event.pk)
+
         registration = None
-        try:
-            registration = EventRegistration.objects.get(event=event, member=member)
-        except EventRegistration.DoesNotExist:
-            pass
+        if member.is_authenticated:
+            registration = EventRegistration.objects.filter(
+                event=event, member=member
+            ).first()
+        event.member_registration = [registration] if registration else []
+        permissions = event_permissions(member, event, registration_prefetch=True)
+
+        if not permissions["create_registration"]:
+            if permissions["cancel_registration"]:
+                raise RegistrationError(_("You were already registered."))
+            raise RegistrationError(_("You may not register."))
 
         if registration is None:
-            return EventRegistration.objects.create(event=event, member=member)
-        if registration.date_cancelled is not None:
+            registration = EventRegistration.objects.create(event=event, member=member)
+        elif registration.date_cancelled is not None:
             if registration.is_late_cancellation():
                 raise RegistrationError(
                     _(
@@ -310,10 +340,11 @@ def create_registration(member, event):
             registration.date_cancelled = None
             registration.save()
 
-        return registration
-    if event_permissions(member, event)["cancel_registration"]:
-        raise RegistrationError(_("You were already registered."))
-    raise RegistrationError(_("You may not register."))
+        return (
+            EventRegistration.objects.select_properties("queue_position")
+            .select_related("event", "member")
+            .get(pk=registration.pk)
+        )
 
 
 def cancel_registration(member, event):
@@ -514,3 +545,119 @@ def is_eventdocument_owner(member, event_doc):
             return member.get_member_groups().filter(pk=event_doc.owner.pk).exists()
 
     return False
+
+
+def _annotate_late_cancellation(registrations, event: Event):
+    """Annotate whether registrations are late cancellations.
+
+    This is the same as `EventRegistration.is_late_cancellation`,
+    for all registrations of an event in a single query.
+    """
+    if event.cancel_deadline is None:
+        return registrations.annotate(late_cancellation=Value(False))
+
+    condition = Q(date_cancelled__gt=event.cancel_deadline)
+    if event.max_participants is not None:
+        # Only if the registration was not in the queue when it was cancelled.
+        registrations = registrations.annotate(
+            places_taken=Subquery(
+                EventRegistration.objects.filter(
+                    Q(date_cancelled__gte=OuterRef("date_cancelled"))
+                    | Q(date_cancelled=None),
+                    event=OuterRef("event"),
+                    date__lte=OuterRef("date"),
+                )
+                .order_by()
+                .values("event")
+                .annotate(count=Count("*"))
+                .values("count")
+            )
+        )
+        condition &= Q(places_taken__lt=event.max_participants)
+
+    # A comparison with the cancellation date of a registration that was not
+    # cancelled is NULL, so the condition is wrapped to make that False.
+    return registrations.annotate(
+        late_cancellation=Case(
+            When(condition, then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField(),
+        )
+    )
+
+
+def export_registrations(event: Event):
+    """Return the headers and an iterator of the rows of a CSV export of registrations.
+
+    The late cancellations come first, and then the other registrations,
+    both from new to old. The values of the information fields are annotated,
+    so the registrations are exported with a single query.
+    """
+    fields = list(event.registrationinformationfield_set.all())
+    value_models = {
+        RegistrationInformationField.TEXT_FIELD: TextRegistrationInformation,
+        RegistrationInformationField.BOOLEAN_FIELD: BooleanRegistrationInformation,
+        RegistrationInformationField.INTEGER_FIELD: IntegerRegistrationInformation,
+    }
+
+    registrations = (
+        event.eventregistration_set.select_properties("queue_position")
+        .select_related("member", "member__profile", "payment")
+        .annotate(
+            **{
+                f"field_{field.pk}": Subquery(
+                    value_models[field.type]
+                    .objects.filter(registration=OuterRef("pk"), field=field)
+                    .values("value")[:1]
+                )
+                for field in fields
+            }
+        )
+    )
+    registrations = _annotate_late_cancellation(registrations, event).order_by(
+        F("late_cancellation").desc(), "-date", "pk"
+    )
+
+    headers = [_("Name"), _("Email")]
+    if event.price > 0:
+        headers.append(_("Paid"))
+    headers += [_("Present"), _("Status"), _("Phone number")]
+    headers += [field.name for field in fields]
+    headers += [_("Date"), _("Date cancelled")]
+
+    def row(registration):
+        status = pgettext_lazy("registration status", "registered").capitalize()
+        cancelled = None
+        if registration.date_cancelled:
+            if registration.late_cancellation:
+                status = pgettext_lazy(
+                    "registration status", "late cancellation"
+                ).capitalize()
+            else:
+                status = pgettext_lazy("registration status", "cancelled").capitalize()
+            cancelled = timezone.localtime(registration.date_cancelled)
+        elif registration.queue_position:
+            status = pgettext_lazy("registration status", "waiting")
+
+        values = [
+            registration.member.get_full_name()
+            if registration.member
+            else registration.name,
+            registration.email or "",
+        ]
+        if event.price > 0:
+            values.append(
+                registration.payment.get_type_display()
+                if registration.payment
+                else _("No")
+            )
+        values += [
+            _("Yes") if registration.present else "",
+            status,
+            registration.phone_number or "",
+        ]
+        values += [getattr(registration, f"field_{field.pk}") for field in fields]
+        values += [timezone.localtime(registration.date), cancelled]
+        return values
+
+    return headers, map(row, registrations.iterator(chunk_size=EXPORT_CHUNK_SIZE))
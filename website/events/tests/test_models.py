@@ -1,7 +1,10 @@
 import datetime
+import re
 
 from django.core.exceptions import ValidationError
+from django.db import connection
 from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
 from activemembers.models import Committee
@@ -311,3 +314,98 @@ class RegistrationTest(TestCase):
         # Test situation where the event status is REGISTRATION_OPEN_NO_CANCEL
         self.assertTrue(self.r1.event.registration_allowed)
         self.assertTrue(self.r1.would_cancel_after_deadline())
+
+    def test_queue_positions_agree(self):
+        self.event.max_participants = 4
+        self.event.save()
+        date = timezone.now()
+        EventRegistration.objects.bulk_create(
+            EventRegistration(
+                event=self.event,
+                name=f"test {i}",
+                # Some registrations have the same date, then the id decides.
+                date=date + datetime.timedelta(seconds=i // 3),
+                date_cancelled=date if i % 4 == 0 else None,
+            )
+            for i in range(20)
+        )
+        registrations = EventRegistration.objects.filter(event=self.event)
+
+        with self.assertNumQueries(1):
+            annotated = {
+                r.pk: r.queue_position
+                for r in registrations.select_properties("queue_position")
+            }
+        self.assertEqual(
+            annotated, {r.pk: r.queue_position for r in registrations.all()}
+        )
+        self.assertEqual(
+            [annotated[r.pk] for r in self.event.queue],
+            list(range(1, len(self.event.queue) + 1)),
+        )
+        self.assertQuerySetEqual(
+            registrations.filter(is_invited=True),
+            self.event.participants,
+            ordered=False,
+        )
+        self.assertEqual(
+            set(registrations.filter(is_invited=False).values_list("pk", flat=True)),
+            {pk for pk, position in annotated.items() if position}
+            | set(
+                registrations.exclude(date_cancelled=None).values_list("pk", flat=True)
+            ),
+        )
+
+    def test_is_invited_per_event(self):
+        self.event.max_participants = 1
+        self.event.save()
+        other_event = Event.objects.create(
+            title="other event",
+            description="desc",
+            start=timezone.now(),
+            end=(timezone.now() + datetime.timedelta(hours=1)),
+            location="test location",
+            map_location="test map location",
+            price=0.00,
+            fine=0.00,
+            max_participants=2,
+        )
+        # Registered before the registrations of the first event, which must
+        # not push those registrations further into the queue.
+        other = [
+            EventRegistration.objects.create(
+                event=other_event,
+                name=f"test {i}",
+                date=timezone.now() - datetime.timedelta(days=1),
+            )
+            for i in range(3)
+        ]
+
+        self.assertQuerySetEqual(
+            EventRegistration.objects.filter(is_invited=True),
+            [self.r1, other[0], other[1]],
+            ordered=False,
+        )
+
+    def test_queue_positions_number_registrations_once(self):
+        self.event.max_participants = 1
+        self.event.save()
+        registrations = EventRegistration.objects.filter(member=self.member2)
+
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(
+                registrations.select_properties("queue_position").get().queue_position,
+                1,
+            )
+            self.assertFalse(registrations.filter(is_invited=True).exists())
+
+        table = EventRegistration._meta.db_table
+        for query in context.captured_queries:
+            # The window that numbers the registrations does not refer to the
+            # outer registration, so the database only computes it once instead
+            # of for each registration.
+            self.assertIn("ROW_NUMBER()", query["sql"])
+            self.assertIsNone(
+                re.search(rf'U\d+\."\w+" = \(?"{table}"', query["sql"]),
+                query["sql"],
+            )
@@ -1,9 +1,17 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from time import perf_counter
 from unittest import mock
 
 from django.contrib.auth.models import AnonymousUser, Permission
+from django.db import connection
 from django.http import HttpRequest
-from django.test import TestCase, override_settings
+from django.test import (
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+    skipUnlessDBFeature,
+)
 from django.utils import timezone
 
 from freezegun import freeze_time
@@ -12,7 +20,7 @@ from activemembers.models import Committee, MemberGroupMembership
 from events import services
 from events.exceptions import RegistrationError
 from events.models import Event, EventRegistration, RegistrationInformationField
-from members.models import Member
+from members.models import Member, Membership, Profile
 
 
 @freeze_time("2017-01-01")
@@ -537,3 +545,181 @@ class ServicesTest(TestCase):
             # Test that the ordering is correct
             labels = [field["label"] for field in fields.values()]
             self.assertEqual(labels, sorted(labels))
+
+
+@freeze_time("2017-01-01")
+@override_settings(SUSPEND_SIGNALS=True)
+class ExportRegistrationsTest(TestCase):
+    fixtures = ["members.json"]
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.event = Event.objects.create(
+            title="testevent",
+            description="desc",
+            published=True,
+            start=now + timedelta(days=1),
+            end=now + timedelta(days=1, hours=2),
+            registration_start=now - timedelta(days=4),
+            registration_end=now + timedelta(hours=1),
+            cancel_deadline=now - timedelta(days=1),
+            max_participants=2,
+            location="test location",
+            map_location="test map location",
+            price=5,
+            fine=5,
+        )
+        cls.member = Member.objects.filter(last_name="Wiggers").first()
+
+    def test_export_registrations(self):
+        now = timezone.now()
+        field = RegistrationInformationField.objects.create(
+            event=self.event,
+            type=RegistrationInformationField.TEXT_FIELD,
+            name="Diet",
+            required=False,
+        )
+
+        member = EventRegistration.objects.create(
+            event=self.event, member=self.member, date=now - timedelta(days=2)
+        )
+        field.set_value_for(member, "vegan")
+        late = EventRegistration.objects.create(
+            event=self.event,
+            name="late",
+            date=now - timedelta(days=3),
+            date_cancelled=now - timedelta(hours=1),
+        )
+        cancelled = EventRegistration.objects.create(
+            event=self.event,
+            name="cancelled",
+            date=now - timedelta(days=2, hours=12),
+            date_cancelled=now - timedelta(days=1, hours=1),
+        )
+        EventRegistration.objects.create(
+            event=self.event, name="invited", date=now - timedelta(hours=3)
+        )
+        EventRegistration.objects.create(
+            event=self.event, name="queued", date=now - timedelta(hours=2)
+        )
+
+        headers, rows = services.export_registrations(self.event)
+        with self.assertNumQueries(1):
+            rows = list(rows)
+
+        self.assertEqual(
+            headers,
+            [
+                "Name",
+                "Email",
+                "Paid",
+                "Present",
+                "Status",
+                "Phone number",
+                "Diet",
+                "Date",
+                "Date cancelled",
+            ],
+        )
+        self.assertEqual(
+            [(row[0], row[4], row[6]) for row in rows],
+            [
+                ("late", "Late cancellation", None),
+                ("queued", "waiting", None),
+                ("invited", "Registered", None),
+                (self.member.get_full_name(), "Registered", "vegan"),
+                ("cancelled", "Cancelled", None),
+            ],
+        )
+        self.assertTrue(late.is_late_cancellation())
+        self.assertFalse(cancelled.is_late_cancellation())
+        self.assertEqual(rows[0][2], "No")
+        self.assertEqual(rows[0][8], timezone.localtime(late.date_cancelled))
+        self.assertEqual(rows[3][7], timezone.localtime(member.date))
+        # Registrations that were not cancelled are not late cancellations,
+        # rather than NULL, which PostgreSQL would sort first.
+        self.assertEqual(
+            dict(
+                services._annotate_late_cancellation(
+                    self.event.eventregistration_set.all(), self.event
+                ).values_list("pk", "late_cancellation")
+            ),
+            {
+                registration.pk: registration.pk == late.pk
+                for registration in self.event.eventregistration_set.all()
+            },
+        )
+
+
+@skipUnlessDBFeature("has_select_for_update")
+@override_settings(SUSPEND_SIGNALS=True)
+class ConcurrentRegistrationTest(TransactionTestCase):
+    """Fire many concurrent registrations at a popular event."""
+
+    num_members = 100
+    max_participants = 60
+
+    def setUp(self):
+        now = timezone.now()
+        self.event = Event.objects.create(
+            title="popular event",
+            description="desc",
+            published=True,
+            start=now + timedelta(days=1),
+            end=now + timedelta(days=1, hours=2),
+            registration_start=now - timedelta(hours=1),
+            registration_end=now + timedelta(hours=1),
+            cancel_deadline=now + timedelta(hours=1),
+            max_participants=self.max_participants,
+            location="test location",
+            map_location="test map location",
+            price=0.00,
+            fine=0.00,
+        )
+        self.members = Member.objects.bulk_create(
+            Member(username=f"member{i}") for i in range(self.num_members)
+        )
+        Profile.objects.bulk_create(Profile(user=member) for member in self.members)
+        Membership.objects.bulk_create(
+            Membership(user=member, type=Membership.MEMBER, since=now.date())
+            for member in self.members
+        )
+
+    def _register(self, member):
+        try:
+            member = Member.objects.get(pk=member.pk)
+            registration = services.create_registration(member, self.event)
+            return registration.date, registration.pk, registration.queue_position
+        finally:
+            connection.close()
+
+    def test_concurrent_registrations(self):
+        start = perf_counter()
+        with ThreadPoolExecutor(max_workers=20) as executor:
+            results = list(executor.map(self._register, self.members))
+        duration = perf_counter() - start
+
+        self.assertEqual(
+            EventRegistration.objects.filter(event=self.event).count(),
+            self.num_members,
+        )
+
+        # The queue positions returned to each registrant must match the order
+        # in which the registrations were accepted, and never change afterwards.
+        results.sort()
+        num_queued = self.num_members - self.max_participants
+        self.assertEqual(
+            [position for _, _, position in results],
+            [None] * self.max_participants + list(range(1, num_queued + 1)),
+        )
+        self.assertEqual(
+            [
+                (r.pk, r.queue_position)
+                for r in EventRegistration.objects.filter(event=self.event)
+                .select_properties("queue_position")
+                .order_by("date", "pk")
+            ],
+            [(pk, position) for _, pk, position in results],
+        )
+        self.assertGreater(self.num_members / duration, 10)
@@ -1,10 +1,15 @@
 from django.urls import path
 
-from .views import FaceEncodingPostView
+from .views import FaceEncodingBatchPostView, FaceEncodingPostView
 
 app_name = "facedetection"
 
 urlpatterns = [
+    path(
+        "encodings/batch/",
+        FaceEncodingBatchPostView.as_view(),
+        name="encoding-batch-callback",
+    ),
     path(
         "encodings/<str:type>/<int:pk>/",
         FaceEncodingPostView.as_view(),
@@ -8,12 +8,22 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from ...models import (
+    ENCODING_SIZE,
     BaseFaceEncodingSource,
     FaceDetectionPhoto,
-    PhotoFaceEncoding,
     ReferenceFace,
-    ReferenceFaceEncoding,
 )
+from ...services import save_encodings
+
+
+def _valid_encodings(encodings) -> bool:
+    """Check that `encodings` is a list of lists of 128 floats."""
+    return isinstance(encodings, list) and all(
+        isinstance(encoding, list)
+        and len(encoding) == ENCODING_SIZE
+        and all(isinstance(value, float) for value in encoding)
+        for encoding in encodings
+    )
 
 
 class FaceEncodingPostView(APIView):
@@ -46,38 +56,92 @@ class FaceEncodingPostView(APIView):
         except (json.JSONDecodeError, KeyError):
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
-        if not isinstance(token, str) or not isinstance(encodings, list):
+        if not isinstance(token, str) or not _valid_encodings(encodings):
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
-        for encoding in encodings:
-            if (
-                not isinstance(encoding, list)
-                or len(encoding) != 128
-                or not all(isinstance(value, float) for value in encoding)
-            ):
-                return Response(status=status.HTTP_400_BAD_REQUEST)
-
         if obj.token != token:
             raise PermissionDenied(detail="Invalid token.")
         if obj.status != BaseFaceEncodingSource.Status.PROCESSING:
             raise ValidationError(detail="This object is not processing.")
 
-        if isinstance(obj, ReferenceFace):
-            if len(encodings) == 1:
-                reference_encoding = ReferenceFaceEncoding(reference=obj)
-                reference_encoding.encoding = encodings[0]
-                reference_encoding.save()
-                obj.status = BaseFaceEncodingSource.Status.DONE
-                obj.save()
-            else:  # ReferenceFace needs exactly one encoding.
-                obj.status = BaseFaceEncodingSource.Status.REJECTED
-                obj.save()
-        elif isinstance(obj, FaceDetectionPhoto):
-            for encoding in encodings:
-                photo_face_encoding = PhotoFaceEncoding(photo=obj)
-                photo_face_encoding.encoding = encoding
-                photo_face_encoding.save()
-            obj.status = BaseFaceEncodingSource.Status.DONE
-            obj.save()
+        save_encodings([(obj, encodings)])
 
         return Response(status=status.HTTP_200_OK)
+
+
+class FaceEncodingBatchPostView(APIView):
+    def post(self, request, **kwargs):
+        """Submit encodings for a batch of face encoding sources at once.
+
+        Expects a json body as follows:
+
+        {
+            "sources": [
+                {
+                    "type": "photo" | "reference",
+                    "pk": int,
+                    "token": str,       # The token of this source.
+                    "encodings": [      # A list of 0 or more encodings.
+                        [ <128 floats> ],
+                        ...
+                    ],
+                },
+                ...
+            ],
+        }
+
+        Sources that do not exist, have an invalid token or are not processing
+        are skipped. The response contains the resulting status of each source,
+        which is one of "done", "rejected", "not_found", "invalid_token" or
+        "not_processing".
+        """
+        try:
+            sources = request.data["sources"]
+        except (json.JSONDecodeError, KeyError, TypeError):
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+
+        if not isinstance(sources, list) or not all(
+            isinstance(source, dict)
+            and source.get("type") in ("photo", "reference")
+            and isinstance(source.get("pk"), int)
+            and isinstance(source.get("token"), str)
+            and _valid_encodings(source.get("encodings"))
+            for source in sources
+        ):
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+
+        objects = {
+            "photo": FaceDetectionPhoto.objects.in_bulk(
+                [s["pk"] for s in sources if s["type"] == "photo"]
+            ),
+            "reference": ReferenceFace.objects.in_bulk(
+                [s["pk"] for s in sources if s["type"] == "reference"]
+            ),
+        }
+
+        results = []
+        statuses = []
+        for source in sources:
+            obj = objects[source["type"]].get(source["pk"])
+            if obj is None:
+                source_status = "not_found"
+            elif obj.token != source["token"]:
+                source_status = "invalid_token"
+            elif obj.status != BaseFaceEncodingSource.Status.PROCESSING:
+                source_status = "not_processing"
+            else:
+                results.append((obj, source["encodings"]))
+                if isinstance(obj, ReferenceFace) and len(source["encodings"]) != 1:
+                    source_status = BaseFaceEncodingSource.Status.REJECTED.value
+                else:
+                    source_status = BaseFaceEncodingSource.Status.DONE.value
+                # Don't process the same source twice if it is submitted twice.
+                obj.status = source_status
+            statuses.append(
+                {"type": source["type"], "pk": source["pk"], "status": source_status}
+            )
+
+        if results:
+            save_encodings(results)
+
+        return Response({"sources": statuses}, status=status.HTTP_200_OK)
@@ -0,0 +1,89 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+import numpy as np
+
+from facedetection.matching import NumpyMatchingEngine, SQLMatchingEngine
+from facedetection.models import (
+    ENCODING_SIZE,
+    FaceDetectionPhoto,
+    PhotoFaceEncoding,
+)
+from photos.models import Album, Photo
+
+
+class Command(BaseCommand):
+    """Compare the face encoding matching engines on synthetic encodings.
+
+    The synthetic encodings are created in a transaction that is rolled back
+    afterwards, so this can safely be run against a real database.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--photo-faces",
+            type=int,
+            default=20000,
+            help="Number of synthetic photo face encodings to match against",
+        )
+        parser.add_argument(
+            "--queries",
+            type=int,
+            default=10,
+            help="Number of reference encodings to match",
+        )
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        encodings = rng.normal(0, 0.1, (options["photo_faces"], ENCODING_SIZE))
+        # Queries are close to existing encodings, so that they actually have matches.
+        queries = encodings[: options["queries"]] + rng.normal(
+            0, 0.01, (options["queries"], ENCODING_SIZE)
+        )
+
+        with transaction.atomic():
+            self._create_encodings(encodings)
+
+            start = perf_counter()
+            sql_matches = SQLMatchingEngine().matching_photo_faces(queries)
+            self._report("sql", perf_counter() - start, len(queries))
+
+            engine = NumpyMatchingEngine()
+            start = perf_counter()
+            engine.photo_face_index.sync()
+            self.stdout.write(f"numpy: built index in {perf_counter() - start:.3f}s")
+
+            start = perf_counter()
+            numpy_matches = engine.matching_photo_faces(queries)
+            self._report("numpy", perf_counter() - start, len(queries))
+
+            if [sorted(m) for m in sql_matches] != [sorted(m) for m in numpy_matches]:
+                self.stderr.write("The engines returned different matches.")
+
+            transaction.set_rollback(True)
+
+    def _create_encodings(self, encodings):
+        album = Album.objects.create(
+            title="Face matching benchmark",
+            slug=f"facedetection-benchmark-{timezone.now():%Y%m%d%H%M%S}",
+            date=timezone.now().date(),
+        )
+        photo = Photo.objects.create(album=album, file="photos/benchmark.jpg")
+        source = FaceDetectionPhoto.objects.create(photo=photo)
+
+        for start in range(0, len(encodings), 1000):
+            batch = []
+            for encoding in encodings[start : start + 1000]:
+                photo_face_encoding = PhotoFaceEncoding(photo=source)
+                photo_face_encoding.encoding = encoding.tolist()
+                batch.append(photo_face_encoding)
+            PhotoFaceEncoding.objects.bulk_create(batch)
+
+    def _report(self, name, seconds, num_queries):
+        self.stdout.write(
+            f"{name}: matched {num_queries} encodings in {seconds:.3f}s "
+            f"({seconds / num_queries * 1000:.1f}ms per encoding)"
+        )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from facedetection.services import rebuild_matching_index
+
+
+class Command(BaseCommand):
+    """Rebuild the index of the face encoding matching engine from the database."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rematch",
+            action="store_true",
+            default=False,
+            help="Recompute the matches of all reference faces after rebuilding",
+        )
+
+    def handle(self, *args, **options):
+        rematched = rebuild_matching_index(rematch=options["rematch"])
+        self.stdout.write("Rebuilt the face encoding index.")
+        if options["rematch"]:
+            self.stdout.write(f"Recomputed matches for {rematched} reference faces.")
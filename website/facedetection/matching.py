@@ -0,0 +1,306 @@
+"""Engines that match face encodings against each other.
+
+A face encoding matches another one if their Euclidean distance is below
+:data:`MATCH_THRESHOLD`. Historically, this was computed in SQL by a full table
+scan for every new encoding. The :class:`NumpyMatchingEngine` instead keeps all
+encodings in memory as packed float32 matrices, and compares encodings in batches.
+
+The engine that is used is configured with ``FACEDETECTION_MATCHING_ENGINE``.
+"""
+
+import logging
+import os
+import threading
+from collections.abc import Sequence
+from functools import cache
+
+from django.conf import settings
+from django.db.models import Count, Sum
+from django.utils.module_loading import import_string
+
+import numpy as np
+
+from .models import (
+    ENCODING_FIELDS,
+    ENCODING_SIZE,
+    MATCH_THRESHOLD,
+    PhotoFaceEncoding,
+    ReferenceFaceEncoding,
+    encoding_match_sql,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class MatchingEngine:
+    """Base class for engines that find matching face encodings."""
+
+    def matching_references(
+        self, encodings: Sequence[Sequence[float]]
+    ) -> list[list[int]]:
+        """Return, for each photo face encoding, the pks of matching reference encodings."""
+        raise NotImplementedError
+
+    def matching_photo_faces(
+        self, encodings: Sequence[Sequence[float]]
+    ) -> list[list[int]]:
+        """Return, for each reference encoding, the pks of matching photo face encodings."""
+        raise NotImplementedError
+
+    def rebuild(self):
+        """Rebuild any index the engine keeps from the database."""
+
+
+class SQLMatchingEngine(MatchingEngine):
+    """Match encodings with a distance computation in SQL, scanning the whole table."""
+
+    def _match(self, model, encodings):
+        return [
+            list(
+                model.objects.extra(where=[encoding_match_sql(encoding)]).values_list(
+                    "pk", flat=True
+                )
+            )
+            for encoding in encodings
+        ]
+
+    def matching_references(self, encodings):
+        return self._match(ReferenceFaceEncoding, encodings)
+
+    def matching_photo_faces(self, encodings):
+        return self._match(PhotoFaceEncoding, encodings)
+
+
+class EncodingIndex:
+    """An in-memory index of all encodings of a face encoding model.
+
+    The encodings are stored as a float32 matrix with amortized growth, so new
+    encodings can be inserted incrementally. Before every search, the index is
+    synchronised with the database: new rows (with a higher pk) are loaded, and
+    deleted or missed rows are reconciled. This costs two cheap queries if nothing
+    changed.
+    """
+
+    # Number of indexed encodings compared in one matrix multiplication.
+    chunk_size = 65536
+
+    def __init__(self, model):
+        self.model = model
+        self._lock = threading.Lock()
+        self._clear()
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def pks(self) -> np.ndarray:
+        return self._pks[: self._size]
+
+    @property
+    def encodings(self) -> np.ndarray:
+        return self._encodings[: self._size]
+
+    @property
+    def max_pk(self) -> int:
+        return int(self._pks[self._size - 1]) if self._size else 0
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        self._set(
+            np.empty(0, dtype=np.int64),
+            np.empty((0, ENCODING_SIZE), dtype=np.float32),
+        )
+
+    def _set(self, pks, encodings):
+        self._pks = np.ascontiguousarray(pks, dtype=np.int64)
+        self._encodings = np.ascontiguousarray(encodings, dtype=np.float32)
+        self._norms = np.einsum("ij,ij->i", self._encodings, self._encodings)
+        self._size = len(self._pks)
+
+    def add(self, pks, encodings):
+        """Insert encodings with (increasing) pks that are higher than any indexed pk."""
+        pks = np.asarray(pks, dtype=np.int64)
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        size = self._size + len(pks)
+
+        if size > len(self._pks):
+            capacity = max(size, 2 * len(self._pks), 1024)
+            grown_pks = np.empty(capacity, dtype=np.int64)
+            grown_encodings = np.empty((capacity, ENCODING_SIZE), dtype=np.float32)
+            grown_norms = np.empty(capacity, dtype=np.float32)
+            grown_pks[: self._size] = self.pks
+            grown_encodings[: self._size] = self.encodings
+            grown_norms[: self._size] = self._norms[: self._size]
+            self._pks, self._encodings, self._norms = (
+                grown_pks,
+                grown_encodings,
+                grown_norms,
+            )
+
+        self._pks[self._size : size] = pks
+        self._encodings[self._size : size] = encodings
+        self._norms[self._size : size] = np.einsum("ij,ij->i", encodings, encodings)
+        self._size = size
+
+    def _load(self, queryset):
+        """Add all encodings in a queryset, in chunks to bound memory usage."""
+        rows = queryset.order_by("pk").values_list("pk", *ENCODING_FIELDS)
+        chunk = []
+        for row in rows.iterator(chunk_size=2000):
+            chunk.append(row)
+            if len(chunk) == 2000:
+                self._add_rows(chunk)
+                chunk = []
+        if chunk:
+            self._add_rows(chunk)
+
+    def _add_rows(self, rows):
+        data = np.asarray(rows, dtype=np.float64)
+        self.add(data[:, 0].astype(np.int64), data[:, 1:])
+
+    def sync(self):
+        """Bring the index up to date with the database.
+
+        Rows with a pk up to the highest indexed one are compared by their count
+        and the sum of their pks. Those only differ if rows were deleted, or if a
+        row was committed after a row with a higher pk had already been loaded.
+        """
+        with self._lock:
+            max_pk = self.max_pk
+            if max_pk:
+                existing = self.model.objects.filter(pk__lte=max_pk)
+                totals = existing.aggregate(count=Count("pk"), pk_sum=Sum("pk"))
+                if totals["count"] != self._size or (totals["pk_sum"] or 0) != int(
+                    self.pks.sum()
+                ):
+                    self._reconcile(existing)
+
+            self._load(self.model.objects.filter(pk__gt=max_pk))
+
+    def _reconcile(self, existing):
+        """Prune deleted rows from the index, and add the rows it misses."""
+        existing_pks = np.fromiter(existing.values_list("pk", flat=True), np.int64)
+        keep = np.isin(self.pks, existing_pks)
+        missing = np.setdiff1d(existing_pks, self.pks)
+        pks, encodings = self.pks[keep], self.encodings[keep]
+
+        if len(missing):
+            rows = np.asarray(
+                existing.filter(pk__in=missing.tolist()).values_list(
+                    "pk", *ENCODING_FIELDS
+                ),
+                dtype=np.float64,
+            ).reshape(-1, ENCODING_SIZE + 1)
+            pks = np.concatenate([pks, rows[:, 0].astype(np.int64)])
+            encodings = np.concatenate([encodings, rows[:, 1:]])
+            # Keep the pks sorted, so the last one is the highest.
+            order = np.argsort(pks, kind="stable")
+            pks, encodings = pks[order], encodings[order]
+
+        self._set(pks, encodings)
+
+    def rebuild(self):
+        """Reload the whole index from the database."""
+        with self._lock:
+            self._clear()
+            self._load(self.model.objects.all())
+
+    def search(self, queries, threshold=MATCH_THRESHOLD) -> list[list[int]]:
+        """Return, for each query encoding, the pks of indexed encodings within `threshold`.
+
+        Squared distances are computed for all queries at once as
+        ``|q|^2 + |e|^2 - 2 q.e``, one chunk of indexed encodings at a time.
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        results = [[] for _ in range(len(queries))]
+        if not len(queries):
+            return results
+
+        query_norms = np.einsum("ij,ij->i", queries, queries)
+        max_squared_distance = np.float32(threshold**2)
+
+        with self._lock:
+            for start in range(0, self._size, self.chunk_size):
+                end = min(start + self.chunk_size, self._size)
+                squared_distances = (
+                    query_norms[:, np.newaxis]
+                    + self._norms[np.newaxis, start:end]
+                    - 2 * (queries @ self._encodings[start:end].T)
+                )
+                rows, columns = np.nonzero(squared_distances < max_squared_distance)
+                for row, pk in zip(rows, self._pks[start:end][columns]):
+                    results[row].append(int(pk))
+
+        return results
+
+    def save(self, path):
+        """Write the index to `path` atomically, so readers never see a partial file."""
+        with self._lock, open(f"{path}.tmp", "wb") as file:
+            np.savez(file, pks=self.pks, encodings=self.encodings)
+        os.replace(f"{path}.tmp", path)
+
+    def load(self, path):
+        with np.load(path) as data:
+            with self._lock:
+                self._set(data["pks"], data["encodings"])
+
+
+class NumpyMatchingEngine(MatchingEngine):
+    """Match encodings with batched NumPy distance computations on in-memory indices.
+
+    If ``FACEDETECTION_MATCHING_INDEX_PATH`` is set, the (large) index of photo face
+    encodings is loaded from that file on first use, instead of from the database.
+    Any encodings that were added or removed since the file was written are synced
+    from the database, so a stale file only makes the first search slower.
+    """
+
+    def __init__(self, index_path=None):
+        self.index_path = index_path
+        self.reference_index = EncodingIndex(ReferenceFaceEncoding)
+        self.photo_face_index = EncodingIndex(PhotoFaceEncoding)
+        self._loaded = False
+
+    def _load_persisted_index(self):
+        if self._loaded:
+            return
+        self._loaded = True
+
+        if self.index_path and os.path.exists(self.index_path):
+            try:
+                self.photo_face_index.load(self.index_path)
+            except (OSError, ValueError, KeyError):
+                logger.warning(
+                    "Could not load face encoding index from %s",
+                    self.index_path,
+                    exc_info=True,
+                )
+                self.photo_face_index.clear()
+
+    def matching_references(self, encodings):
+        self.reference_index.sync()
+        return self.reference_index.search(encodings)
+
+    def matching_photo_faces(self, encodings):
+        self._load_persisted_index()
+        self.photo_face_index.sync()
+        return self.photo_face_index.search(encodings)
+
+    def rebuild(self):
+        self._loaded = True
+        self.reference_index.rebuild()
+        self.photo_face_index.rebuild()
+
+        if self.index_path:
+            self.photo_face_index.save(self.index_path)
+
+
+@cache
+def get_matching_engine() -> MatchingEngine:
+    """Get the (process-wide) matching engine configured in the settings."""
+    engine_class = import_string(settings.FACEDETECTION_MATCHING_ENGINE)
+    if issubclass(engine_class, NumpyMatchingEngine):
+        return engine_class(index_path=settings.FACEDETECTION_MATCHING_INDEX_PATH)
+    return engine_class()
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_photo_matches(apps, schema_editor):
+    ReferenceFaceEncoding = apps.get_model("facedetection", "ReferenceFaceEncoding")
+    MemberPhotoMatch = apps.get_model("facedetection", "MemberPhotoMatch")
+    rows = (
+        ReferenceFaceEncoding.matches.through.objects.filter(
+            referencefaceencoding__reference__marked_for_deletion_at__isnull=True
+        )
+        .values_list(
+            "referencefaceencoding__reference__user",
+            "photofaceencoding__photo__photo",
+            "photofaceencoding__photo__photo__album__date",
+            "photofaceencoding__photo__photo__album__hidden",
+            "photofaceencoding__photo__photo__album__is_processing",
+        )
+        .distinct()
+    )
+    MemberPhotoMatch.objects.bulk_create(
+        (
+            MemberPhotoMatch(
+                member_id=member,
+                photo_id=photo,
+                album_date=album_date,
+                album_visible=not hidden and not is_processing,
+            )
+            for member, photo, album_date, hidden, is_processing in rows
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('facedetection', '0001_initial'),
+        ('members', '0051_membership_study_long_until'),
+        ('photos', '0031_photo_duplicate_detection'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MemberPhotoMatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('album_date', models.DateField()),
+                ('album_visible', models.BooleanField(help_text='Whether the album is neither hidden nor processing.')),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='photo_matches', to='members.member')),
+                ('photo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='member_matches', to='photos.photo')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['member', 'album_visible', 'album_date'], name='facedetecti_member__378c50_idx')],
+                'unique_together': {('member', 'photo')},
+            },
+        ),
+        migrations.RunPython(fill_photo_matches, migrations.RunPython.noop),
+    ]
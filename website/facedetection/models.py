@@ -13,6 +13,28 @@ from members.models import Member
 from photos.models import Photo
 
 
+# Face encodings are vectors of 128 floats, stored in one column per value.
+ENCODING_SIZE = 128
+ENCODING_FIELDS = [f"_field{i}" for i in range(ENCODING_SIZE)]
+
+# Two face encodings match if their Euclidean distance is less than this threshold.
+MATCH_THRESHOLD = 0.49
+
+
+def encoding_match_sql(encoding: list[float]) -> str:
+    """Return a SQL expression that holds for encodings that match `encoding`.
+
+    Computes the Euclidean distance between `encoding` and the other one,
+    and checks whether it's less than :data:`MATCH_THRESHOLD`.
+    """
+    sum_of_squares = " + ".join(
+        f"power(_field{i} - {encoding[i]}, 2)" for i in range(ENCODING_SIZE)
+    )
+    euclidean_distance = f"sqrt({sum_of_squares})"
+
+    return f"{euclidean_distance} < {MATCH_THRESHOLD}"
+
+
 class FaceDetectionUser(Member):
     class Meta:
         proxy = True
@@ -249,27 +271,18 @@ class BaseFaceEncoding(models.Model):
         if hasattr(self, "_encoding"):
             return self._encoding
 
-        self._encoding = [getattr(self, f"_field{i}") for i in range(128)]
+        self._encoding = [getattr(self, field) for field in ENCODING_FIELDS]
         return self._encoding
 
     @encoding.setter
     def encoding(self, value):
         self._encoding = value
-        for i in range(128):
-            setattr(self, f"_field{i}", value[i])
+        for field, x in zip(ENCODING_FIELDS, value):
+            setattr(self, field, x)
 
     def encoding_match_function(self) -> str:
-        """Return a SQL expression that holds for encodings that match this one.
-
-        Computes the Euclidean distance between this encoding and the other one,
-        and checks whether it's less than a threshold of 0.49.
-        """
-        sum_of_squares = " + ".join(
-            f"power(_field{i} - {self.encoding[i]}, 2)" for i in range(128)
-        )
-        euclidean_distance = f"sqrt({sum_of_squares})"
-
-        return f"{euclidean_distance} < 0.49"
+        """Return a SQL expression that holds for encodings that match this one."""
+        return encoding_match_sql(self.encoding)
 
 
 class PhotoFaceEncoding(BaseFaceEncoding):
@@ -291,10 +304,12 @@ class PhotoFaceEncoding(BaseFaceEncoding):
 
     def _set_matches(self):
         """(Re-)compute the reference encodings that match this face."""
-        matches = ReferenceFaceEncoding.objects.extra(
-            where=[self.encoding_match_function()]
-        )
+        from .matching import get_matching_engine
+        from .services import update_photo_matches
+
+        (matches,) = get_matching_engine().matching_references([self.encoding])
         self.matches.set(matches)
+        update_photo_matches(photos=[self.photo.photo_id])
 
 
 class ReferenceFaceEncoding(BaseFaceEncoding):
@@ -326,7 +341,40 @@ class ReferenceFaceEncoding(BaseFaceEncoding):
 
     def _set_matches(self):
         """(Re-)compute the photo face encodings that match this reference."""
-        matches = PhotoFaceEncoding.objects.extra(
-            where=[self.encoding_match_function()]
-        )
+        from .matching import get_matching_engine
+        from .services import update_photo_matches
+
+        (matches,) = get_matching_engine().matching_photo_faces([self.encoding])
         self.matches.set(matches)
+        update_photo_matches(members=[self.reference.user_id])
+
+
+class MemberPhotoMatch(models.Model):
+    """A photo in which a member has been recognized.
+
+    This denormalises the matches between the encodings of a member's reference
+    faces (that are not marked for deletion) and the faces in photos, together
+    with the date and visibility of the album. It is kept up to date by
+    `facedetection.services.update_photo_matches`.
+    """
+
+    member = models.ForeignKey(
+        Member, on_delete=models.CASCADE, related_name="photo_matches"
+    )
+
+    photo = models.ForeignKey(
+        Photo, on_delete=models.CASCADE, related_name="member_matches"
+    )
+
+    album_date = models.DateField()
+
+    album_visible = models.BooleanField(
+        help_text="Whether the album is neither hidden nor processing."
+    )
+
+    def __str__(self):
+        return f"{self.member} in {self.photo}"
+
+    class Meta:
+        unique_together = ["member", "photo"]
+        indexes = [models.Index(fields=["member", "album_visible", "album_date"])]
@@ -2,17 +2,26 @@ import json
 import logging
 
 from django.conf import settings
-from django.db.models import Count, Q
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
 from django.utils import timezone
 
 import boto3
 from sentry_sdk import capture_exception
 
 from members.models.member import Member
-from photos.models import Photo
+from photos.models import Like, Photo
 from utils.media.services import get_media_url
 
-from .models import FaceDetectionPhoto, ReferenceFace
+from .matching import get_matching_engine
+from .models import (
+    BaseFaceEncodingSource,
+    FaceDetectionPhoto,
+    MemberPhotoMatch,
+    PhotoFaceEncoding,
+    ReferenceFace,
+    ReferenceFaceEncoding,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -196,26 +205,197 @@ def submit_new_photos() -> int:
     return count
 
 
+def save_encodings(
+    results: list[tuple[ReferenceFace | FaceDetectionPhoto, list[list[float]]]],
+):
+    """Store the encodings extracted from a batch of sources, and match them.
+
+    All encodings are inserted with bulk queries, and are matched with a single
+    batched computation against the encodings of the other kind. The matches are
+    also inserted in bulk. A reference face is rejected unless it has exactly one
+    encoding. All sources are marked as done or rejected.
+    """
+    photo_encodings = []
+    reference_encodings = []
+    done_photos = []
+    done_references = []
+    rejected_references = []
+
+    for source, encodings in results:
+        if isinstance(source, FaceDetectionPhoto):
+            for encoding in encodings:
+                photo_encoding = PhotoFaceEncoding(photo=source)
+                photo_encoding.encoding = encoding
+                photo_encodings.append(photo_encoding)
+            done_photos.append(source.pk)
+        elif len(encodings) == 1:
+            reference_encoding = ReferenceFaceEncoding(reference=source)
+            reference_encoding.encoding = encodings[0]
+            reference_encodings.append(reference_encoding)
+            done_references.append(source.pk)
+        else:  # ReferenceFace needs exactly one encoding.
+            rejected_references.append(source.pk)
+
+    engine = get_matching_engine()
+    through = ReferenceFaceEncoding.matches.through
+
+    with transaction.atomic():
+        photo_encodings = PhotoFaceEncoding.objects.bulk_create(
+            photo_encodings, batch_size=500
+        )
+        reference_encodings = ReferenceFaceEncoding.objects.bulk_create(
+            reference_encodings
+        )
+
+        # New photo faces and new references in the same batch match both ways.
+        matches = {
+            (reference_pk, photo_encoding.pk)
+            for photo_encoding, reference_pks in zip(
+                photo_encodings,
+                engine.matching_references([e.encoding for e in photo_encodings]),
+            )
+            for reference_pk in reference_pks
+        } | {
+            (reference_encoding.pk, photo_pk)
+            for reference_encoding, photo_pks in zip(
+                reference_encodings,
+                engine.matching_photo_faces([e.encoding for e in reference_encodings]),
+            )
+            for photo_pk in photo_pks
+        }
+        through.objects.bulk_create(
+            [
+                through(referencefaceencoding_id=ref_pk, photofaceencoding_id=photo_pk)
+                for ref_pk, photo_pk in matches
+            ],
+            batch_size=1000,
+        )
+
+        FaceDetectionPhoto.objects.filter(pk__in=done_photos).update(
+            status=BaseFaceEncodingSource.Status.DONE
+        )
+        ReferenceFace.objects.filter(pk__in=done_references).update(
+            status=BaseFaceEncodingSource.Status.DONE
+        )
+        ReferenceFace.objects.filter(pk__in=rejected_references).update(
+            status=BaseFaceEncodingSource.Status.REJECTED
+        )
+
+        if matches:
+            # Only new faces and references can have new matches.
+            update_photo_matches(
+                photos=Photo.objects.filter(
+                    facedetectionphoto__encodings__in=[e.pk for e in photo_encodings]
+                )
+            )
+            update_photo_matches(
+                members=Member.objects.filter(
+                    reference_faces__referencefaceencoding__in=[
+                        e.pk for e in reference_encodings
+                    ]
+                )
+            )
+
+
+def rebuild_matching_index(rematch=False) -> int:
+    """Rebuild the index of the face matching engine from the database.
+
+    If `rematch` is set, the matches of all reference encodings are recomputed
+    afterwards, for example after the matching threshold has been changed.
+
+    Returns the number of reference encodings that have been rematched.
+    """
+    engine = get_matching_engine()
+    engine.rebuild()
+
+    if not rematch:
+        return 0
+
+    references = list(ReferenceFaceEncoding.objects.all())
+    matches = engine.matching_photo_faces([ref.encoding for ref in references])
+    for reference, photo_faces in zip(references, matches):
+        reference.matches.set(photo_faces)
+    update_photo_matches()
+
+    return len(references)
+
+
+def update_photo_matches(members=None, photos=None):
+    """Recompute the `MemberPhotoMatch`es of some members or photos, or of all.
+
+    :param members: A queryset or list of members to recompute the matches of.
+    :param photos: A queryset or list of photos to recompute the matches of.
+    """
+    matches = MemberPhotoMatch.objects.all()
+    rows = ReferenceFaceEncoding.matches.through.objects.filter(
+        referencefaceencoding__reference__marked_for_deletion_at__isnull=True
+    )
+    if members is not None:
+        matches = matches.filter(member__in=members)
+        rows = rows.filter(referencefaceencoding__reference__user__in=members)
+    if photos is not None:
+        matches = matches.filter(photo__in=photos)
+        rows = rows.filter(photofaceencoding__photo__photo__in=photos)
+
+    rows = rows.values_list(
+        "referencefaceencoding__reference__user",
+        "photofaceencoding__photo__photo",
+        "photofaceencoding__photo__photo__album__date",
+        "photofaceencoding__photo__photo__album__hidden",
+        "photofaceencoding__photo__photo__album__is_processing",
+    ).distinct()
+
+    with transaction.atomic():
+        matches.delete()
+        MemberPhotoMatch.objects.bulk_create(
+            (
+                MemberPhotoMatch(
+                    member_id=member,
+                    photo_id=photo,
+                    album_date=album_date,
+                    album_visible=not hidden and not is_processing,
+                )
+                for member, photo, album_date, hidden, is_processing in rows
+            ),
+            batch_size=1000,
+        )
+
+
+def update_album_photo_matches(album):
+    """Update the album date and visibility of the matches in an album."""
+    MemberPhotoMatch.objects.filter(photo__album=album).update(
+        album_date=album.date,
+        album_visible=not album.hidden and not album.is_processing,
+    )
+
+
 def get_user_photos(member: Member):
-    reference_faces = member.reference_faces.filter(
-        marked_for_deletion_at__isnull=True,
+    """Get the photos in which a member has been recognized, newest albums first."""
+    memberships = list(
+        member.membership_set.order_by("-since").values_list("since", "until")
     )
+    if not memberships:
+        return Photo.objects.none()
 
     # Filter out matches from long before the member's first membership.
-    albums_since = member.earliest_membership.since - timezone.timedelta(days=31)
-    photos = Photo.objects.select_related("album").filter(album__date__gte=albums_since)
+    filters = {
+        "member_matches__member": member,
+        "member_matches__album_visible": True,
+        "member_matches__album_date__gte": memberships[-1][0]
+        - timezone.timedelta(days=31),
+    }
 
     # Filter out matches from after the member's last membership.
-    if member.latest_membership.until is not None:
-        photos = photos.filter(album__date__lte=member.latest_membership.until)
-
-    # Actually match the reference faces.
-    photos = photos.filter(album__hidden=False, album__is_processing=False).filter(
-        facedetectionphoto__encodings__matches__reference__in=reference_faces,
-    )
+    if memberships[0][1] is not None:
+        filters["member_matches__album_date__lte"] = memberships[0][1]
 
     return (
-        photos.annotate(member_likes=Count("likes", filter=Q(likes__member=member)))
-        .select_properties("num_likes")
-        .order_by("-album__date", "-pk")
+        Photo.objects.filter(**filters)
+        .select_related("album")
+        .annotate(
+            member_likes=Exists(
+                Like.objects.filter(photo=OuterRef("pk"), member=member)
+            )
+        )
+        .order_by("-member_matches__album_date", "-pk")
     )
@@ -1,10 +1,15 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 
+from photos.models import Album
 from photos.tasks import album_uploaded
 from utils.models.signals import suspendingreceiver
 
 from .models import FaceDetectionPhoto, ReferenceFace
-from .services import trigger_facedetection_lambda
+from .services import (
+    trigger_facedetection_lambda,
+    update_album_photo_matches,
+    update_photo_matches,
+)
 
 
 @suspendingreceiver(
@@ -16,6 +21,23 @@ def trigger_reference_face_analysis(sender, instance, created, **kwargs):
         trigger_facedetection_lambda([instance])
 
 
+@suspendingreceiver(
+    (post_save, post_delete),
+    sender=ReferenceFace,
+    dispatch_uid="update_reference_face_photo_matches",
+)
+def update_reference_face_photo_matches(sender, instance, **kwargs):
+    """Update the photos of a member when a reference face is (marked as) deleted."""
+    if not kwargs.get("created", False):
+        update_photo_matches(members=[instance.user_id])
+
+
+@suspendingreceiver(post_save, sender=Album, dispatch_uid="update_album_photo_matches")
+def update_album_matches(sender, instance, **kwargs):
+    """Update the date and visibility of the matched photos in an album."""
+    update_album_photo_matches(instance)
+
+
 @suspendingreceiver(album_uploaded, dispatch_uid="trigger_album_analysis")
 def trigger_album_analysis(sender, album, **kwargs):
     """Start the facedetection Lambda on any new photos in the album."""
@@ -0,0 +1,140 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+import numpy as np
+from rest_framework.test import APIClient
+
+from facedetection.matching import get_matching_engine
+from facedetection.models import (
+    ENCODING_SIZE,
+    FaceDetectionPhoto,
+    MemberPhotoMatch,
+    ReferenceFace,
+    ReferenceFaceEncoding,
+)
+from members.models import Member
+from photos.models import Album, Photo
+
+
+@override_settings(SUSPEND_SIGNALS=True)
+class FaceEncodingBatchPostViewTest(TestCase):
+    fixtures = ["members.json"]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.member = Member.objects.get(pk=1)
+        cls.album = Album.objects.create(
+            title="test", slug="test", date=timezone.now().date()
+        )
+        cls.rng = np.random.default_rng(1)
+
+    def setUp(self):
+        get_matching_engine.cache_clear()
+        self.client = APIClient()
+        self.url = reverse("api:facedetection:facedetection:encoding-batch-callback")
+
+    def _create_photo_sources(self, n):
+        photos = Photo.objects.bulk_create(
+            Photo(album=self.album, file=f"photos/test-{i}.jpg") for i in range(n)
+        )
+        return FaceDetectionPhoto.objects.bulk_create(
+            FaceDetectionPhoto(photo=photo) for photo in photos
+        )
+
+    def _payload(self, sources, encodings):
+        return {
+            "sources": [
+                {
+                    "type": "photo",
+                    "pk": source.pk,
+                    "token": source.token,
+                    "encodings": [e.tolist() for e in source_encodings],
+                }
+                for source, source_encodings in zip(sources, encodings)
+            ]
+        }
+
+    def test_batch_creates_encodings_and_matches(self):
+        reference = ReferenceFace.objects.create(user=self.member, file="test.jpg")
+        face = self.rng.normal(0, 0.1, ENCODING_SIZE)
+
+        sources = self._create_photo_sources(3)
+        encodings = [
+            [face + 0.001, self.rng.normal(0, 0.1, ENCODING_SIZE)],
+            [],
+            [self.rng.normal(0, 0.1, ENCODING_SIZE)],
+        ]
+        payload = self._payload(sources, encodings)
+        payload["sources"].append(
+            {
+                "type": "reference",
+                "pk": reference.pk,
+                "token": reference.token,
+                "encodings": [face.tolist()],
+            }
+        )
+
+        response = self.client.post(self.url, payload, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [s["status"] for s in response.json()["sources"]], ["done"] * 4
+        )
+        for source in sources:
+            source.refresh_from_db()
+            self.assertEqual(source.status, FaceDetectionPhoto.Status.DONE)
+        self.assertEqual(sources[0].encodings.count(), 2)
+        self.assertEqual(sources[1].encodings.count(), 0)
+
+        reference_encoding = ReferenceFaceEncoding.objects.get(reference=reference)
+        self.assertQuerySetEqual(
+            reference_encoding.matches.all(), [sources[0].encodings.first()]
+        )
+        self.assertQuerySetEqual(
+            MemberPhotoMatch.objects.values_list("member", "photo"),
+            [(self.member.pk, sources[0].photo.pk)],
+        )
+
+    def test_batch_skips_invalid_sources(self):
+        sources = self._create_photo_sources(3)
+        sources[1].status = FaceDetectionPhoto.Status.DONE
+        sources[1].save()
+        payload = self._payload(sources, [[], [], []])
+        payload["sources"][2]["token"] = "wrong"
+        payload["sources"].append(dict(payload["sources"][0], pk=sources[2].pk + 1))
+
+        response = self.client.post(self.url, payload, format="json")
+
+        self.assertEqual(
+            [s["status"] for s in response.json()["sources"]],
+            ["done", "not_processing", "invalid_token", "not_found"],
+        )
+        sources[2].refresh_from_db()
+        self.assertEqual(sources[2].status, FaceDetectionPhoto.Status.PROCESSING)
+
+    def test_batch_rejects_malformed_encodings(self):
+        (source,) = self._create_photo_sources(1)
+        payload = self._payload([source], [[]])
+        payload["sources"][0]["encodings"] = [[0.1] * 12]
+
+        response = self.client.post(self.url, payload, format="json")
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_batch_query_count_does_not_scale_with_sources(self):
+        def count_queries(n):
+            sources = self._create_photo_sources(n)
+            payload = self._payload(
+                sources,
+                [self.rng.normal(0, 0.1, (2, ENCODING_SIZE)) for _ in range(n)],
+            )
+            with CaptureQueriesContext(connection) as context:
+                self.client.post(self.url, payload, format="json")
+            return len(context.captured_queries)
+
+        count_queries(1)  # Warm up the matching engine's indices.
+        # Bulk inserts may be split into a few queries, depending on the database.
+        self.assertLess(count_queries(40), 40)
@@ -0,0 +1,127 @@
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+import numpy as np
+
+from facedetection.matching import (
+    EncodingIndex,
+    NumpyMatchingEngine,
+    SQLMatchingEngine,
+    get_matching_engine,
+)
+from facedetection.models import (
+    ENCODING_SIZE,
+    FaceDetectionPhoto,
+    PhotoFaceEncoding,
+    ReferenceFace,
+    ReferenceFaceEncoding,
+)
+from members.models import Member
+from photos.models import Album, Photo
+
+
+def _create_photo_face_encodings(source, encodings):
+    objects = []
+    for encoding in encodings:
+        photo_face_encoding = PhotoFaceEncoding(photo=source)
+        photo_face_encoding.encoding = encoding.tolist()
+        objects.append(photo_face_encoding)
+    return PhotoFaceEncoding.objects.bulk_create(objects)
+
+
+class EncodingIndexTest(TestCase):
+    def test_search(self):
+        rng = np.random.default_rng(0)
+        encodings = rng.normal(0, 0.1, (3000, ENCODING_SIZE))
+        index = EncodingIndex(PhotoFaceEncoding)
+
+        # Insert in several batches, so that the index has to grow.
+        for start in range(0, 3000, 700):
+            index.add(
+                np.arange(start, min(start + 700, 3000)) + 1,
+                encodings[start : start + 700],
+            )
+        self.assertEqual(len(index), 3000)
+
+        queries = encodings[[5, 1234, 2999]] + 0.001
+        self.assertEqual(index.search(queries), [[6], [1235], [3000]])
+        self.assertEqual(index.search(np.zeros((1, ENCODING_SIZE)) + 5), [[]])
+        self.assertEqual(index.search(np.empty((0, ENCODING_SIZE))), [])
+
+
+@override_settings(SUSPEND_SIGNALS=True)
+class MatchingEngineTest(TestCase):
+    fixtures = ["members.json"]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.member = Member.objects.get(pk=1)
+        album = Album.objects.create(
+            title="test", slug="test", date=timezone.now().date()
+        )
+        photo = Photo.objects.create(album=album, file="photos/test.jpg")
+        cls.source = FaceDetectionPhoto.objects.create(photo=photo)
+
+        cls.rng = np.random.default_rng(42)
+        cls.encodings = cls.rng.normal(0, 0.1, (200, ENCODING_SIZE))
+        cls.photo_faces = _create_photo_face_encodings(cls.source, cls.encodings)
+
+    def setUp(self):
+        # The engine caches encodings across the process, make sure each test
+        # starts with a fresh one, because the database is rolled back.
+        get_matching_engine.cache_clear()
+
+    def test_engines_agree(self):
+        queries = self.encodings[:20] + self.rng.normal(0, 0.02, (20, ENCODING_SIZE))
+
+        sql_matches = SQLMatchingEngine().matching_photo_faces(queries)
+        numpy_matches = NumpyMatchingEngine().matching_photo_faces(queries)
+
+        self.assertEqual(
+            [sorted(m) for m in sql_matches], [sorted(m) for m in numpy_matches]
+        )
+        self.assertTrue(any(sql_matches))
+
+    def test_reference_encoding_sets_matches(self):
+        reference = ReferenceFace.objects.create(user=self.member, file="test.jpg")
+        reference_encoding = ReferenceFaceEncoding(reference=reference)
+        reference_encoding.encoding = (self.encodings[3] + 0.001).tolist()
+        reference_encoding.save()
+
+        self.assertQuerySetEqual(
+            reference_encoding.matches.all(), [self.photo_faces[3]]
+        )
+
+        new_photo_face = PhotoFaceEncoding(photo=self.source)
+        new_photo_face.encoding = (self.encodings[3] - 0.001).tolist()
+        new_photo_face.save()
+
+        self.assertQuerySetEqual(new_photo_face.matches.all(), [reference_encoding])
+
+    def test_index_syncs_with_database(self):
+        engine = NumpyMatchingEngine()
+        query = [self.encodings[7]]
+        self.assertEqual(engine.matching_photo_faces(query), [[self.photo_faces[7].pk]])
+
+        self.photo_faces[7].delete()
+        self.assertEqual(engine.matching_photo_faces(query), [[]])
+
+        (new_photo_face,) = _create_photo_face_encodings(self.source, query)
+        self.assertEqual(engine.matching_photo_faces(query), [[new_photo_face.pk]])
+
+    def test_index_adds_rows_committed_late(self):
+        index = EncodingIndex(PhotoFaceEncoding)
+        index.sync()
+        # Pretend a row was committed after rows with a higher pk were loaded,
+        # while another row was deleted, so the number of rows is unchanged.
+        late, deleted = self.photo_faces[5], self.photo_faces[6]
+        expected_pks = [face.pk for face in self.photo_faces if face != deleted]
+        keep = index.pks != late.pk
+        index._set(index.pks[keep], index.encodings[keep])
+        deleted.delete()
+
+        index.sync()
+
+        self.assertEqual(index.pks.tolist(), expected_pks)
+        self.assertEqual(index.search([self.encodings[5]]), [[late.pk]])
+        self.assertEqual(index.search([self.encodings[6]]), [[]])
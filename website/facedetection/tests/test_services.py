@@ -0,0 +1,128 @@
+from datetime import date
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+import numpy as np
+
+from facedetection.matching import get_matching_engine
+from facedetection.models import (
+    ENCODING_SIZE,
+    FaceDetectionPhoto,
+    MemberPhotoMatch,
+    PhotoFaceEncoding,
+    ReferenceFace,
+    ReferenceFaceEncoding,
+)
+from facedetection.services import get_user_photos, update_photo_matches
+from members.models import Member
+from photos.models import Album, Photo
+from photos.services import like_photo
+
+
+@override_settings(SUSPEND_SIGNALS=True)
+class UserPhotosTest(TestCase):
+    fixtures = ["members.json"]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.member = Member.objects.get(pk=1)
+        cls.albums = [
+            Album.objects.create(title="old", slug="old", date=date(2020, 1, 1)),
+            Album.objects.create(title="new", slug="new", date=date(2021, 1, 1)),
+            Album.objects.create(
+                title="hidden", slug="hidden", date=date(2022, 1, 1), hidden=True
+            ),
+        ]
+        cls.photos = [
+            Photo.objects.create(album=album, file=f"photos/{album.slug}-{i}.jpg")
+            for album in cls.albums
+            for i in range(2)
+        ]
+
+    def setUp(self):
+        get_matching_engine.cache_clear()
+        rng = np.random.default_rng(0)
+        self.face = rng.normal(0, 0.1, ENCODING_SIZE)
+
+        # The member is in the first photo of each album, twice in the newest one.
+        for i, photo in enumerate(self.photos):
+            source = FaceDetectionPhoto.objects.create(
+                photo=photo, status=FaceDetectionPhoto.Status.DONE
+            )
+            faces = [rng.normal(0, 0.1, ENCODING_SIZE)]
+            if i % 2 == 0:
+                faces.append(self.face + 0.001)
+            if i == 2:
+                faces.append(self.face - 0.001)
+            for face in faces:
+                encoding = PhotoFaceEncoding(photo=source)
+                encoding.encoding = face.tolist()
+                encoding.save()
+
+        self.reference = ReferenceFace.objects.create(
+            user=self.member, file="test.jpg", status=ReferenceFace.Status.DONE
+        )
+        encoding = ReferenceFaceEncoding(reference=self.reference)
+        encoding.encoding = self.face.tolist()
+        encoding.save()
+
+    def test_get_user_photos(self):
+        like_photo(self.photos[2], self.member)
+
+        with self.assertNumQueries(2):
+            photos = list(get_user_photos(self.member))
+
+        self.assertEqual(photos, [self.photos[2], self.photos[0]])
+        self.assertEqual([photo.member_likes for photo in photos], [True, False])
+
+    def test_membership_bounds(self):
+        self.member.membership_set.update(since=date(2020, 6, 1), until=None)
+        self.assertEqual(list(get_user_photos(self.member)), [self.photos[2]])
+
+        self.member.membership_set.update(
+            since=date(2019, 1, 1), until=date(2020, 6, 1)
+        )
+        self.assertEqual(list(get_user_photos(self.member)), [self.photos[0]])
+
+        self.member.membership_set.all().delete()
+        self.assertEqual(list(get_user_photos(self.member)), [])
+
+    @override_settings(SUSPEND_SIGNALS=False)
+    def test_matches_are_updated(self):
+        self.assertEqual(
+            set(MemberPhotoMatch.objects.values_list("photo", "album_visible")),
+            {(self.photos[0].pk, True), (self.photos[2].pk, True)}
+            | {(self.photos[4].pk, False)},
+        )
+
+        album = self.albums[2]
+        album.hidden = False
+        album.save()
+        self.assertEqual(
+            list(get_user_photos(self.member)),
+            [self.photos[4], self.photos[2], self.photos[0]],
+        )
+
+        self.reference.marked_for_deletion_at = timezone.now()
+        self.reference.save()
+        self.assertEqual(list(get_user_photos(self.member)), [])
+
+        self.reference.marked_for_deletion_at = None
+        self.reference.save()
+        self.assertEqual(len(get_user_photos(self.member)), 3)
+
+        self.reference.delete()
+        self.assertFalse(MemberPhotoMatch.objects.exists())
+
+    def test_update_photo_matches(self):
+        matches = set(MemberPhotoMatch.objects.values_list("member", "photo"))
+        MemberPhotoMatch.objects.all().delete()
+
+        update_photo_matches(photos=[self.photos[0]])
+        self.assertEqual(MemberPhotoMatch.objects.count(), 1)
+
+        update_photo_matches(members=[self.member])
+        self.assertEqual(
+            set(MemberPhotoMatch.objects.values_list("member", "photo")), matches
+        )
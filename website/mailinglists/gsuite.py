@@ -1,8 +1,11 @@
+import hashlib
+import json
 import logging
 from random import random
 from time import sleep
 
 from django.conf import settings
+from django.core.cache import cache
 from django.utils.datastructures import ImmutableList
 
 from googleapiclient.errors import HttpError
@@ -54,18 +57,116 @@ class GSuiteSyncService:
                 return self.__dict__ == other.__dict__
             return False
 
+        @property
+        def hash(self):
+            """Get a hash of all group data, to detect whether a group has changed."""
+            data = json.dumps(
+                {
+                    "name": self.name,
+                    "active_name": self.active_name,
+                    "description": self.description,
+                    "moderated": self.moderated,
+                    "aliases": sorted(self.aliases),
+                    "addresses": self.addresses,
+                }
+            )
+            return hashlib.sha256(data.encode()).hexdigest()
+
+    class SyncReport:
+        """Report of the changes made by a sync, or that would be made in a dry run."""
+
+        def __init__(self):
+            self.created = []
+            self.updated = []
+            self.archived = []
+            self.unchanged = []
+            self.added_members = {}
+            self.removed_members = {}
+            self.added_aliases = {}
+            self.removed_aliases = {}
+            # Lists of which some members or aliases could not be updated.
+            self.failed = []
+
+        def __str__(self):
+            lines = [
+                f"Created: {', '.join(self.created) or '-'}",
+                f"Updated: {', '.join(self.updated) or '-'}",
+                f"Archived: {', '.join(self.archived) or '-'}",
+                f"Unchanged: {len(self.unchanged)} lists",
+                f"Failed: {', '.join(self.failed) or '-'}",
+            ]
+            for name in sorted(self.added_members.keys() | self.removed_members.keys()):
+                lines.append(
+                    f"{name}: +{len(self.added_members.get(name, []))} "
+                    f"-{len(self.removed_members.get(name, []))} members"
+                )
+            for name in sorted(self.added_aliases.keys() | self.removed_aliases.keys()):
+                lines.append(
+                    f"{name}: +{len(self.added_aliases.get(name, []))} "
+                    f"-{len(self.removed_aliases.get(name, []))} aliases"
+                )
+            return "\n".join(lines)
+
+    # How long the hash of a synced group is remembered. Unchanged groups are
+    # not pushed until it expires, after which they are fully reconciled again.
+    SNAPSHOT_TIMEOUT = 24 * 60 * 60
+
+    # The maximum number of requests in a batch is 1000.
+    BATCH_SIZE = 900
+
     def __init__(
         self,
         groups_settings_api=None,
         directory_api=None,
+        dry_run=False,
     ):
         """Create GSuite Sync Service.
 
         :param groups_settings_api: Group settings API object
         :param directory_api: Directory API object
+        :param dry_run: Only read the current state, and report what would change
         """
         self._groups_settings_api = groups_settings_api or get_groups_settings_api()
         self._directory_api = directory_api or get_directory_api()
+        self.dry_run = dry_run
+        self.report = GSuiteSyncService.SyncReport()
+
+    @staticmethod
+    def _snapshot_key(name):
+        return f"mailinglists_gsuite_group_{name}"
+
+    def _execute_batch(self, requests, error_message):
+        """Execute requests in as few batch requests as possible.
+
+        :param requests: list of requests to execute
+        :param error_message: message to log if a request fails
+        :return: True if all requests succeeded, False otherwise.
+        """
+        success = True
+
+        def callback(request_id, response, exception):
+            # The requests in a batch fail separately, without raising.
+            nonlocal success
+            if exception is not None:
+                logger.error(f"{error_message}: {exception}")
+                success = False
+
+        for i in range(0, len(requests), self.BATCH_SIZE):
+            batch = self._directory_api.new_batch_http_request(callback=callback)
+            for request in requests[i : i + self.BATCH_SIZE]:
+                batch.add(request)
+
+            try:
+                batch.execute()
+            except HttpError:
+                logger.exception(error_message)
+                success = False
+
+        return success
+
+    def _report_failure(self, group):
+        if group.name not in self.report.failed:
+            self.report.failed.append(group.name)
 
     @staticmethod
     def _group_settings(moderated):
@@ -102,6 +203,12 @@ class GSuiteSyncService:
 
         :param group: GroupData to create a group for
         """
+        self.report.created.append(group.name)
+        if self.dry_run:
+            self.report.added_members[group.name] = list(group.addresses)
+            self.report.added_aliases[group.name] = list(group.aliases)
+            return True
+
         try:
             self._directory_api.groups().insert(
                 body={
@@ -141,7 +248,15 @@ class GSuiteSyncService:
 
         :param active_name: old group name
         :param group: new group data
+        :return: True if the operation succeeded, False otherwise.
         """
+        self.report.updated.append(group.name)
+        if self.dry_run:
+            # Report the member and alias changes, without making them.
+            self._update_group_members(group, group_name=active_name)
+            self._update_group_aliases(group, group_name=active_name)
+            return True
+
         try:
             self._directory_api.groups().update(
                 groupKey=f"{active_name}@{settings.GSUITE_DOMAIN}",
@@ -158,7 +273,7 @@ class GSuiteSyncService:
             logger.info(f"List {group.name} updated")
         except HttpError:
             logger.exception(f"Could not update list {group.name}")
-            return
+            return False
 
         self._update_group_members(group)
         self._update_group_aliases(group)
@@ -166,18 +281,22 @@ class GSuiteSyncService:
         MailingList.objects.filter(active_gsuite_name=active_name).update(
             active_gsuite_name=group.name
         )
+        return True
 
-    def _update_group_aliases(self, group):
+    def _update_group_aliases(self, group, group_name=None):
         """Update the aliases of a group based on existing values.
 
         :param group: group data
+        :param group_name: the current name of the group, if it differs from the data
+        :return: True if the aliases were updated, False otherwise.
         """
+        group_key = f"{group_name or group.name}@{settings.GSUITE_DOMAIN}"
         try:
             aliases_response = (
                 self._directory_api.groups()
                 .aliases()
                 .list(
-                    groupKey=f"{group.name}@{settings.GSUITE_DOMAIN}",
+                    groupKey=group_key,
                 )
                 .execute()
             )
@@ -185,47 +304,42 @@ class GSuiteSyncService:
             logger.exception(
                 f"Could not obtain existing aliases for list {group.name}:"
             )
-            return
+            self._report_failure(group)
+            return False
+
+        existing_aliases = {a["alias"] for a in aliases_response.get("aliases", [])}
+        new_aliases = {f"{a}@{settings.GSUITE_DOMAIN}" for a in group.aliases}
 
-        existing_aliases = [a["alias"] for a in aliases_response.get("aliases", [])]
-        new_aliases = [f"{a}@{settings.GSUITE_DOMAIN}" for a in group.aliases]
+        remove_list = sorted(existing_aliases - new_aliases)
+        insert_list = sorted(new_aliases - existing_aliases)
 
-        remove_list = [x for x in existing_aliases if x not in new_aliases]
-        insert_list = [x for x in new_aliases if x not in existing_aliases]
+        if remove_list:
+            self.report.removed_aliases[group.name] = remove_list
+        if insert_list:
+            self.report.added_aliases[group.name] = insert_list
+        if self.dry_run:
+            return True
 
-        batch = self._directory_api.new_batch_http_request()
-        for remove_alias in remove_list:
-            batch.add(
+        if not self._execute_batch(
+            [
                 self._directory_api.groups()
                 .aliases()
-                .delete(
-                    groupKey=f"{group.name}@{settings.GSUITE_DOMAIN}",
-                    alias=remove_alias,
-                )
-            )
-
-        try:
-            batch.execute()
-        except HttpError:
-            logger.exception(f"Could not remove an alias for list {group.name}")
-
-        batch = self._directory_api.new_batch_http_request()
-        for insert_alias in insert_list:
-            batch.add(
+                .delete(groupKey=group_key, alias=remove_alias)
+                for remove_alias in remove_list
+            ]
+            + [
                 self._directory_api.groups()
                 .aliases()
-                .insert(
-                    groupKey=f"{group.name}@{settings.GSUITE_DOMAIN}",
-                    body={"alias": insert_alias},
-                )
-            )
-
-        try:
-            batch.execute()
-        except HttpError:
-            logger.exception(f"Could not insert an alias for list {group.name}")
+                .insert(groupKey=group_key, body={"alias": insert_alias})
+                for insert_alias in insert_list
+            ],
+            f"Could not update an alias for list {group.name}",
+        ):
+            self._report_failure(group)
+            return False
 
         logger.info(f"List {group.name} aliases updated")
+        return True
 
     def archive_group(self, name):
         """Archive the given mailing list.
@@ -233,15 +347,25 @@ class GSuiteSyncService:
         :param name: Group name
         :return: True if the operation succeeded, False otherwise.
         """
+        self.report.archived.append(name)
+        if self.dry_run:
+            return True
+
+        cache.delete(self._snapshot_key(name))
+
         try:
             self._groups_settings_api.groups().patch(
                 groupUniqueId=f"{name}@{settings.GSUITE_DOMAIN}",
                 body={"archiveOnly": "true", "whoCanPostMessage": "NONE_CAN_POST"},
             ).execute()
-            self._update_group_members(GSuiteSyncService.GroupData(name, addresses=[]))
-            self._update_group_aliases(GSuiteSyncService.GroupData(name, aliases=[]))
+            members_removed = self._update_group_members(
+                GSuiteSyncService.GroupData(name, addresses=[])
+            )
+            aliases_removed = self._update_group_aliases(
+                GSuiteSyncService.GroupData(name, aliases=[])
+            )
             logger.info(f"List {name} archived")
-            return True
+            return members_removed and aliases_removed
         except HttpError:
             logger.exception(f"Could not archive list {name}")
             return False
@@ -252,6 +376,10 @@ class GSuiteSyncService:
         :param name: Group name
         :return: True if the operation succeeded, False otherwise.
         """
+        if self.dry_run:
+            return True
+
+        cache.delete(self._snapshot_key(name))
         try:
             self._directory_api.groups().delete(
                 groupKey=f"{name}@{settings.GSUITE_DOMAIN}",
@@ -262,16 +390,19 @@ class GSuiteSyncService:
             logger.exception(f"Could not delete list {name}")
             return False
 
-    def _update_group_members(self, group):
+    def _update_group_members(self, group, group_name=None):
         """Update the group members of the specified group based on the existing members.
 
         :param group: group data
+        :param group_name: the current name of the group, if it differs from the data
+        :return: True if the members were updated, False otherwise.
         """
+        group_key = f"{group_name or group.name}@{settings.GSUITE_DOMAIN}"
         try:
             members_response = (
                 self._directory_api.members()
                 .list(
-                    groupKey=f"{group.name}@{settings.GSUITE_DOMAIN}",
+                    groupKey=group_key,
                 )
                 .execute()
             )
@@ -280,63 +411,56 @@ class GSuiteSyncService:
                 members_response = (
                     self._directory_api.members()
                     .list(
-                        groupKey=f"{group.name}@{settings.GSUITE_DOMAIN}",
+                        groupKey=group_key,
                         pageToken=members_response["nextPageToken"],
                     )
                     .execute()
                 )
                 members_list += members_response.get("members", [])
 
-            existing_members = [
+            existing_members = {
                 m["email"].lower() for m in members_list if m["role"] == "MEMBER"
-            ]
-            existing_managers = [
+            }
+            existing_managers = {
                 m["email"].lower() for m in members_list if m["role"] == "MANAGER"
-            ]
+            }
         except HttpError:
             logger.exception(f"Could not obtain list member data for {group.name}")
-            return  # the list does not exist or something else is wrong
-        new_members = [x.lower() for x in group.addresses]
-
-        remove_list = [x for x in existing_members if x not in new_members]
-        insert_list = [
-            x
-            for x in new_members
-            if x not in existing_members and x not in existing_managers
-        ]
+            # The list does not exist or something else is wrong.
+            self._report_failure(group)
+            return False
+        new_members = {x.lower() for x in group.addresses}
+
+        remove_list = sorted(existing_members - new_members)
+        insert_list = sorted(new_members - existing_members - existing_managers)
+
+        if remove_list:
+            self.report.removed_members[group.name] = remove_list
+        if insert_list:
+            self.report.added_members[group.name] = insert_list
+        if self.dry_run:
+            return True
 
-        batch = self._directory_api.new_batch_http_request()
-        for remove_member in remove_list:
-            batch.add(
+        if not self._execute_batch(
+            [
                 self._directory_api.members().delete(
-                    groupKey=f"{group.name}@{settings.GSUITE_DOMAIN}",
-                    memberKey=remove_member,
+                    groupKey=group_key, memberKey=remove_member
                 )
-            )
-
-        try:
-            batch.execute()
-        except HttpError:
-            logger.exception(f"Could not remove a list member from {group.name}")
-
-        while insert_list:
-            insert_batch = insert_list[:900]
-            insert_list = insert_list[900:]
-            batch = self._directory_api.new_batch_http_request()
-            for insert_member in insert_batch:
-                batch.add(
-                    self._directory_api.members().insert(
-                        groupKey=f"{group.name}@{settings.GSUITE_DOMAIN}",
-                        body={"email": insert_member, "role": "MEMBER"},
-                    )
+                for remove_member in remove_list
+            ]
+            + [
+                self._directory_api.members().insert(
+                    groupKey=group_key, body={"email": insert_member, "role": "MEMBER"}
                 )
-
-            try:
-                batch.execute()
-            except HttpError:
-                logger.exception(f"Could not insert a list member in {group.name}")
+                for insert_member in insert_list
+            ],
+            f"Could not update a list member of {group.name}",
+        ):
+            self._report_failure(group)
+            return False
 
         logger.info(f"List {group.name} members updated")
+        return True
 
     @staticmethod
     def mailing_list_to_group(mailing_list):
@@ -374,11 +498,18 @@ class GSuiteSyncService:
             self._automatic_to_group(ml) for ml in get_automatic_lists()
         ]
 
-    def sync_mailing_lists(self, lists: list[GroupData] | None = None):
+    def sync_mailing_lists(self, lists: list[GroupData] | None = None, full=False):
         """Sync mailing lists with GSuite. Lists are only deleted if all lists are synced and thus no lists are passed to this function.
 
+        Lists that have not changed since they were last synced are skipped, unless
+        `full` is set. Note that changes made to groups outside of concrexit are
+        therefore only reverted once the snapshot of a group expires.
+
         :param lists: optional parameter to determine which lists to sync
+        :param full: push all lists, even if they have not changed
+        :return: a report of the changes that were made
         """
+        self.report = GSuiteSyncService.SyncReport()
         if lists is None:
             lists = self._get_default_lists()
 
@@ -399,24 +530,24 @@ class GSuiteSyncService:
                     .execute()
                 )
                 groups_list += groups_response.get("groups", [])
-            existing_groups = [
+            existing_groups = {
                 g["name"] for g in groups_list if int(g["directMembersCount"]) > 0
-            ]
-            archived_groups = [
+            }
+            archived_groups = {
                 g["name"] for g in groups_list if g["directMembersCount"] == "0"
-            ]
+            }
         except HttpError:
             logger.exception("Could not get the existing groups")
-            return  # there are no groups or something went wrong
+            return self.report  # there are no groups or something went wrong
 
-        new_groups = [
+        new_groups = {
             g.active_name if g.active_name else g.name
             for g in lists
             if len(g.addresses) > 0
-        ]
+        }
 
-        archive_list = [x for x in existing_groups if x not in new_groups]
-        insert_list = [x for x in new_groups if x not in existing_groups]
+        archive_list = existing_groups - new_groups
+        insert_list = new_groups - existing_groups
 
         for mailinglist in lists:
             if (
@@ -424,22 +555,48 @@ class GSuiteSyncService:
                 and mailinglist.name not in archived_groups
             ):
                 logger.debug(f"Starting create group of {mailinglist.name}")
-                if self.create_group(mailinglist):
+                if self.create_group(mailinglist) and not self.dry_run:
                     MailingList.objects.filter(name=mailinglist.name).update(
                         active_gsuite_name=mailinglist.name
                     )
+                    self._save_snapshot(mailinglist)
             elif len(mailinglist.addresses) > 0:
+                if not full and self._is_unchanged(mailinglist, existing_groups):
+                    self.report.unchanged.append(mailinglist.name)
+                    continue
+
                 logger.debug(f"Starting update group of {mailinglist.name}")
-                self.update_group(
-                    mailinglist.active_name
-                    if mailinglist.active_name
-                    else mailinglist.name,
-                    mailinglist,
-                )
+                if (
+                    self.update_group(
+                        mailinglist.active_name
+                        if mailinglist.active_name
+                        else mailinglist.name,
+                        mailinglist,
+                    )
+                    and not self.dry_run
+                ):
+                    self._save_snapshot(mailinglist)
 
-        for list_name in archive_list:
-            if list_name in existing_groups:
-                logger.debug(f"Starting archive group of {list_name}")
-                self.archive_group(list_name)
+        for list_name in sorted(archive_list):
+            logger.debug(f"Starting archive group of {list_name}")
+            self.archive_group(list_name)
 
         logger.info("Synchronisation ended.")
+        return self.report
+
+    def _is_unchanged(self, group, existing_groups):
+        """Check whether a group exists and is unchanged since it was last synced."""
+        return (
+            group.name in existing_groups
+            and cache.get(self._snapshot_key(group.name)) == group.hash
+        )
+
+    def _save_snapshot(self, group):
+        """Remember that a group is synced, unless some of its changes failed.
+
+        Failed groups are pushed again by the next sync, instead of being
+        skipped as unchanged until the snapshot would expire.
+        """
+        if group.name in self.report.failed:
+            return
+        cache.set(self._snapshot_key(group.name), group.hash, self.SNAPSHOT_TIMEOUT)
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from mailinglists.gsuite import GSuiteSyncService
+
+
+class Command(BaseCommand):
+    """Sync all mailing lists with GSuite, and report the changes."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            dest="dry-run",
+            default=False,
+            help="Only report the changes that would be made",
+        )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            default=False,
+            help="Also push lists that have not changed since the last sync",
+        )
+
+    def handle(self, *args, **options):
+        sync_service = GSuiteSyncService(dry_run=options["dry-run"])
+        report = sync_service.sync_mailing_lists(full=options["full"])
+        self.stdout.write(str(report))
@@ -1,6 +1,7 @@
 """The services defined by the mailinglists package."""
 
 from django.conf import settings
+from django.db.models import Q
 from django.utils import timezone
 
 from activemembers.models import (
@@ -55,14 +56,26 @@ def get_automatic_lists():
     )
     mentors = _get_members_email_addresses([x.member for x in active_mentorships])
 
-    oldmembers = [
-        m
-        for m in Member.objects.filter(profile__receive_oldmembers=True)
-        if (
-            m.current_membership is None
-            or m.current_membership.type != Membership.MEMBER
+    oldmembers = (
+        Member.objects.filter(profile__receive_oldmembers=True)
+        .with_current_membership_type()
+        .filter(
+            Q(current_membership_type__isnull=True)
+            | ~Q(current_membership_type=Membership.MEMBER)
         )
-    ]
+        .select_related("profile")
+    )
+
+    # Get the members of all membership types at once.
+    members_by_type = {
+        Membership.MEMBER: [],
+        Membership.BENEFACTOR: [],
+        Membership.HONORARY: [],
+    }
+    for member in Member.objects.with_current_membership(
+        *members_by_type
+    ).select_related("profile"):
+        members_by_type[member.current_membership_type].append(member)
 
     lists = [
         {
@@ -71,7 +84,7 @@ def get_automatic_lists():
             "description": "Automatic moderated mailinglist that can be used "
             "to send mail to all members",
             "addresses": _get_members_email_addresses(
-                Member.all_with_membership(Membership.MEMBER)
+                members_by_type[Membership.MEMBER]
             ),
             "moderated": True,
         },
@@ -81,7 +94,7 @@ def get_automatic_lists():
             "description": "Automatic moderated mailinglist that can be used "
             "to send mail to all benefactors",
             "addresses": _get_members_email_addresses(
-                Member.all_with_membership(Membership.BENEFACTOR)
+                members_by_type[Membership.BENEFACTOR]
             ),
             "moderated": True,
         },
@@ -91,7 +104,7 @@ def get_automatic_lists():
             "description": "Automatic moderated mailinglist that can be used "
             "to send mail to all honorary members",
             "addresses": _get_members_email_addresses(
-                Member.all_with_membership(Membership.HONORARY)
+                members_by_type[Membership.HONORARY]
             ),
             "moderated": True,
         },
@@ -109,9 +122,9 @@ def get_automatic_lists():
             "description": "Automatic moderated mailinglist that can be used "
             "to send mail to all members, benefactors, honorary members",
             "addresses": _get_members_email_addresses(
-                Member.all_with_membership(Membership.MEMBER)
-                + Member.all_with_membership(Membership.BENEFACTOR)
-                + Member.all_with_membership(Membership.HONORARY)
+                members_by_type[Membership.MEMBER]
+                + members_by_type[Membership.BENEFACTOR]
+                + members_by_type[Membership.HONORARY]
             ),
             "moderated": True,
         },
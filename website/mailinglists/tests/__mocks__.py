@@ -0,0 +1,183 @@
+from django.conf import settings
+
+from googleapiclient.errors import HttpError
+from httplib2 import Response
+
+
+class FakeRequest:
+    def __init__(self, api, method, kwargs, function):
+        self.api = api
+        self.method = method
+        self.kwargs = kwargs
+        self.function = function
+
+    def execute(self):
+        self.api.executed.append((self.method, self.kwargs))
+        return self.function(**self.kwargs)
+
+
+class FakeBatch:
+    def __init__(self, api, callback=None):
+        self.api = api
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request):
+        self.requests.append(request)
+
+    def execute(self):
+        self.api.batches += 1
+        for i, request in enumerate(self.requests):
+            response, exception = None, None
+            try:
+                response = request.execute()
+            except HttpError as e:
+                exception = e
+            if self.callback is not None:
+                self.callback(str(i), response, exception)
+
+
+class FakeResource:
+    """A resource of which every method returns a FakeRequest."""
+
+    def __init__(self, api, name, **methods):
+        self.api = api
+        self.name = name
+        self.methods = methods
+
+    def __getattr__(self, method):
+        if method not in self.methods:
+            raise AttributeError(method)
+
+        def request(**kwargs):
+            return FakeRequest(
+                self.api, f"{self.name}.{method}", kwargs, self.methods[method]
+            )
+
+        return request
+
+
+class FakeDirectoryAPI:
+    """An in-memory fake of the parts of the Directory API used by the sync service.
+
+    Groups are stored by name, as dicts with a set of members and a set of aliases.
+    Inserting one of the `failing_members` fails.
+    """
+
+    page_size = 2
+
+    def __init__(self, groups=None):
+        self.groups_data = groups or {}
+        self.executed = []
+        self.batches = 0
+        self.failing_members = set()
+
+    @property
+    def write_requests(self):
+        return [
+            (method, kwargs)
+            for method, kwargs in self.executed
+            if not method.endswith(".list")
+        ]
+
+    def _name(self, key):
+        return key.split("@")[0]
+
+    def _page(self, key, items, pageToken=None):  # noqa: N803
+        start = int(pageToken or 0)
+        response = {key: items[start : start + self.page_size]}
+        if start + self.page_size < len(items):
+            response["nextPageToken"] = str(start + self.page_size)
+        return response
+
+    def new_batch_http_request(self, callback=None):
+        return FakeBatch(self, callback)
+
+    def groups(self):
+        def list_groups(domain, pageToken=None):  # noqa: N803
+            return self._page(
+                "groups",
+                [
+                    {"name": name, "directMembersCount": str(len(g["members"]))}
+                    for name, g in sorted(self.groups_data.items())
+                ],
+                pageToken,
+            )
+
+        def insert(body):
+            self.groups_data[body["name"]] = {"members": {}, "aliases": set()}
+
+        def update(groupKey, body):  # noqa: N803
+            self.groups_data[body["name"]] = self.groups_data.pop(self._name(groupKey))
+
+        def delete(groupKey):  # noqa: N803
+            del self.groups_data[self._name(groupKey)]
+
+        resource = FakeResource(
+            self,
+            "groups",
+            list=list_groups,
+            insert=insert,
+            update=update,
+            delete=delete,
+        )
+        resource.aliases = self._aliases
+        return resource
+
+    def _aliases(self):
+        def list_aliases(groupKey):  # noqa: N803
+            aliases = self.groups_data[self._name(groupKey)]["aliases"]
+            return {"aliases": [{"alias": a} for a in sorted(aliases)]}
+
+        def insert(groupKey, body):  # noqa: N803
+            self.groups_data[self._name(groupKey)]["aliases"].add(body["alias"])
+
+        def delete(groupKey, alias):  # noqa: N803
+            self.groups_data[self._name(groupKey)]["aliases"].remove(alias)
+
+        return FakeResource(
+            self, "aliases", list=list_aliases, insert=insert, delete=delete
+        )
+
+    def members(self):
+        def list_members(groupKey, pageToken=None):  # noqa: N803
+            members = self.groups_data[self._name(groupKey)]["members"]
+            return self._page(
+                "members",
+                [{"email": e, "role": role} for e, role in sorted(members.items())],
+                pageToken,
+            )
+
+        def insert(groupKey, body):  # noqa: N803
+            if body["email"] in self.failing_members:
+                raise HttpError(Response({"status": 500}), b"")
+            members = self.groups_data[self._name(groupKey)]["members"]
+            members[body["email"]] = body["role"]
+
+        def delete(groupKey, memberKey):  # noqa: N803
+            del self.groups_data[self._name(groupKey)]["members"][memberKey]
+
+        return FakeResource(
+            self, "members", list=list_members, insert=insert, delete=delete
+        )
+
+
+class FakeGroupsSettingsAPI:
+    def __init__(self):
+        self.executed = []
+
+    def groups(self):
+        return FakeResource(
+            self,
+            "settings",
+            update=lambda **kwargs: None,
+            patch=lambda **kwargs: None,
+        )
+
+
+def fake_group(members=(), managers=(), aliases=()):
+    """Create the data of a group in a FakeDirectoryAPI."""
+    return {
+        "members": {m: "MEMBER" for m in members} | {m: "MANAGER" for m in managers},
+        "aliases": {f"{a}@{settings.GSUITE_DOMAIN}" for a in aliases},
+    }
@@ -9,6 +9,11 @@ from httplib2 import Response
 
 from mailinglists.gsuite import GSuiteSyncService
 from mailinglists.models import ListAlias, MailingList, VerbatimAddress
+from mailinglists.tests.__mocks__ import (
+    FakeDirectoryAPI,
+    FakeGroupsSettingsAPI,
+    fake_group,
+)
 
 
 def assert_not_called_with(self, *args, **kwargs):
@@ -457,3 +462,123 @@ class GSuiteSyncTestCase(TestCase):
         self.sync_service.create_group = original_create
         self.sync_service.update_group = original_update
         self.sync_service.archive_group = original_archive
+
+
+@override_settings(SUSPEND_SIGNALS=True)
+@mock.patch("mailinglists.gsuite.sleep")
+class GSuiteSyncFakeAPITestCase(TestCase):
+    def setUp(self):
+        self.directory_api = FakeDirectoryAPI(
+            {
+                "members": fake_group(
+                    members=["a@example.com", "old@example.com"],
+                    managers=["manager@example.com"],
+                    aliases=["leden"],
+                ),
+                "unused": fake_group(members=["a@example.com"]),
+            }
+        )
+        self.settings_api = FakeGroupsSettingsAPI()
+        self.lists = [
+            GSuiteSyncService.GroupData(
+                "members",
+                aliases=["leden", "members-alias"],
+                addresses=["a@example.com", "B@example.com", "manager@example.com"],
+            ),
+            GSuiteSyncService.GroupData("new", addresses=["c@example.com"]),
+        ]
+
+    def test_dry_run(self, sleep_mock):
+        sync_service = GSuiteSyncService(
+            self.settings_api, self.directory_api, dry_run=True
+        )
+
+        report = sync_service.sync_mailing_lists(self.lists)
+
+        self.assertEqual(self.directory_api.write_requests, [])
+        self.assertEqual(report.created, ["new"])
+        self.assertEqual(report.updated, ["members"])
+        self.assertEqual(report.archived, ["unused"])
+        self.assertEqual(report.added_members["members"], ["b@example.com"])
+        self.assertEqual(report.removed_members["members"], ["old@example.com"])
+        self.assertEqual(
+            report.added_aliases["members"], [f"members-alias@{settings.GSUITE_DOMAIN}"]
+        )
+        self.assertEqual(report.added_members["new"], ["c@example.com"])
+        self.assertIn("members: +1 -1 members", str(report))
+
+    def test_sync_pushes_only_changed_lists(self, sleep_mock):
+        sync_service = GSuiteSyncService(self.settings_api, self.directory_api)
+
+        sync_service.sync_mailing_lists(self.lists)
+
+        self.assertEqual(
+            self.directory_api.groups_data["members"]["members"],
+            {
+                "a@example.com": "MEMBER",
+                "b@example.com": "MEMBER",
+                "manager@example.com": "MANAGER",
+            },
+        )
+        self.assertEqual(
+            self.directory_api.groups_data["new"]["members"],
+            {"c@example.com": "MEMBER"},
+        )
+        self.assertEqual(self.directory_api.groups_data["unused"]["members"], {})
+
+        self.directory_api.executed.clear()
+        report = sync_service.sync_mailing_lists(self.lists)
+
+        self.assertEqual(report.unchanged, ["members", "new"])
+        self.assertEqual(self.directory_api.write_requests, [])
+        self.assertEqual(
+            [method for method, _ in self.directory_api.executed],
+            ["groups.list", "groups.list"],
+        )
+
+        self.lists[1].addresses = ["d@example.com"]
+        report = sync_service.sync_mailing_lists(self.lists)
+        self.assertEqual(report.updated, ["new"])
+        self.assertEqual(report.unchanged, ["members"])
+
+        report = sync_service.sync_mailing_lists(self.lists, full=True)
+        self.assertEqual(report.updated, ["members", "new"])
+
+    @mock.patch("mailinglists.gsuite.logger")
+    def test_failed_lists_are_pushed_again(self, logger_mock, sleep_mock):
+        sync_service = GSuiteSyncService(self.settings_api, self.directory_api)
+        self.directory_api.failing_members = {"b@example.com"}
+
+        report = sync_service.sync_mailing_lists(self.lists)
+
+        self.assertEqual(report.failed, ["members"])
+        self.assertIn("Failed: members", str(report))
+        self.assertNotIn(
+            "b@example.com", self.directory_api.groups_data["members"]["members"]
+        )
+
+        self.directory_api.failing_members = set()
+        report = sync_service.sync_mailing_lists(self.lists)
+
+        self.assertEqual(report.failed, [])
+        self.assertEqual(report.updated, ["members"])
+        self.assertEqual(report.unchanged, ["new"])
+        self.assertIn(
+            "b@example.com", self.directory_api.groups_data["members"]["members"]
+        )
+
+    def test_members_are_changed_in_one_batch(self, sleep_mock):
+        self.directory_api.groups_data["members"] = fake_group(
+            members=[f"old{i}@example.com" for i in range(500)]
+        )
+        sync_service = GSuiteSyncService(self.settings_api, self.directory_api)
+        self.directory_api.page_size = 200
+
+        sync_service._update_group_members(
+            GSuiteSyncService.GroupData(
+                "members", addresses=[f"new{i}@example.com" for i in range(300)]
+            )
+        )
+
+        self.assertEqual(self.directory_api.batches, 1)
+        self.assertEqual(len(self.directory_api.groups_data["members"]["members"]), 300)
@@ -1,13 +1,13 @@
 import copy
 
-from django.db.models import Prefetch, Q, prefetch_related_objects
-from django.utils import timezone
+from django.db.models import prefetch_related_objects
 
 from rest_framework.generics import ListAPIView
 from rest_framework.permissions import IsAuthenticated
 
 from members.api.calendarjs.serializers import MemberBirthdaySerializer
-from members.models import Member, Membership
+from members.models import Member
+from members.models.member import current_membership_prefetch
 from utils.snippets import extract_date_range
 
 
@@ -49,16 +49,9 @@ class CalendarJSBirthdayListView(ListAPIView):
         all_birthdays = [self._get_birthdays(m, start, end) for m in queryset.all()]
         birthdays = [x for sublist in all_birthdays for x in sublist]
 
-        today = timezone.now().date()
         prefetch_related_objects(
             birthdays,
-            Prefetch(
-                "membership_set",
-                queryset=Membership.objects.filter(
-                    Q(until__isnull=True) | Q(until__gt=today), since__lte=today
-                ).order_by("-since")[:1],
-                to_attr="_current_membership",
-            ),
+            current_membership_prefetch(),
         )
 
         return birthdays
@@ -63,6 +63,9 @@ class MemberSerializer(CleanedModelSerializer):
         return member_societies(instance)
 
     def _membership_type(self, instance):
+        # Use the annotation of `with_current_membership_type` if available.
+        if hasattr(instance, "current_membership_type"):
+            return instance.current_membership_type
         membership = instance.current_membership
         if membership:
             return membership.type
@@ -1,8 +1,6 @@
 """API views of the activemembers app."""
 
-from django.db.models import Prefetch, Q
 from django.shortcuts import get_object_or_404
-from django.utils import timezone
 
 from oauth2_provider.contrib.rest_framework import IsAuthenticatedOrTokenHasScope
 from rest_framework import filters as framework_filters
@@ -15,7 +13,7 @@ from members.api.v2.serializers.member import (
     MemberListSerializer,
     MemberSerializer,
 )
-from members.models import Member, Membership
+from members.models import Member
 from thaliawebsite.api.openapi import OAuthAutoSchema
 from thaliawebsite.api.v2.permissions import IsAuthenticatedOrTokenHasScopeForMethod
 from utils.media.services import fetch_thumbnails
@@ -27,21 +25,7 @@ class MemberListView(ListAPIView):
     serializer_class = MemberListSerializer
 
     def get_queryset(self):
-        today = timezone.now().date()
-        return (
-            Member.objects.all()
-            .select_related("profile")
-            .prefetch_related(
-                "membership_set",
-                Prefetch(
-                    "membership_set",
-                    queryset=Membership.objects.filter(
-                        Q(until__isnull=True) | Q(until__gt=today), since__lte=today
-                    ).order_by("-since")[:1],
-                    to_attr="_current_membership",
-                ),
-            )
-        )
+        return Member.objects.with_current_membership_type().select_related("profile")
 
     def get_serializer(self, *args, **kwargs):
         if len(args) > 0:
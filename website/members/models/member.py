@@ -4,7 +4,7 @@ from datetime import timedelta
 from functools import reduce
 
 from django.contrib.auth.models import User, UserManager
-from django.db.models import Q
+from django.db.models import OuterRef, Prefetch, Q, QuerySet, Subquery
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.functional import cached_property
@@ -16,7 +16,51 @@ from members.models.membership import Membership
 logger = logging.getLogger(__name__)
 
 
-class MemberManager(UserManager):
+def current_membership_prefetch(lookup="membership_set") -> Prefetch:
+    """Prefetch the current membership, which is used by `Member.current_membership`.
+
+    :param lookup: the lookup of the memberships to prefetch, for example
+        `member__membership_set` when prefetching for a queryset of registrations.
+    """
+    today = timezone.now().date()
+    return Prefetch(
+        lookup,
+        queryset=Membership.objects.filter(
+            Q(until__isnull=True) | Q(until__gt=today), since__lte=today
+        ).order_by("-since")[:1],
+        to_attr="_current_membership",
+    )
+
+
+class MemberQuerySet(QuerySet):
+    def with_current_membership_type(self):
+        """Annotate the type of each member's current membership.
+
+        The type is available as `current_membership_type`, which is None
+        for members without a current membership. This resolves the type in
+        the same query, instead of in one query per member.
+        """
+        today = timezone.now().date()
+        return self.annotate(
+            current_membership_type=Subquery(
+                Membership.objects.filter(
+                    Q(until__isnull=True) | Q(until__gt=today),
+                    user=OuterRef("pk"),
+                    since__lte=today,
+                )
+                .order_by("-since")
+                .values("type")[:1]
+            )
+        )
+
+    def with_current_membership(self, *membership_types):
+        """Select the members whose current membership has one of the given types."""
+        return self.with_current_membership_type().filter(
+            current_membership_type__in=membership_types
+        )
+
+
+class MemberManager(UserManager.from_queryset(MemberQuerySet)):
     """Get all members, i.e. all users with a profile."""
 
     def get_queryset(self):
@@ -178,11 +222,7 @@ class Member(User):
         :return: List of users
         :rtype: [Member]
         """
-        return [
-            x
-            for x in cls.objects.all()
-            if x.current_membership and x.current_membership.type == membership_type
-        ]
+        return list(cls.objects.with_current_membership(membership_type))
 
     @property
     def can_attend_events(self):
@@ -3,7 +3,7 @@ from django.templatetags.static import static
 from django.urls import reverse
 
 from thaliawebsite.templatetags.grid_item import grid_item
-from utils.media.services import get_media_url
+from utils.media.services import get_thumbnail_url
 
 register = template.Library()
 
@@ -14,7 +14,7 @@ def member_card(member, meta_text=None, ribbon=None):
         meta_text = f'<p class="px-1">Cohort: {member.profile.starting_year}</p>'
 
     if member.profile.photo:
-        image_url = get_media_url(member.profile.photo.thumbnails.small)
+        image_url = get_thumbnail_url(member.profile.photo, "small")
     else:
         image_url = static("members/images/default-avatar.jpg")
 
@@ -136,6 +136,40 @@ class MemberTest(TestCase):
             self.assertIsNone(member.current_membership)
             self.assertEqual(member.latest_membership, latest_membership)
 
+    def test_with_current_membership_type(self):
+        member = Member.objects.get(pk=1)
+        member.membership_set.all().delete()
+        Membership.objects.create(
+            user=member, since="2022-09-01", until="2023-09-01", type=Membership.MEMBER
+        )
+        Membership.objects.create(
+            user=member, since="2023-09-01", type=Membership.HONORARY
+        )
+
+        for date, membership_type in [
+            ("2022-08-25", None),
+            ("2022-09-01", Membership.MEMBER),
+            ("2023-09-01", Membership.HONORARY),
+        ]:
+            with self.subTest(date=date), freeze_time(date):
+                with self.assertNumQueries(1):
+                    members = list(Member.objects.with_current_membership_type())
+
+                for m in members:
+                    m.refresh_from_db()
+                    self.assertEqual(
+                        m.current_membership_type,
+                        m.current_membership and m.current_membership.type,
+                    )
+                self.assertEqual(
+                    next(m for m in members if m == member).current_membership_type,
+                    membership_type,
+                )
+                self.assertEqual(
+                    member in Member.all_with_membership(Membership.HONORARY),
+                    membership_type == Membership.HONORARY,
+                )
+
 
 class MemberDisplayNameTest(TestCase):
     @classmethod
@@ -9,6 +9,7 @@ from .models import (
     MoneybirdPayment,
     MoneybirdProject,
     MoneybirdReceipt,
+    MoneybirdSynchronizationRun,
 )
 
 
@@ -84,6 +85,9 @@ class MoneybirdExternalInvoiceAdmin(admin.ModelAdmin):
         ("payable_model", RelatedOnlyFieldListFilter),
     )
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related("payable_object")
+
     def payable_object(self, obj: MoneybirdExternalInvoice) -> str:
         payable_object = obj.payable_object
         if payable_object:
@@ -190,3 +194,25 @@ class MoneybirdReceiptAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         qs = super().get_queryset(request)
         return qs.select_related("reimbursement")
+
+
+@admin.register(MoneybirdSynchronizationRun)
+class MoneybirdSynchronizationRunAdmin(admin.ModelAdmin):
+    """Show the statistics of recent synchronizations."""
+
+    list_display = (
+        "started_at",
+        "full",
+        "duration",
+        "changes",
+        "queries",
+        "api_calls",
+    )
+
+    list_filter = ("full",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -7,15 +7,16 @@ can be found on GitHub: https://github.com/jjkester/moneybird-python.
 
 import functools
 import logging
+import threading
 import time
 from abc import ABC, abstractmethod
-from datetime import datetime
 from functools import reduce
 from urllib.parse import urljoin
 
 from django.conf import settings
 
 import requests
+import requests.adapters
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +25,7 @@ class Administration(ABC):
     """A MoneyBird administration."""
 
     administration_id = None
+    api_base_url = "https://moneybird.com/api/v2/"
 
     def __init__(self, administration_id: int):
         self.administration_id = administration_id
@@ -88,9 +90,8 @@ class Administration(ABC):
                 "The resource path must not start with a slash."
             )
 
-        api_base_url = "https://moneybird.com/api/v2/"
         url_parts = [
-            api_base_url,
+            self.api_base_url,
             f"{self.administration_id}/",
             f"{resource_path}.json",
         ]
@@ -154,95 +155,162 @@ class Administration(ABC):
         return response.json()
 
 
-def _retry_if_throttled():
-    max_retries = 3
-
-    def decorator_retry(func):
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
-            retries = 0
-            while retries < max_retries:
-                try:
-                    return func(*args, **kwargs)
-                except HttpsAdministration.Throttled as e:
-                    retries += 1
-                    retry_after = datetime.fromtimestamp(float(e.retry_after))
-                    now = datetime.now()
-                    sleep_seconds = int(retry_after.timestamp() - now.timestamp()) + 1
-                    if retries < max_retries:
-                        logger.info(f"Retrying in {sleep_seconds} seconds...")
-                        time.sleep(sleep_seconds)
-                    else:
-                        logger.warning("Max retries reached. Giving up.")
-            return None
+class RateLimiter:
+    """A token bucket that follows the rate limit reported by Moneybird.
+
+    Every response contains the number of requests that remain in the current
+    rate limit window and the time at which the window resets, in the
+    `RateLimit-*` headers. Each request takes a token from the bucket, which is
+    refilled when the window resets. When the bucket is empty, requests wait
+    for the reset instead of being throttled by Moneybird.
+    """
+
+    def __init__(self, limit: int = 150):
+        self.limit = limit
+        self.tokens = limit
+        self.reset_at: float | None = None
+        self.acquired = 0  # The total number of requests made.
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Take a token from the bucket, waiting until one is available."""
+        while True:
+            with self._lock:
+                now = time.time()
+                if self.reset_at is not None and now >= self.reset_at:
+                    self.tokens = self.limit
+                    self.reset_at = None
+                if self.tokens > 0:
+                    self.tokens -= 1
+                    self.acquired += 1
+                    return
+                if self.reset_at is None:
+                    self.reset_at = now + 1
+                wait = self.reset_at - now
+
+            logger.info(f"Rate limit reached, waiting {wait:.1f} seconds...")
+            time.sleep(wait)
+
+    def update(self, headers) -> None:
+        """Update the bucket with the rate limit headers of a response."""
+        try:
+            limit = int(headers["RateLimit-Limit"])
+            remaining = int(headers["RateLimit-Remaining"])
+            reset_at = float(headers["RateLimit-Reset"])
+        except (KeyError, TypeError, ValueError):
+            return
+
+        with self._lock:
+            self.limit = limit
+            # Other requests may still be in progress, so never add tokens here.
+            self.tokens = min(self.tokens, remaining)
+            self.reset_at = reset_at
+
+    def throttled(self, retry_after) -> None:
+        """Empty the bucket until `retry_after`, after a request was throttled."""
+        try:
+            retry_at = float(retry_after)
+        except (TypeError, ValueError):
+            retry_at = time.time() + 1
+
+        with self._lock:
+            self.tokens = 0
+            self.reset_at = max(retry_at, self.reset_at or 0)
 
-        return wrapper
 
-    return decorator_retry
+class HttpsAdministration(Administration):
+    """The HTTPS implementation of the MoneyBird Administration interface.
 
+    An administration holds a pool of connections and a rate limiter, and can be
+    used from multiple threads at the same time. Use `get_shared_administration`
+    to share them between all users of the API.
+    """
 
-class HttpsAdministration(Administration):
-    """The HTTPS implementation of the MoneyBird Administration interface."""
+    max_retries = 3
 
-    def __init__(self, key: str, administration_id: int):
+    def __init__(
+        self,
+        key: str,
+        administration_id: int,
+        api_base_url: str | None = None,
+        max_connections: int | None = None,
+    ):
         """Create a new MoneyBird administration connection."""
         super().__init__(administration_id)
         self.key = key
+        if api_base_url is not None:
+            self.api_base_url = api_base_url
+        self.max_connections = max_connections or settings.MONEYBIRD_SYNC_WORKERS
+        self.rate_limiter = RateLimiter()
         self.session = self._create_session()
 
     def _create_session(self) -> requests.Session:
         session = requests.Session()
         session.headers.update({"Authorization": f"Bearer {self.key}"})
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=self.max_connections)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
         return session
 
-    @_retry_if_throttled()
+    @property
+    def request_count(self) -> int:
+        """The number of requests made by this administration, including retries."""
+        return self.rate_limiter.acquired
+
+    def _request(self, method: str, resource_path: str, **kwargs):
+        url = self._build_url(resource_path)
+        for attempt in range(1, self.max_retries + 1):
+            self.rate_limiter.acquire()
+            response = self.session.request(method, url, **kwargs)
+            self.rate_limiter.update(response.headers)
+            try:
+                return self._process_response(response)
+            except Administration.Throttled as e:
+                self.rate_limiter.throttled(e.retry_after)
+                if attempt == self.max_retries:
+                    logger.warning("Max retries reached. Giving up.")
+                    raise
+                logger.info("Throttled, retrying...")
+
     def get(self, resource_path: str, params: dict | None = None):
         """Do a GET on the Moneybird administration."""
-        url = self._build_url(resource_path)
-        logger.debug(f"GET {url} {params}")
-        response = self.session.get(url, params=params)
-        return self._process_response(response)
+        logger.debug(f"GET {resource_path} {params}")
+        return self._request("GET", resource_path, params=params)
 
-    @_retry_if_throttled()
     def post(self, resource_path: str, data: dict):
         """Do a POST request for json data on the Moneybird administration."""
-        url = self._build_url(resource_path)
-        logger.debug(f"POST {url} with {data}")
-        response = self.session.post(url, json=data)
-        return self._process_response(response)
+        logger.debug(f"POST {resource_path} with {data}")
+        return self._request("POST", resource_path, json=data)
 
-    @_retry_if_throttled()
     def post_files(self, resource_path: str, files: dict[str, bytes]):
         """Do a POST request for a file or other data on the Moneybird administration."""
-        url = self._build_url(resource_path)
-        logger.debug(f"POST {url} with {files}")
-        response = self.session.post(url, files=files)
-        return self._process_response(response)
+        logger.debug(f"POST {resource_path} with {files}")
+        return self._request("POST", resource_path, files=files)
 
-    @_retry_if_throttled()
     def patch(self, resource_path: str, data: dict):
         """Do a PATCH request on the Moneybird administration."""
-        url = self._build_url(resource_path)
-        logger.debug(f"PATCH {url} with {data}")
-        response = self.session.patch(url, json=data)
-        return self._process_response(response)
+        logger.debug(f"PATCH {resource_path} with {data}")
+        return self._request("PATCH", resource_path, json=data)
 
-    @_retry_if_throttled()
     def delete(self, resource_path: str, data: dict | None = None):
         """Do a DELETE on the Moneybird administration."""
-        url = self._build_url(resource_path)
-        logger.debug(f"DELETE {url}")
-        response = self.session.delete(url, json=data)
-        return self._process_response(response)
+        logger.debug(f"DELETE {resource_path}")
+        return self._request("DELETE", resource_path, json=data)
 
 
 class MoneybirdNotConfiguredError(RuntimeError):
     pass
 
 
+@functools.cache
+def get_shared_administration(key: str, administration_id: int) -> HttpsAdministration:
+    """Return the administration for a key, shared with all other threads."""
+    return HttpsAdministration(key, administration_id)
+
+
 def get_moneybird_administration():
     if settings.MONEYBIRD_ADMINISTRATION_ID and settings.MONEYBIRD_API_KEY:
-        return HttpsAdministration(
+        return get_shared_administration(
             settings.MONEYBIRD_API_KEY, settings.MONEYBIRD_ADMINISTRATION_ID
         )
     raise MoneybirdNotConfiguredError()
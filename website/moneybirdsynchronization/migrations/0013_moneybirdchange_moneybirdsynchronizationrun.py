@@ -0,0 +1,47 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:41
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('moneybirdsynchronization', '0012_remove_moneybirdreceipt_moneybird_attachment_id_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MoneybirdSynchronizationRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('full', models.BooleanField(help_text='Whether all objects were scanned, instead of only the changed ones.')),
+                ('started_at', models.DateTimeField()),
+                ('duration', models.DurationField(null=True)),
+                ('changes', models.PositiveIntegerField(default=0, help_text='The number of recorded changes that were processed.')),
+                ('queries', models.PositiveIntegerField(default=0, help_text='The number of database queries.')),
+                ('api_calls', models.PositiveIntegerField(default=0, help_text='The number of requests to the Moneybird API.')),
+            ],
+            options={
+                'verbose_name': 'moneybird synchronization run',
+                'verbose_name_plural': 'moneybird synchronization runs',
+                'ordering': ('-started_at',),
+            },
+        ),
+        migrations.CreateModel(
+            name='MoneybirdChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.CharField(max_length=255)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'verbose_name': 'moneybird change',
+                'verbose_name_plural': 'moneybird changes',
+                'unique_together': {('content_type', 'object_id')},
+            },
+        ),
+    ]
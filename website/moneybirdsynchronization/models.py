@@ -3,7 +3,7 @@ import datetime
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
-from django.db import models
+from django.db import models, transaction
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
@@ -285,9 +285,16 @@ class MoneybirdExternalInvoice(models.Model):
         if project_name is not None:
             project, __ = MoneybirdProject.objects.get_or_create(name=project_name)
             if project.moneybird_id is None:
-                response = moneybird.create_project(project.to_moneybird())
-                project.moneybird_id = response["id"]
-                project.save()
+                # Invoices are pushed by concurrent workers, so lock the project
+                # and check it again, to only create it on Moneybird once.
+                with transaction.atomic():
+                    project = MoneybirdProject.objects.select_for_update().get(
+                        pk=project.pk
+                    )
+                    if project.moneybird_id is None:
+                        response = moneybird.create_project(project.to_moneybird())
+                        project.moneybird_id = response["id"]
+                        project.save()
 
             project_id = project.moneybird_id
 
@@ -467,3 +474,73 @@ class MoneybirdPayment(models.Model):
     class Meta:
         verbose_name = _("moneybird payment")
         verbose_name_plural = _("moneybird payments")
+
+
+class MoneybirdChange(models.Model):
+    """An object that has changed since the last synchronization.
+
+    The signal handlers record changes to members and payables here, so that
+    the synchronization only has to look at these objects, instead of scanning
+    all of them for anything that is missing on Moneybird.
+    """
+
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.CharField(max_length=255)
+    changed_object = GenericForeignKey("content_type", "object_id")
+
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    @classmethod
+    def record(cls, obj):
+        """Record a change to `obj`, or update the time of an earlier change."""
+        cls.objects.bulk_create(
+            [
+                cls(
+                    content_type=ContentType.objects.get_for_model(obj),
+                    object_id=obj.pk,
+                )
+            ],
+            update_conflicts=True,
+            unique_fields=["content_type", "object_id"],
+            update_fields=["changed_at"],
+        )
+
+    def __str__(self):
+        return f"Change to {self.content_type.model} {self.object_id}"
+
+    class Meta:
+        verbose_name = _("moneybird change")
+        verbose_name_plural = _("moneybird changes")
+        unique_together = ("content_type", "object_id")
+
+
+class MoneybirdSynchronizationRun(models.Model):
+    """Statistics of a synchronization, to keep an eye on its cost."""
+
+    full = models.BooleanField(
+        help_text="Whether all objects were scanned, instead of only the changed ones.",
+    )
+
+    started_at = models.DateTimeField()
+
+    duration = models.DurationField(null=True)
+
+    changes = models.PositiveIntegerField(
+        default=0, help_text="The number of recorded changes that were processed."
+    )
+
+    queries = models.PositiveIntegerField(
+        default=0, help_text="The number of database queries."
+    )
+
+    api_calls = models.PositiveIntegerField(
+        default=0, help_text="The number of requests to the Moneybird API."
+    )
+
+    def __str__(self):
+        return f"Moneybird synchronization at {self.started_at}"
+
+    class Meta:
+        verbose_name = _("moneybird synchronization run")
+        verbose_name_plural = _("moneybird synchronization runs")
+        ordering = ("-started_at",)
@@ -3,12 +3,12 @@ from decimal import Decimal
 from django.conf import settings
 from django.core.files import File
 
-from moneybirdsynchronization.administration import HttpsAdministration
+from moneybirdsynchronization.administration import get_shared_administration
 
 
 class MoneybirdAPIService:
     def __init__(self, administration_id, api_key):
-        self._administration = HttpsAdministration(api_key, administration_id)
+        self._administration = get_shared_administration(api_key, administration_id)
 
     def create_contact(self, contact_data):
         return self._administration.post("contacts", contact_data)
@@ -1,22 +1,33 @@
 import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from datetime import timedelta
 
 from django.conf import settings
 from django.contrib.admin.utils import model_ngettext
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import connection
 from django.db.models import CharField, Exists, F, OuterRef, Q, Subquery
 from django.db.models.functions import Cast
 from django.utils import timezone
 
-from events.models import EventRegistration
+from events.models import Event, EventRegistration
 from members.models import Member
-from moneybirdsynchronization.administration import Administration
+from moneybirdsynchronization.administration import (
+    Administration,
+    get_moneybird_administration,
+)
 from moneybirdsynchronization.emails import send_sync_error
 from moneybirdsynchronization.models import (
+    MoneybirdChange,
     MoneybirdContact,
     MoneybirdExternalInvoice,
     MoneybirdPayment,
     MoneybirdReceipt,
+    MoneybirdSynchronizationRun,
     financial_account_id_for_payment_type,
 )
 from moneybirdsynchronization.moneybird import get_moneybird_api_service
@@ -28,6 +39,48 @@ from sales.models.order import Order
 
 logger = logging.getLogger(__name__)
 
+# How long the statistics of synchronization runs are kept.
+RUN_RETENTION = timedelta(days=30)
+
+
+def _push_to_moneybird(push, objects, get_error_object=None):
+    """Call `push` for each object, reporting synchronization errors.
+
+    The objects are pushed concurrently by a bounded pool of worker threads,
+    which share the connection pool and rate limit of the Moneybird client.
+    Within a transaction the objects are pushed one by one instead, because the
+    workers use their own database connections. The workers use the execute
+    wrappers of the calling thread's connection as well.
+    """
+
+    def push_object(obj):
+        try:
+            push(obj)
+        except Administration.Error as e:
+            logger.exception("Moneybird synchronization error: %s", e)
+            send_sync_error(e, get_error_object(obj) if get_error_object else obj)
+
+    if settings.MONEYBIRD_SYNC_WORKERS <= 1 or connection.in_atomic_block:
+        for obj in objects:
+            push_object(obj)
+        return
+
+    execute_wrappers = list(connection.execute_wrappers)
+
+    def push_object_in_worker(obj):
+        with ExitStack() as stack:
+            for wrapper in execute_wrappers:
+                stack.enter_context(connection.execute_wrapper(wrapper))
+            try:
+                push_object(obj)
+            finally:
+                connection.close()
+
+    with ThreadPoolExecutor(max_workers=settings.MONEYBIRD_SYNC_WORKERS) as executor:
+        # Consume the results to raise any unexpected exceptions.
+        for _ in executor.map(push_object_in_worker, objects):
+            pass
+
 
 def create_or_update_contact(member: Member):
     """Push a Django user/member to Moneybird."""
@@ -231,19 +284,103 @@ def create_receipt(reimbursement: Reimbursement):
     return moneybird_receipt
 
 
-def synchronize_moneybird():
-    """Perform all synchronization to moneybird."""
+def synchronize_moneybird(full=True):
+    """Perform all synchronization to moneybird.
+
+    A full synchronization scans all objects for anything that is missing or
+    outdated on Moneybird. Otherwise, only the objects for which the signal
+    handlers have recorded a `MoneybirdChange` are synchronized. A full
+    synchronization should still run regularly, to reconcile changes that do not
+    trigger signals (such as bulk updates) and objects that failed to synchronize.
+
+    Returns a `MoneybirdSynchronizationRun` with statistics of the synchronization.
+    """
     if not settings.MONEYBIRD_SYNC_ENABLED:
-        return
+        return None
+
+    logger.info(
+        "Starting %s moneybird synchronization.", "full" if full else "incremental"
+    )
+
+    run = MoneybirdSynchronizationRun(full=full, started_at=timezone.now())
+    administration = get_moneybird_administration()
+    api_calls = administration.request_count
+    queries = _QueryCounter()
+
+    # Changes recorded after this point are left for the next run, as the
+    # objects may already have been synchronized before they changed.
+    changes = MoneybirdChange.objects.filter(changed_at__lte=run.started_at)
+
+    with connection.execute_wrapper(queries):
+        change_ids = []
+        object_ids = None if full else defaultdict(list)
+        for change_id, content_type_id, object_id in changes.values_list(
+            "pk", "content_type", "object_id"
+        ):
+            change_ids.append(change_id)
+            if not full:
+                object_ids[content_type_id].append(object_id)
+        run.changes = len(change_ids)
+
+        _sync_objects(object_ids)
+        # Only delete the changes that were read. Changes that were committed
+        # after they were read, even with an earlier time, are left for the next
+        # run. So are changes that were recorded again in the meantime.
+        changes.filter(pk__in=change_ids).delete()
+
+    run.duration = timezone.now() - run.started_at
+    run.queries = queries.count
+    run.api_calls = administration.request_count - api_calls
+    run.save()
+
+    if full:
+        MoneybirdSynchronizationRun.objects.filter(
+            started_at__lt=run.started_at - RUN_RETENTION
+        ).delete()
+
+    logger.info(
+        "Finished moneybird synchronization of %d changes in %s, "
+        "using %d queries and %d API calls.",
+        run.changes,
+        run.duration,
+        run.queries,
+        run.api_calls,
+    )
+    return run
+
+
+class _QueryCounter:
+    """A database execute wrapper that counts the queries of any thread it is used in."""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self._lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _sync_objects(object_ids=None):
+    """Push all objects that are missing or outdated to Moneybird.
+
+    If `object_ids` is given, it maps content type ids to the ids of changed
+    objects, and only those objects are considered. Contacts and invoices that
+    are flagged to be synchronized or deleted are always processed.
+    """
 
-    logger.info("Starting moneybird synchronization.")
+    def changed(model):
+        if object_ids is None:
+            return None
+        return object_ids.get(ContentType.objects.get_for_model(model).pk, [])
 
-    _sync_contacts()
+    _sync_contacts(changed(Member))
 
     # Push all payments to moneybird. This needs to be done before the invoices,
     # as creating/updating invoices will link the payments to the invoices if they
     # already exist on moneybird.
-    _sync_moneybird_payments()
+    _sync_moneybird_payments(changed(Payment))
 
     # Delete invoices and receipts that have been marked for deletion.
     _delete_invoices()
@@ -252,14 +389,12 @@ def synchronize_moneybird():
     _sync_outdated_invoices()
 
     # Push all invoices and receipts to moneybird.
-    _sync_food_orders()
-    _sync_sales_orders()
-    _sync_registrations()
-    _sync_renewals()
-    _sync_event_registrations()
-    _sync_receipts()
-
-    logger.info("Finished moneybird synchronization.")
+    _sync_food_orders(changed(FoodOrder))
+    _sync_sales_orders(changed(Order))
+    _sync_registrations(changed(Registration))
+    _sync_renewals(changed(Renewal))
+    _sync_event_registrations(changed(Event))
+    _sync_receipts(changed(Reimbursement))
 
 
 def _delete_invoices():
@@ -280,55 +415,58 @@ def _delete_invoices():
 
 def _sync_outdated_invoices():
     """Resynchronize all invoices that have been marked as outdated."""
-    invoices = MoneybirdExternalInvoice.objects.filter(
-        needs_synchronization=True, needs_deletion=False
-    ).order_by("payable_model", "object_id")
+    invoices = (
+        MoneybirdExternalInvoice.objects.filter(
+            needs_synchronization=True, needs_deletion=False
+        )
+        .order_by("payable_model", "object_id")
+        .prefetch_related("payable_object")
+    )
 
     logger.info("Resynchronizing %d invoices.", invoices.count())
+    payables = []
     for invoice in invoices:
         try:
             instance = invoice.payable_object
         except ObjectDoesNotExist:
-            logger.exception("Payable object for outdated invoice does not exist.")
+            instance = None
         if instance is None:
-            logger.exception("Payable object for outdated invoice does not exist.")
+            logger.error("Payable object for outdated invoice does not exist.")
+        else:
+            payables.append(instance)
 
-        try:
-            create_or_update_external_invoice(instance)
-        except Administration.Error as e:
-            logger.exception("Moneybird synchronization error: %s", e)
-            send_sync_error(e, instance)
+    _push_to_moneybird(create_or_update_external_invoice, payables)
 
 
-def _sync_contacts():
+def _sync_contacts(member_ids=None):
     logger.info("Synchronizing contacts...")
-    # Make moneybird contacts for people that dont have.
-    for member in Member.objects.filter(
+    new_members = Member.objects.filter(
         moneybird_contact__isnull=True, profile__is_minimized=False
-    ):
-        try:
-            create_or_update_contact(member)
-        except Administration.Error as e:
-            logger.exception("Moneybird synchronization error: %s", e)
-            send_sync_error(e, member)
+    )
+    minimized_contacts = MoneybirdContact.objects.filter(
+        member__profile__is_minimized=True
+    )
+    if member_ids is not None:
+        new_members = new_members.filter(pk__in=member_ids)
+        minimized_contacts = minimized_contacts.filter(member__in=member_ids)
+
+    # Make moneybird contacts for people that dont have.
+    _push_to_moneybird(create_or_update_contact, new_members)
 
     # Update moneybird contacts that need synchronization.
-    for contact in MoneybirdContact.objects.filter(needs_synchronization=True):
-        try:
-            create_or_update_contact(contact.member)
-        except Administration.Error as e:
-            logger.exception("Moneybird synchronization error: %s", e)
-            send_sync_error(e, contact.member)
+    _push_to_moneybird(
+        lambda contact: create_or_update_contact(contact.member),
+        MoneybirdContact.objects.filter(needs_synchronization=True).select_related(
+            "member"
+        ),
+        lambda contact: contact.member,
+    )
 
     # Archive moneybrid contacts where mb contact has not been archived but user was minimized.
-    for contact in MoneybirdContact.objects.filter(member__profile__is_minimized=True):
-        try:
-            delete_contact(contact)
-        except Administration.Error as e:
-            logger.exception("Moneybird synchronization error: %s", e)
-            send_sync_error(e, contact)
+    _push_to_moneybird(delete_contact, minimized_contacts)
 
-    _sync_contacts_with_outdated_mandates()
+    if member_ids is None:
+        _sync_contacts_with_outdated_mandates()
 
 
 def _sync_contacts_with_outdated_mandates():
@@ -358,12 +496,11 @@ def _sync_contacts_with_outdated_mandates():
         "Pushing %d contacts with outdated mandates to Moneybird.", contacts.count()
     )
 
-    for contact in contacts:
-        try:
-            create_or_update_contact(contact.member)
-        except Administration.Error as e:
-            logger.exception("Moneybird synchronization error: %s", e)
-            send_sync_error(e, contact.member)
+    _push_to_moneybird(
+        lambda contact: create_or_update_contact(contact.member),
+        contacts.select_related("member"),
+        lambda contact: contact.member,
+    )
 
 
 def _try_create_or_update_external_invoices(queryset):
@@ -371,15 +508,10 @@ def _try_create_or_update_external_invoices(queryset):
         "Pushing %d %s to Moneybird.", queryset.count(), model_ngettext(queryset)
     )
 
-    for instance in queryset:
-        try:
-            create_or_update_external_invoice(instance)
-        except Administration.Error as e:
-            logger.exception("Moneybird synchronization error: %s", e)
-            send_sync_error(e, instance)
+    _push_to_moneybird(create_or_update_external_invoice, queryset)
 
 
-def _sync_food_orders():
+def _sync_food_orders(pks=None):
     """Create invoices for new food orders."""
     logger.info("Synchronizing food orders...")
     food_orders = FoodOrder.objects.filter(
@@ -393,10 +525,13 @@ def _sync_food_orders():
         ),
     )
 
+    if pks is not None:
+        food_orders = food_orders.filter(pk__in=pks)
+
     _try_create_or_update_external_invoices(food_orders)
 
 
-def _sync_sales_orders():
+def _sync_sales_orders(pks=None):
     """Create invoices for new sales orders."""
     logger.info("Synchronizing sales orders...")
     sales_orders = Order.objects.filter(
@@ -411,10 +546,13 @@ def _sync_sales_orders():
         )
     )
 
+    if pks is not None:
+        sales_orders = sales_orders.filter(pk__in=pks)
+
     _try_create_or_update_external_invoices(sales_orders)
 
 
-def _sync_registrations():
+def _sync_registrations(pks=None):
     """Create invoices for new, paid registrations."""
     logger.info("Synchronizing registrations...")
     registrations = Registration.objects.filter(
@@ -429,10 +567,13 @@ def _sync_registrations():
         )
     )
 
+    if pks is not None:
+        registrations = registrations.filter(pk__in=pks)
+
     _try_create_or_update_external_invoices(registrations)
 
 
-def _sync_renewals():
+def _sync_renewals(pks=None):
     """Create invoices for new, paid renewals."""
     logger.info("Synchronizing renewals...")
     renewals = Renewal.objects.filter(
@@ -447,24 +588,28 @@ def _sync_renewals():
         )
     )
 
+    if pks is not None:
+        renewals = renewals.filter(pk__in=pks)
+
     _try_create_or_update_external_invoices(renewals)
 
 
-def _sync_event_registrations():
+def _sync_event_registrations(event_ids=None):
     """Create invoices for new event registrations, and delete invoices that shouldn't exist.
 
     Existing invoices are deleted when the event registration is cancelled, not invited, or free.
     In most cases, this will be done already because the event registration has been saved.
     However, some changes to the event or registrations for  the same event might not trigger saving
     the event registration, but still change its queue position or payment amount.
+
+    If `event_ids` is given, only the registrations for those events are synchronized.
     """
     logger.info("Synchronizing event registrations...")
     event_registrations = (
-        EventRegistration.objects.select_properties("queue_position", "payment_amount")
+        EventRegistration.objects.select_properties("payment_amount")
         .filter(
             event__start__date__gte=settings.MONEYBIRD_START_DATE,
-            date_cancelled__isnull=True,
-            queue_position__isnull=True,
+            is_invited=True,
             payment_amount__gt=0,
         )
         .exclude(
@@ -477,14 +622,15 @@ def _sync_event_registrations():
         )
     )
 
+    if event_ids is not None:
+        event_registrations = event_registrations.filter(event__in=event_ids)
+
     _try_create_or_update_external_invoices(event_registrations)
 
     to_remove = (
-        EventRegistration.objects.select_properties("queue_position", "payment_amount")
+        EventRegistration.objects.select_properties("payment_amount")
         .filter(
-            Q(date_cancelled__isnull=False)
-            | Q(queue_position__isnull=False)
-            | ~Q(payment_amount__gt=0),
+            Q(is_invited=False) | ~Q(payment_amount__gt=0),
             event__start__date__gte=settings.MONEYBIRD_START_DATE,
         )
         .filter(
@@ -496,6 +642,8 @@ def _sync_event_registrations():
             )
         )
     )
+    if event_ids is not None:
+        to_remove = to_remove.filter(event__in=event_ids)
 
     logger.info(
         "Removing invoices for %d event registrations from Moneybird.",
@@ -510,7 +658,7 @@ def _sync_event_registrations():
             send_sync_error(e, instance)
 
 
-def _sync_receipts():
+def _sync_receipts(pks=None):
     # Reimbursements whose MoneybirdReceipt does not exist or has not been fully pushed yet.
     reimbursements = Reimbursement.objects.filter(
         verdict=Reimbursement.Verdict.APPROVED,
@@ -519,6 +667,8 @@ def _sync_receipts():
         moneybird_receipt__moneybird_receipt_id__isnull=False,
         moneybird_receipt__moneybird_attachment_is_uploaded=False,
     )
+    if pks is not None:
+        reimbursements = reimbursements.filter(pk__in=pks)
 
     logger.info(
         "Pushing %d reimbursement receipts to Moneybird.", reimbursements.count()
@@ -532,7 +682,7 @@ def _sync_receipts():
             send_sync_error(e, reimbursement)
 
 
-def _sync_moneybird_payments():
+def _sync_moneybird_payments(pks=None):
     """Create financial statements with all payments that haven't been synced yet.
 
     This creates one statement per payment type for which there are new payments.
@@ -548,6 +698,8 @@ def _sync_moneybird_payments():
             moneybird_payment__isnull=True,
             created_at__date__gte=settings.MONEYBIRD_START_DATE,
         ).order_by("pk")
+        if pks is not None:
+            payments = payments.filter(pk__in=pks)
 
         if payments.count() == 0:
             continue
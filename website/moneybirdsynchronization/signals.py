@@ -1,13 +1,15 @@
 import logging
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db.models.signals import post_delete, post_save
 
+from events.models import Event
 from members.models import Member, Profile
 from moneybirdsynchronization import services
 from moneybirdsynchronization.administration import Administration
 from moneybirdsynchronization.emails import send_sync_error
-from moneybirdsynchronization.models import MoneybirdExternalInvoice
+from moneybirdsynchronization.models import MoneybirdChange, MoneybirdExternalInvoice
 from payments.models import BankAccount
 from payments.signals import processed_batch
 from utils.models.signals import suspendingreceiver
@@ -16,6 +18,65 @@ logger = logging.getLogger(__name__)
 User = get_user_model()
 
 
+def _record_change(obj):
+    if settings.MONEYBIRD_SYNC_ENABLED:
+        MoneybirdChange.record(obj)
+
+
+@suspendingreceiver(
+    post_save, sender="registrations.Renewal", dispatch_uid="record_renewal_change"
+)
+@suspendingreceiver(
+    post_save,
+    sender="registrations.Registration",
+    dispatch_uid="record_registration_change",
+)
+@suspendingreceiver(
+    post_save, sender="pizzas.FoodOrder", dispatch_uid="record_foodorder_change"
+)
+@suspendingreceiver(
+    post_save, sender="sales.Order", dispatch_uid="record_salesorder_change"
+)
+@suspendingreceiver(
+    post_save, sender="payments.Payment", dispatch_uid="record_payment_change"
+)
+@suspendingreceiver(
+    post_save,
+    sender="reimbursements.Reimbursement",
+    dispatch_uid="record_reimbursement_change",
+)
+def record_change(sender, instance, **kwargs):
+    """Record the change, so that the object will be pushed to Moneybird."""
+    _record_change(instance)
+
+
+@suspendingreceiver(post_save, sender="members.Profile")
+def record_member_change(sender, instance, **kwargs):
+    """Record the change, so that a contact is created or archived in Moneybird."""
+    _record_change(instance.user)
+
+
+@suspendingreceiver(post_save, sender="events.Event")
+@suspendingreceiver(
+    post_save,
+    sender="events.EventRegistration",
+    dispatch_uid="record_eventregistration_change",
+)
+@suspendingreceiver(
+    post_delete,
+    sender="events.EventRegistration",
+    dispatch_uid="record_eventregistration_delete",
+)
+def record_event_change(sender, instance, **kwargs):
+    """Record a change to an event, or one of its registrations.
+
+    Changing the event or a registration can change the queue position and the
+    payment amount of all registrations for the event, so those are all
+    synchronized when the event is.
+    """
+    _record_change(instance if sender is Event else instance.event)
+
+
 @suspendingreceiver(post_save, sender="members.Profile")
 def post_profile_save(sender, instance, **kwargs):
     """Update the contact in Moneybird when the profile is saved."""
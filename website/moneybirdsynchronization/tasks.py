@@ -7,11 +7,12 @@ from reimbursements.models import Reimbursement
 
 
 @shared_task
-def synchronize_moneybird():
+def synchronize_moneybird(full=True):
+    """Synchronize with Moneybird, only the recorded changes unless `full` is set."""
     if not settings.MONEYBIRD_SYNC_ENABLED:
         return
 
-    services.synchronize_moneybird()
+    services.synchronize_moneybird(full=full)
 
 
 @shared_task
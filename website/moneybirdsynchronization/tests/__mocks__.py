@@ -0,0 +1,117 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeMoneybirdServer:
+    """A local HTTP server that fakes the parts of the Moneybird API we use.
+
+    Created resources are stored in memory and get an increasing id. Like
+    Moneybird, the server allows `limit` requests per rate limit window of
+    `window` seconds, reports this in the `RateLimit-*` headers, and responds
+    with 429 to requests over the limit. Requests take `delay` seconds.
+    """
+
+    def __init__(self, limit=150, window=300, delay=0):
+        self.limit = limit
+        self.window = window
+        self.delay = delay
+        self.resources = {}
+        self.requests = []
+        self.throttled = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._window_start = time.time()
+        self._window_requests = 0
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_port}/api/v2/"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _rate_limit(self):
+        """Count a request, returning the rate limit headers and if it is allowed."""
+        with self._lock:
+            now = time.time()
+            if now >= self._window_start + self.window:
+                self._window_start = now
+                self._window_requests = 0
+            self._window_requests += 1
+            allowed = self._window_requests <= self.limit
+            reset_at = str(self._window_start + self.window)
+            headers = {
+                "RateLimit-Limit": str(self.limit),
+                "RateLimit-Remaining": str(max(self.limit - self._window_requests, 0)),
+                "RateLimit-Reset": reset_at,
+            }
+            if not allowed:
+                self.throttled += 1
+                headers["Retry-After"] = reset_at
+            return allowed, headers
+
+    def _handle(self, method, path, data):
+        with self._lock:
+            self.requests.append((method, path))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            allowed, headers = self._rate_limit()
+            if not allowed:
+                return 429, headers, {"error": "Too many requests"}
+
+            # Paths look like /api/v2/<administration_id>/<resource>.json.
+            resource = path.split("/", 4)[-1].removesuffix(".json")
+            with self._lock:
+                if method == "POST":
+                    pk = str(len(self.resources) + 1)
+                    self.resources[f"{resource}/{pk}"] = data
+                    return 201, headers, {"id": pk, **(data or {})}
+                if resource not in self.resources:
+                    return 404, headers, {"error": "Not found"}
+                if method == "DELETE":
+                    del self.resources[resource]
+                    return 204, headers, None
+                if method == "PATCH":
+                    self.resources[resource] = data
+                pk = resource.split("/")[-1]
+                return 200, headers, {"id": pk, **(self.resources[resource] or {})}
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _respond(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                data = json.loads(self.rfile.read(length)) if length else None
+                status, headers, body = fake._handle(self.command, self.path, data)
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                content = json.dumps(body).encode() if body is not None else b""
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            do_GET = do_POST = do_PATCH = do_DELETE = _respond  # noqa: N815
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,114 @@
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from moneybirdsynchronization import services
+from moneybirdsynchronization.administration import (
+    Administration,
+    HttpsAdministration,
+    get_shared_administration,
+)
+from moneybirdsynchronization.tests.__mocks__ import FakeMoneybirdServer
+
+
+class HttpsAdministrationTest(SimpleTestCase):
+    def _administration(self, server, **kwargs):
+        return HttpsAdministration("key", 123, api_base_url=server.url, **kwargs)
+
+    def test_requests(self):
+        with FakeMoneybirdServer() as server:
+            administration = self._administration(server)
+
+            contact = administration.post("contacts", {"firstname": "Test"})
+            self.assertEqual(
+                administration.get(f"contacts/{contact['id']}")["firstname"], "Test"
+            )
+            administration.patch(f"contacts/{contact['id']}", {"firstname": "Foo"})
+            administration.delete(f"contacts/{contact['id']}")
+            with self.assertRaises(Administration.NotFound):
+                administration.get(f"contacts/{contact['id']}")
+
+        self.assertEqual(
+            server.requests,
+            [
+                ("POST", "/api/v2/123/contacts.json"),
+                ("GET", "/api/v2/123/contacts/1.json"),
+                ("PATCH", "/api/v2/123/contacts/1.json"),
+                ("DELETE", "/api/v2/123/contacts/1.json"),
+                ("GET", "/api/v2/123/contacts/1.json"),
+            ],
+        )
+
+    def test_rate_limit_is_respected(self):
+        with FakeMoneybirdServer(limit=4, window=0.5) as server:
+            administration = self._administration(server)
+            start = time.time()
+            for _ in range(10):
+                administration.post("contacts", {})
+            duration = time.time() - start
+
+        self.assertEqual(len(server.requests), 10)
+        self.assertEqual(server.throttled, 0)
+        # The requests must have been spread over three rate limit windows.
+        self.assertGreaterEqual(duration, 1)
+
+    def test_throttled_requests_are_retried(self):
+        with FakeMoneybirdServer(limit=2, window=0.5) as server:
+            administration = self._administration(server)
+            # Pretend that other clients used up the rate limit.
+            server._window_requests = 2
+
+            with self.assertLogs("moneybirdsynchronization.administration"):
+                administration.post("contacts", {})
+
+        self.assertEqual(server.throttled, 1)
+        self.assertEqual(len(server.requests), 2)
+
+    def test_shared_administration(self):
+        self.assertIs(
+            get_shared_administration("key", 123),
+            get_shared_administration("key", 123),
+        )
+        self.assertIsNot(
+            get_shared_administration("key", 123),
+            get_shared_administration("other", 123),
+        )
+
+
+class PushToMoneybirdTest(SimpleTestCase):
+    @override_settings(MONEYBIRD_SYNC_WORKERS=4)
+    def test_concurrent_pushes(self):
+        with FakeMoneybirdServer(delay=0.05) as server:
+            administration = HttpsAdministration(
+                "key", 123, api_base_url=server.url, max_connections=4
+            )
+            threads = set()
+
+            def push(i):
+                threads.add(threading.get_ident())
+                administration.post("contacts", {"name": str(i)})
+
+            start = time.time()
+            services._push_to_moneybird(push, range(20))
+            duration = time.time() - start
+
+        self.assertEqual(len(server.resources), 20)
+        self.assertEqual(len(threads), 4)
+        self.assertLessEqual(server.max_in_flight, 4)
+        # Sequentially, this would take at least a second.
+        self.assertLess(duration, 0.75)
+
+    @override_settings(MONEYBIRD_SYNC_WORKERS=4)
+    @mock.patch("moneybirdsynchronization.services.send_sync_error")
+    def test_errors_are_reported(self, send_sync_error):
+        def push(i):
+            if i == 2:
+                raise Administration.InvalidData(422, "Invalid")
+
+        with self.assertLogs("moneybirdsynchronization.services", "ERROR"):
+            services._push_to_moneybird(push, range(5))
+
+        send_sync_error.assert_called_once()
+        self.assertEqual(send_sync_error.call_args.args[1], 2)
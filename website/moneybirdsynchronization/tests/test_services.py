@@ -1,7 +1,10 @@
 from random import randint
 from unittest import mock
 
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
 from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
 from freezegun import freeze_time
@@ -12,9 +15,13 @@ from members.models import Member
 from moneybirdsynchronization import services
 from moneybirdsynchronization.administration import Administration
 from moneybirdsynchronization.models import (
+    MoneybirdChange,
     MoneybirdContact,
     MoneybirdExternalInvoice,
     MoneybirdPayment,
+    MoneybirdProject,
+    MoneybirdSynchronizationRun,
+    project_name_for_payable_model,
 )
 from payments.models import BankAccount, Payment
 from payments.services import create_payment
@@ -50,6 +57,40 @@ class ServicesTest(TestCase):
         cls.member5 = Member.objects.get(pk=5)
         cls.bank_account = cls.member.bank_accounts.first()
 
+    def test_create_project_once(self, mock_api):
+        """A project created by another worker in the meantime is not created again."""
+        event = Event.objects.create(
+            title="testevent",
+            description="desc",
+            start=timezone.now(),
+            end=timezone.now() + timezone.timedelta(hours=1),
+            location="test location",
+            map_location="test map location",
+            price=10.00,
+            fine=20.00,
+        )
+        registration = EventRegistration.objects.create(event=event, member=self.member)
+        MoneybirdContact.objects.create(member=self.member, moneybird_id="2")
+        invoice = MoneybirdExternalInvoice.objects.create(payable_object=registration)
+        project = MoneybirdProject.objects.create(
+            name=project_name_for_payable_model(registration), moneybird_id="1"
+        )
+        # The project as it was before the other worker created it on Moneybird.
+        stale_project = MoneybirdProject.objects.get(pk=project.pk)
+        stale_project.moneybird_id = None
+
+        with mock.patch.object(
+            MoneybirdProject.objects,
+            "get_or_create",
+            return_value=(stale_project, False),
+        ):
+            data = invoice.to_moneybird()
+
+        mock_api.return_value.create_project.assert_not_called()
+        self.assertEqual(
+            data["external_sales_invoice"]["details_attributes"][0]["project_id"], 1
+        )
+
     def test_create_or_update_contact_with_mandate(self, mock_api):
         """Creating/updating a contact with a mandate excludes the mandate if it starts today.
 
@@ -302,6 +343,42 @@ class ServicesTest(TestCase):
             services._sync_outdated_invoices()
             self.assertEqual(mock_update_invoice.call_count, 0)
 
+    @mock.patch("moneybirdsynchronization.services.create_or_update_external_invoice")
+    def test_sync_outdated_invoices_query_count(self, mock_update_invoice, mock_api):
+        """The payables of outdated invoices are loaded with one query per model."""
+        event = Event.objects.create(
+            title="testevent",
+            description="desc",
+            start=timezone.now(),
+            end=timezone.now() + timezone.timedelta(hours=1),
+            location="test location",
+            map_location="test map location",
+            price=10.00,
+            fine=20.00,
+        )
+
+        def create_invoices(count):
+            for i in range(count):
+                renewal = Renewal.objects.create(
+                    member=self.member, length=Renewal.MEMBERSHIP_YEAR
+                )
+                registration = EventRegistration.objects.create(
+                    event=event, name=f"guest {i}"
+                )
+                MoneybirdExternalInvoice.objects.create(payable_object=renewal)
+                MoneybirdExternalInvoice.objects.create(payable_object=registration)
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as context:
+                services._sync_outdated_invoices()
+            return len(context.captured_queries)
+
+        create_invoices(1)
+        queries = count_queries()
+        create_invoices(4)
+        self.assertEqual(count_queries(), queries)
+        self.assertEqual(mock_update_invoice.call_count, 2 + 10)
+
     def test_sync_moneybird_payments(self, mock_api):
         """MoneybirdPayments are created for any new (non-wire) payments."""
         # Payments from before settings.MONEYBIRD_START_DATE are ignored.
@@ -592,3 +669,120 @@ class ServicesTest(TestCase):
         self.assertEqual(mock_create_or_update_contact.call_count, 0)
         self.assertEqual(mock_delete_contact.call_count, 1)
         mock_delete_contact.assert_any_call(self.member.moneybird_contact)
+
+
+@mock.patch("moneybirdsynchronization.moneybird.MoneybirdAPIService", autospec=True)
+@mock.patch("moneybirdsynchronization.services._create_payments_statement")
+@mock.patch("moneybirdsynchronization.services.create_or_update_external_invoice")
+@override_settings(
+    MONEYBIRD_START_DATE="2023-09-01",
+    MONEYBIRD_ADMINISTRATION_ID="123",
+    MONEYBIRD_API_KEY="foo",
+    MONEYBIRD_SYNC_ENABLED=True,
+    SUSPEND_SIGNALS=True,
+)
+class IncrementalSynchronizationTest(TestCase):
+    fixtures = ["members.json"]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.member = Member.objects.get(pk=1)
+        # Make sure no contacts have to be created.
+        for member in Member.objects.all():
+            MoneybirdContact.objects.create(
+                member=member, moneybird_id=member.pk, needs_synchronization=False
+            )
+
+    def test_synchronize_changes(
+        self, mock_create_invoice, mock_create_statement, mock_api
+    ):
+        renewal1 = Renewal.objects.create(
+            member=self.member, length=Renewal.MEMBERSHIP_YEAR
+        )
+        renewal2 = Renewal.objects.create(
+            member=self.member, length=Renewal.MEMBERSHIP_YEAR
+        )
+        # Payments without signals are not recorded as changes.
+        create_payment(renewal2, self.member, Payment.CASH)
+        with override_settings(SUSPEND_SIGNALS=False):
+            payment = create_payment(renewal1, self.member, Payment.CASH)
+
+        self.assertQuerySetEqual(
+            MoneybirdChange.objects.all(),
+            [renewal1, payment],
+            transform=lambda change: change.changed_object,
+            ordered=False,
+        )
+
+        run = services.synchronize_moneybird(full=False)
+
+        mock_create_invoice.assert_called_once_with(renewal1)
+        self.assertEqual(list(mock_create_statement.call_args.args[0]), [payment])
+        self.assertFalse(MoneybirdChange.objects.exists())
+        self.assertFalse(run.full)
+        self.assertEqual(run.changes, 2)
+        self.assertGreater(run.queries, 0)
+        self.assertEqual(run.api_calls, 0)  # The API service is mocked.
+
+        mock_create_invoice.reset_mock()
+        run = services.synchronize_moneybird()
+
+        # The full synchronization finds the renewal that was not recorded.
+        mock_create_invoice.assert_any_call(renewal2)
+        self.assertTrue(run.full)
+        self.assertEqual(MoneybirdSynchronizationRun.objects.count(), 2)
+
+    def test_keep_changes_during_synchronization(
+        self, mock_create_invoice, mock_create_statement, mock_api
+    ):
+        renewal = Renewal.objects.create(
+            member=self.member, length=Renewal.MEMBERSHIP_YEAR
+        )
+        create_payment(renewal, self.member, Payment.CASH)
+
+        def change_renewal(obj):
+            MoneybirdChange.record(obj)
+
+        mock_create_invoice.side_effect = change_renewal
+        MoneybirdChange.record(renewal)
+
+        services.synchronize_moneybird(full=False)
+
+        # The renewal changed while it was being synchronized, so it is kept.
+        mock_create_invoice.assert_called_once_with(renewal)
+        self.assertTrue(MoneybirdChange.objects.exists())
+
+        mock_create_invoice.side_effect = None
+        services.synchronize_moneybird(full=False)
+
+        self.assertFalse(MoneybirdChange.objects.exists())
+
+    def test_keep_changes_committed_late(
+        self, mock_create_invoice, mock_create_statement, mock_api
+    ):
+        renewal = Renewal.objects.create(
+            member=self.member, length=Renewal.MEMBERSHIP_YEAR
+        )
+        create_payment(renewal, self.member, Payment.CASH)
+        MoneybirdChange.record(renewal)
+
+        def commit_late_change(obj):
+            # A change from a transaction that started before the synchronization,
+            # but was only committed while it was running.
+            MoneybirdChange.objects.create(
+                content_type=ContentType.objects.get_for_model(self.member),
+                object_id=self.member.pk,
+                changed_at=timezone.now() - timezone.timedelta(minutes=1),
+            )
+
+        mock_create_invoice.side_effect = commit_late_change
+
+        run = services.synchronize_moneybird(full=False)
+
+        mock_create_invoice.assert_called_once_with(renewal)
+        self.assertEqual(run.changes, 1)
+        self.assertQuerySetEqual(
+            MoneybirdChange.objects.all(),
+            [self.member],
+            transform=lambda change: change.changed_object,
+        )
@@ -1,11 +1,13 @@
 from unittest import mock
 
 from django.test import TestCase, override_settings
+from django.utils import timezone
 
 from freezegun import freeze_time
 
+from events.models import Event, EventRegistration
 from members.models import Member
-from moneybirdsynchronization.models import MoneybirdExternalInvoice
+from moneybirdsynchronization.models import MoneybirdChange, MoneybirdExternalInvoice
 from payments.models import Payment
 from payments.services import create_payment
 from registrations.models import Renewal
@@ -74,3 +76,29 @@ class SignalsTest(TestCase):
                 invoice1.refresh_from_db()
                 self.assertTrue(invoice1.needs_deletion)
                 self.assertFalse(invoice1.needs_synchronization)
+
+    def test_event_registration_records_event_change(self, mock_api):
+        event = Event.objects.create(
+            title="testevent",
+            description="desc",
+            start=timezone.now(),
+            end=timezone.now() + timezone.timedelta(hours=1),
+            location="test location",
+            map_location="test map location",
+            price=1.00,
+            fine=0.00,
+        )
+
+        with override_settings(SUSPEND_SIGNALS=False):
+            registration = EventRegistration.objects.create(
+                event=event, member=self.member
+            )
+            change = MoneybirdChange.objects.get()
+            self.assertEqual(change.changed_object, event)
+
+            # Recording another change only updates the time of the change.
+            registration.date_cancelled = timezone.now()
+            registration.save()
+            self.assertGreater(
+                MoneybirdChange.objects.get().changed_at, change.changed_at
+            )
@@ -1,4 +1,3 @@
-import csv
 from collections import OrderedDict
 
 from django.contrib import admin, messages
@@ -11,11 +10,12 @@ from django.http import HttpRequest, HttpResponse
 from django.urls import path, reverse
 from django.utils import timezone
 from django.utils.html import format_html
-from django.utils.text import capfirst
 from django.utils.translation import gettext_lazy as _
 
 from payments import admin_views, payables, services
 from payments.forms import BankAccountAdminForm, BatchPaymentInlineAdminForm
+from payments.tasks import export_payments
+from utils.exports import streaming_csv_response
 
 from .models import BankAccount, Batch, Payment, PaymentUser
 
@@ -110,6 +110,7 @@ class PaymentAdmin(admin.ModelAdmin):
         "add_to_new_batch",
         "add_to_last_batch",
         "export_csv",
+        "export_csv_async",
     ]
 
     @admin.display(description=_("payable object"))
@@ -285,37 +286,31 @@ class PaymentAdmin(admin.ModelAdmin):
         :param request: Request
         :param queryset: Items to be exported
         """
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = 'attachment;filename="payments.csv"'
-        writer = csv.writer(response)
-        headers = [
-            _("created"),
-            _("amount"),
-            _("type"),
-            _("processor"),
-            _("payer id"),
-            _("payer name"),
-            _("notes"),
-        ]
-        writer.writerow([capfirst(x) for x in headers])
-        for payment in queryset:
-            writer.writerow(
-                [
-                    payment.created_at,
-                    payment.amount,
-                    payment.get_type_display(),
-                    payment.processed_by.get_full_name()
-                    if payment.processed_by
-                    else "-",
-                    payment.paid_by.pk if payment.paid_by else "-",
-                    payment.paid_by.get_full_name() if payment.paid_by else "-",
-                    payment.notes,
-                ]
-            )
-        return response
+        return streaming_csv_response(
+            "payments.csv", *services.export_payments(queryset)
+        )
 
     export_csv.short_description = _("Export")
 
+    def export_csv_async(self, request: HttpRequest, queryset: QuerySet) -> None:
+        """Export a CSV of payments in the background, and email a link to it.
+
+        :param request: Request
+        :param queryset: Items to be exported
+        """
+        export_payments.delay(
+            [str(pk) for pk in queryset.values_list("pk", flat=True)],
+            request.member.pk,
+        )
+        messages.success(
+            request,
+            _(
+                "The export is being prepared. You will receive an email with a link to it."
+            ),
+        )
+
+    export_csv_async.short_description = _("Export in the background")
+
 
 class ValidAccountFilter(admin.SimpleListFilter):
     """Filter the bank accounts by whether they are active or not."""
@@ -559,34 +554,9 @@ class BankAccountAdmin(admin.ModelAdmin):
     set_last_used.short_description = _("Update the last used date")
 
     def export_csv(self, request: HttpRequest, queryset: QuerySet) -> HttpResponse:
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = 'attachment;filename="accounts.csv"'
-        writer = csv.writer(response)
-        headers = [
-            _("created"),
-            _("name"),
-            _("reference"),
-            _("IBAN"),
-            _("BIC"),
-            _("valid from"),
-            _("valid until"),
-            _("signature"),
-        ]
-        writer.writerow([capfirst(x) for x in headers])
-        for account in queryset:
-            writer.writerow(
-                [
-                    account.created_at,
-                    account.name,
-                    account.mandate_no,
-                    account.iban,
-                    account.bic or "",
-                    account.valid_from or "",
-                    account.valid_until or "",
-                    account.signature or "",
-                ]
-            )
-        return response
+        return streaming_csv_response(
+            "accounts.csv", *services.export_bank_accounts(queryset)
+        )
 
     export_csv.short_description = _("Export")
 
@@ -733,7 +703,6 @@ class PaymentUserAdmin(admin.ModelAdmin):
 
     def get_queryset(self, request):
         queryset = super().get_queryset(request)
-        queryset = queryset.prefetch_related("bank_accounts", "paid_payment_set")
         queryset = queryset.select_properties(
             "tpay_balance",
             "tpay_enabled",
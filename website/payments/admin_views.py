@@ -1,5 +1,3 @@
-import csv
-
 from django.apps import apps
 from django.contrib import messages
 from django.contrib.admin.utils import model_ngettext
@@ -10,13 +8,10 @@ from django.core.exceptions import (
     PermissionDenied,
     SuspiciousOperation,
 )
-from django.db.models import Count, Max, Min, Sum
-from django.http import HttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
 from django.utils.decorators import method_decorator
 from django.utils.http import url_has_allowed_host_and_scheme
-from django.utils.text import capfirst
 from django.utils.translation import gettext_lazy as _
 from django.views import View
 
@@ -24,8 +19,9 @@ from sentry_sdk import capture_exception
 
 from payments import services
 from payments.payables import payables
+from utils.exports import streaming_csv_response
 
-from .models import Batch, Payment, PaymentUser
+from .models import Batch, Payment
 
 
 @method_decorator(staff_member_required, name="dispatch")
@@ -125,36 +121,7 @@ class BatchExportAdminView(View):
 
     def post(self, request, *args, **kwargs):
         batch = Batch.objects.get(pk=kwargs["pk"])
-
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = 'attachment;filename="batch.csv"'
-        writer = csv.writer(response)
-        headers = [
-            _("Account holder"),
-            _("IBAN"),
-            _("Mandate Reference"),
-            _("Amount"),
-            _("Description"),
-            _("Mandate Date"),
-        ]
-        writer.writerow([capfirst(x) for x in headers])
-
-        member_rows = batch.payments_set.values("paid_by").annotate(total=Sum("amount"))
-
-        for row in member_rows:
-            member = PaymentUser.objects.get(id=row["paid_by"])
-            bankaccount = member.bank_accounts.last()
-            writer.writerow(
-                [
-                    bankaccount.name,
-                    bankaccount.iban,
-                    bankaccount.mandate_no,
-                    f"{row['total']:.2f}",
-                    batch.description,
-                    bankaccount.valid_from,
-                ]
-            )
-        return response
+        return streaming_csv_response("batch.csv", *services.export_batch(batch))
 
 
 @method_decorator(staff_member_required, name="dispatch")
@@ -167,42 +134,10 @@ class BatchTopicExportAdminView(View):
 
     def post(self, request, *args, **kwargs):
         batch = Batch.objects.get(pk=kwargs["pk"])
-
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = 'attachment;filename="batch-topic.csv"'
-        writer = csv.writer(response)
-        headers = [
-            _("Topic"),
-            _("No. of payments"),
-            _("First payment"),
-            _("Last payment"),
-            _("Total amount"),
-        ]
-        writer.writerow([capfirst(x) for x in headers])
-
-        topic_rows = (
-            batch.payments_set.values("topic")
-            .annotate(
-                total=Sum("amount"),
-                count=Count("paid_by"),
-                min_date=Min("created_at"),
-                max_date=Max("created_at"),
-            )
-            .order_by("topic")
+        return streaming_csv_response(
+            "batch-topic.csv", *services.export_batch_topics(batch)
         )
 
-        for row in topic_rows:
-            writer.writerow(
-                [
-                    row["topic"],
-                    row["count"],
-                    timezone.localtime(row["min_date"]).date(),
-                    timezone.localtime(row["max_date"]).date(),
-                    f"{row['total']:.2f}",
-                ]
-            )
-        return response
-
 
 @method_decorator(staff_member_required, name="dispatch")
 @method_decorator(
@@ -217,16 +152,7 @@ class BatchTopicDescriptionAdminView(View):
     def post(self, request, *args, **kwargs):
         context = {}
         batch = get_object_or_404(Batch, pk=kwargs["pk"])
-        topic_rows = (
-            batch.payments_set.values("topic")
-            .annotate(
-                total=Sum("amount"),
-                count=Count("paid_by"),
-                min_date=Min("created_at"),
-                max_date=Max("created_at"),
-            )
-            .order_by("topic")
-        )
+        topic_rows = services.get_batch_topics(batch)
 
         date = batch.processing_date if batch.processing_date else timezone.now().date()
         description = f"Batch {batch.id} - {date}:\n"
@@ -9,6 +9,10 @@ class PaymentsConfig(AppConfig):
     name = "payments"
     verbose_name = _("Payments")
 
+    def ready(self):
+        """Import the signals when the app is ready."""
+        from . import signals  # noqa: F401
+
     def user_menu_items(self):
         return {
             "sections": [{"name": "membership", "key": 2}],
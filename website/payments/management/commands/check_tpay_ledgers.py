@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from payments.services import check_tpay_ledgers
+
+
+class Command(BaseCommand):
+    """Check that the Thalia Pay ledgers match the payments and bank accounts."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            default=False,
+            help="Recompute the ledgers that are not consistent",
+        )
+
+    def handle(self, *args, **options):
+        inconsistent = check_tpay_ledgers(fix=options["fix"])
+        if not inconsistent:
+            self.stdout.write("All Thalia Pay ledgers are consistent.")
+            return
+
+        self.stdout.write(
+            f"The Thalia Pay ledgers of {len(inconsistent)} members are inconsistent: "
+            f"{', '.join(map(str, inconsistent))}"
+        )
+        if options["fix"]:
+            self.stdout.write("Recomputed these ledgers.")
@@ -0,0 +1,86 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:35
+
+import django.db.models.deletion
+import payments.models
+from django.db import migrations, models
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+
+def first_mandate_periods(mandates):
+    """Merge the mandates of each member into their first contiguous period.
+
+    This is a copy of the merge in `ThaliaPayLedgerManager.compute()`, so that
+    there is no gap between mandates in which Thalia Pay is incorrectly enabled.
+    """
+    periods = {}
+    for member, start, end in mandates.order_by("owner", "valid_from").values_list(
+        "owner", "valid_from", "valid_until"
+    ):
+        if member not in periods:
+            periods[member] = (start, end)
+            continue
+        # Extend the first period with the mandates that overlap or adjoin it,
+        # so there is no gap in which it is incorrectly valid.
+        period_start, period_end = periods[member]
+        if period_end is not None and start <= period_end:
+            periods[member] = (
+                period_start,
+                None if end is None else max(end, period_end),
+            )
+    return periods
+
+
+def fill_ledgers(apps, schema_editor):
+    Payment = apps.get_model("payments", "Payment")
+    BankAccount = apps.get_model("payments", "BankAccount")
+    ThaliaPayLedger = apps.get_model("payments", "ThaliaPayLedger")
+    today = timezone.now().date()
+
+    ledgers = {}
+    balances = (
+        Payment.objects.filter(
+            Q(batch__isnull=True) | Q(batch__processed=False),
+            type="tpay_payment",
+            paid_by__isnull=False,
+        )
+        .values_list("paid_by")
+        .annotate(total=Sum("amount"))
+    )
+    for member, total in balances:
+        ledgers[member] = ThaliaPayLedger(member_id=member, balance=-total)
+
+    mandates = BankAccount.objects.filter(
+        Q(valid_until__isnull=True) | Q(valid_until__gt=today),
+        valid_from__isnull=False,
+        owner__isnull=False,
+    )
+    for member, (start, end) in first_mandate_periods(mandates).items():
+        ledger = ledgers.setdefault(
+            member, ThaliaPayLedger(member_id=member, balance=0)
+        )
+        ledger.mandate_valid_from = start
+        ledger.mandate_valid_until = end
+
+    ThaliaPayLedger.objects.bulk_create(ledgers.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0051_membership_study_long_until'),
+        ('payments', '0025_alter_payment_processed_by'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThaliaPayLedger',
+            fields=[
+                ('member', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='tpay_ledger', serialize=False, to='members.member')),
+                ('balance', payments.models.PaymentAmountField(decimal_places=2, default=0, max_digits=8, validators=[payments.models.validate_not_zero])),
+                ('mandate_valid_from', models.DateField(null=True)),
+                ('mandate_valid_until', models.DateField(null=True)),
+            ],
+        ),
+        migrations.RunPython(fill_ledgers, migrations.RunPython.noop),
+    ]
@@ -5,9 +5,9 @@ from decimal import Decimal
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ValidationError
-from django.db import models
-from django.db.models import DEFERRED, BooleanField, Q, Sum
-from django.db.models.expressions import Case, Exists, OuterRef, Value, When
+from django.db import models, transaction
+from django.db.models import BooleanField, F, Q, Sum
+from django.db.models.expressions import Case, Value, When
 from django.db.models.functions import Coalesce
 from django.urls import reverse
 from django.utils import timezone
@@ -16,7 +16,7 @@ from django.utils.translation import gettext_lazy as _
 from localflavor.generic.countries.sepa import IBAN_SEPA_COUNTRIES
 from localflavor.generic.models import BICField, IBANField
 from queryable_properties.managers import QueryablePropertiesManager
-from queryable_properties.properties import AggregateProperty, queryable_property
+from queryable_properties.properties import queryable_property
 
 from members.models import Member
 
@@ -58,14 +58,10 @@ class PaymentUser(Member):
         today = timezone.now().date()
         return Case(
             When(
-                Exists(
-                    BankAccount.objects.filter(owner=OuterRef("pk")).filter(
-                        Q(
-                            valid_from__isnull=False,
-                            valid_from__lte=today,
-                        )
-                        & (Q(valid_until__isnull=True) | Q(valid_until__gt=today))
-                    )
+                Q(tpay_ledger__mandate_valid_from__lte=today)
+                & (
+                    Q(tpay_ledger__mandate_valid_until__isnull=True)
+                    | Q(tpay_ledger__mandate_valid_until__gt=today)
                 ),
                 then=settings.THALIA_PAY_ENABLED_PAYMENT_METHOD,
             ),
@@ -73,21 +69,14 @@ class PaymentUser(Member):
             output_field=BooleanField(),
         )
 
-    tpay_balance = AggregateProperty(
-        -1
-        * Coalesce(
-            Sum(
-                "paid_payment_set__amount",
-                filter=Q(paid_payment_set__type="tpay_payment")
-                & (
-                    Q(paid_payment_set__batch__isnull=True)
-                    | Q(paid_payment_set__batch__processed=False)
-                ),
-            ),
+    @queryable_property(annotation_based=True)
+    @classmethod
+    def tpay_balance(cls):
+        return Coalesce(
+            F("tpay_ledger__balance"),
             Value(0.00),
             output_field=PaymentAmountField(),
         )
-    )
 
     @queryable_property(annotation_based=True)
     @classmethod
@@ -119,6 +108,127 @@ class BlacklistedPaymentUser(models.Model):
         return f"{self.payment_user} (blacklisted from using Thalia Pay)"
 
 
+class ThaliaPayLedgerManager(models.Manager):
+    def compute(self, members=None) -> dict:
+        """Compute the ledgers of some members from their payments and bank accounts.
+
+        :param members: the pks of the members, or None for all members.
+        :return: a dict of (balance, mandate_valid_from, mandate_valid_until)
+                 by member pk, for the members that have a ledger.
+        """
+        today = timezone.now().date()
+        payments = Payment.objects.filter(
+            Q(batch__isnull=True) | Q(batch__processed=False),
+            type=Payment.TPAY,
+            paid_by__isnull=False,
+        )
+        mandates = BankAccount.objects.filter(
+            Q(valid_until__isnull=True) | Q(valid_until__gt=today),
+            valid_from__isnull=False,
+            owner__isnull=False,
+        )
+        if members is not None:
+            payments = payments.filter(paid_by__in=members)
+            mandates = mandates.filter(owner__in=members)
+
+        ledgers = {}
+        for member, total in payments.values_list("paid_by").annotate(
+            total=Sum("amount")
+        ):
+            ledgers[member] = (-total, None, None)
+
+        periods = {}
+        for member, start, end in mandates.order_by("owner", "valid_from").values_list(
+            "owner", "valid_from", "valid_until"
+        ):
+            if member not in periods:
+                periods[member] = (start, end)
+                continue
+            # Extend the first period with the mandates that overlap or adjoin it,
+            # so there is no gap in which it is incorrectly valid.
+            period_start, period_end = periods[member]
+            if period_end is not None and start <= period_end:
+                periods[member] = (
+                    period_start,
+                    None if end is None else max(end, period_end),
+                )
+
+        for member, (start, end) in periods.items():
+            balance = ledgers.get(member, (Decimal("0.00"),))[0]
+            ledgers[member] = (balance, start, end)
+        return ledgers
+
+    def refresh(self, members=None):
+        """Recompute the ledgers of some members, or of all members if None.
+
+        The members are locked first, so concurrent refreshes of the same member,
+        e.g. for two payments, are serialized and the last one sees both payments.
+        """
+        if members is not None:
+            members = {member for member in members if member is not None}
+            if not members:
+                return
+
+        with transaction.atomic():
+            locked = Member._base_manager.select_for_update().order_by("pk")
+            if members is not None:
+                locked = locked.filter(pk__in=members)
+            list(locked.values_list("pk", flat=True))
+
+            ledgers = self.compute(members)
+            if members is None:
+                self.all().delete()
+            else:
+                self.filter(member__in=members - ledgers.keys()).delete()
+            self.bulk_create(
+                [
+                    ThaliaPayLedger(
+                        member_id=member,
+                        balance=balance,
+                        mandate_valid_from=start,
+                        mandate_valid_until=end,
+                    )
+                    for member, (balance, start, end) in ledgers.items()
+                ],
+                update_conflicts=True,
+                unique_fields=["member"],
+                update_fields=["balance", "mandate_valid_from", "mandate_valid_until"],
+                batch_size=1000,
+            )
+
+
+class ThaliaPayLedger(models.Model):
+    """The Thalia Pay balance and mandate of a member.
+
+    This is derived from the payments and bank accounts of the member, and kept
+    up-to-date when those change, so the `tpay_balance` and `tpay_enabled`
+    properties of `PaymentUser` do not have to aggregate them. Members without
+    unprocessed Thalia Pay payments and mandates do not have a ledger.
+    """
+
+    member = models.OneToOneField(
+        "members.Member",
+        models.CASCADE,
+        primary_key=True,
+        related_name="tpay_ledger",
+    )
+
+    balance = PaymentAmountField(allow_zero=True, default=0)
+
+    # The first period in which the member has a valid mandate, as far as it
+    # is not over yet. Mandates are valid until (and excluding) `valid_until`.
+    # If a later mandate starts after a gap, it is only picked up when the
+    # ledger is recomputed, at the latest by the nightly check after the first
+    # period has ended.
+    mandate_valid_from = models.DateField(null=True)
+    mandate_valid_until = models.DateField(null=True)
+
+    objects = ThaliaPayLedgerManager()
+
+    def __str__(self):
+        return f"Thalia Pay ledger of {self.member}"
+
+
 class Payment(models.Model):
     """Describes a payment."""
 
@@ -218,42 +328,15 @@ class Payment(models.Model):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        # This is a pretty ugly hack, but it's necessary to something like this
-        # when you want to check things against the old version of the model in
-        # the clean() method---so some of the old data is saved here in init.
-
-        # Previously we had something like this:
-        # self._batch = self.batch
-        # but this breaks when deleting the Payment instance, and creates a
-        # stack overflow crash.
-
-        # Instead we try to get the foreign key out of the init function arguments.
-        # This works because when Django does database lookups via the .objects
-        # manager, it uses the init method to create this model instance and it
-        # includes the id. When we create a Payment in our own code we also use
-        # this init method but use keyword arguments most of the time.
-
-        # In the future we might want to remove this code and instead move
-        # cleaning code to a place where we do have the old information available.
-        self._batch_id = None
-        if not kwargs:
-            batch_id_idx = [
-                i
-                for i, x in enumerate(self._meta.concrete_fields)
-                if x.attname == "batch_id"
-            ]
-            if (
-                batch_id_idx
-                and len(args) >= batch_id_idx[0]
-                and args[batch_id_idx[0]] != DEFERRED
-            ):
-                self._batch_id = args[batch_id_idx[0]]
-        else:
-            # This should be okay as keyword arguments are only used for manual
-            # instantiation.
-            self._batch_id = self.batch_id
-
-        self._type = self.type
+        # Remember some of the original values, so clean() can check changes
+        # against them. The values are read from __dict__ directly, because
+        # deferred fields are missing there and should not be loaded here.
+        # Everything else is left to Model.__init__, as this runs for every
+        # payment that is loaded from the database.
+        values = self.__dict__
+        self._batch_id = values.get("batch_id")
+        self._paid_by_id = values.get("paid_by_id")
+        self._type = values.get("type")
 
     def save(self, **kwargs):
         self.clean()
@@ -4,9 +4,9 @@ from functools import lru_cache
 from typing import Generic, TypeVar
 
 from django.apps import apps
-from django.core.exceptions import ObjectDoesNotExist
-from django.db.models import Model
-from django.db.models.signals import pre_save
+from django.core.exceptions import FieldDoesNotExist, ObjectDoesNotExist
+from django.db.models import DEFERRED, Model
+from django.db.models.signals import post_save, pre_save
 from django.utils.functional import classproperty
 
 from members.models.member import Member
@@ -114,6 +114,21 @@ class Payable(ABC, Generic[PayableModel]):
         return hash((self.payment_amount, self.payment_topic, self.payment_notes))
 
 
+class PayableSnapshotMixin:
+    """Mixin for payable models that remembers the values loaded from the database.
+
+    The immutable fields of paid payables are checked against these values when
+    they are saved, instead of fetching the instance from the database again.
+    Only the tuple of values that the instance was created from is kept.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._payable_snapshot = (field_names, values)
+        return instance
+
+
 class Payables:
     def __init__(self):
         self._registry: dict[str, type[Payable]] = {}
@@ -142,6 +157,7 @@ class Payables:
             pre_save.connect(
                 prevent_saving, sender=model, dispatch_uid=f"prevent_saving_{model}"
             )
+            self._connect_snapshots(model)
 
             for foreign_model in payable_class.immutable_foreign_key_models:
                 foreign_key_field = payable_class.immutable_foreign_key_models[
@@ -152,6 +168,13 @@ class Payables:
                     sender=foreign_model,
                     dispatch_uid=f"prevent_saving_related_{model}_{foreign_model}",
                 )
+                self._connect_snapshots(foreign_model)
+
+    @staticmethod
+    def _connect_snapshots(model: type[Model]):
+        post_save.connect(
+            take_snapshot, sender=model, dispatch_uid=f"take_snapshot_{model}"
+        )
 
     def _unregister(self, model: type[Model]):
         """Unregister a payable class for a model.
@@ -161,16 +184,72 @@ class Payables:
         payable_class = self._registry.get(self._get_key(model))
         if payable_class.immutable_after_payment:
             pre_save.disconnect(dispatch_uid=f"prevent_saving_{model}")
+            post_save.disconnect(dispatch_uid=f"take_snapshot_{model}")
             for foreign_model in payable_class.immutable_foreign_key_models:
                 pre_save.disconnect(
                     dispatch_uid=f"prevent_saving_related_{model}_{foreign_model}"
                 )
+                post_save.disconnect(dispatch_uid=f"take_snapshot_{foreign_model}")
         del self._registry[self._get_key(model)]
 
 
 payables = Payables()
 
 
+def take_snapshot(sender, instance, **kwargs):
+    """Remember the field values of an instance as they are in the database.
+
+    This is done when an instance is saved, like `PayableSnapshotMixin` does
+    when an instance is loaded, so it is not fetched again when saved again.
+    """
+    attnames = [field.attname for field in instance._meta.concrete_fields]
+    instance._payable_snapshot = (
+        attnames,
+        [instance.__dict__.get(attname, DEFERRED) for attname in attnames],
+    )
+
+
+def _get_old_instance(sender, instance):
+    """Return the instance as it is in the database.
+
+    This is rebuilt from the snapshot of the instance if there is one. Deferred
+    fields are then still loaded from the database when they are accessed.
+    """
+    snapshot = getattr(instance, "_payable_snapshot", None)
+    if snapshot is None:
+        return sender.objects.get(pk=instance.pk)
+    if instance._state.adding:
+        raise sender.DoesNotExist
+    field_names, values = snapshot
+    return sender.from_db(instance._state.db, field_names, values)
+
+
+def _get_attname(model, field):
+    """Return the attribute that holds the value of a field.
+
+    This is the id of a foreign key, so comparing it does not fetch related objects.
+    """
+    try:
+        model_field = model._meta.get_field(field)
+    except (FieldDoesNotExist, AttributeError):
+        return field
+    return model_field.attname if model_field.concrete else field
+
+
+def _is_paid(payable) -> bool:
+    if hasattr(payable.model, "_payable_snapshot"):
+        # Prevent loading the payment, only its existence matters.
+        return payable.model.payment_id is not None
+    return bool(payable.payment)
+
+
+def _check_immutable_fields(sender, old_instance, instance, immutable_fields):
+    for field in immutable_fields:
+        attname = _get_attname(sender, field)
+        if getattr(old_instance, attname) != getattr(instance, attname):
+            raise PaymentError("Cannot change this model")
+
+
 def prevent_saving(sender, instance, **kwargs):
     if not instance.pk:
         # Do nothing if the model is not created yet
@@ -180,14 +259,15 @@ def prevent_saving(sender, instance, **kwargs):
     if not payable.immutable_after_payment:
         # Do nothing if the model is not marked as immutable
         return
-    if not payable.payment:
-        # Do nothing if the model is not actually paid
+    if not _is_paid(payable):
+        # Do nothing if the model is not actually paid. This is checked in the
+        # database, because the payment may have been made by another instance.
         if payable.get_payment() is not None:
             # If this happens, there was a payment, but it is being deleted
             raise PaymentError("You are trying to unlink a payment from its payable.")
         return
     try:
-        old_instance = sender.objects.get(pk=instance.pk)
+        old_instance = _get_old_instance(sender, instance)
     except sender.DoesNotExist:
         return
 
@@ -196,9 +276,7 @@ def prevent_saving(sender, instance, **kwargs):
         if isinstance(payable.immutable_model_fields_after_payment, dict)
         else payable.immutable_model_fields_after_payment
     )
-    for field in immutable_fields:
-        if getattr(old_instance, field) != getattr(instance, field):
-            raise PaymentError("Cannot change this model")
+    _check_immutable_fields(sender, old_instance, instance, immutable_fields)
 
 
 def prevent_saving_related(foreign_key_field):
@@ -207,11 +285,11 @@ def prevent_saving_related(foreign_key_field):
         if not payable.immutable_after_payment:
             # Do nothing if the parent is not marked as immutable
             return
-        if not payable.payment:
+        if not _is_paid(payable):
             # Do nothing if the parent is not actually paid
             return
         try:
-            old_instance = sender.objects.get(pk=instance.pk)
+            old_instance = _get_old_instance(sender, instance)
         except sender.DoesNotExist:
             raise PaymentError(
                 "Cannot save this model with foreign key to immutable payment"
@@ -222,8 +300,6 @@ def prevent_saving_related(foreign_key_field):
             if isinstance(payable.immutable_model_fields_after_payment, dict)
             else []
         )
-        for field in immutable_fields:
-            if getattr(old_instance, field) != getattr(instance, field):
-                raise PaymentError("Cannot change this model")
+        _check_immutable_fields(sender, old_instance, instance, immutable_fields)
 
     return prevent_related_saving_paid_after_immutable
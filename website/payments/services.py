@@ -1,21 +1,42 @@
 import datetime
+import logging
+from time import perf_counter
 
 from django.conf import settings
-from django.core import mail
 from django.db import transaction
-from django.db.models import Model, Q, QuerySet, Sum
+from django.db.models import (
+    Count,
+    Exists,
+    Max,
+    Min,
+    Model,
+    OuterRef,
+    Prefetch,
+    Q,
+    QuerySet,
+    Subquery,
+    Sum,
+)
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.text import capfirst
 from django.utils.translation import gettext_lazy as _
 
 from members.models import Member
-from utils.snippets import send_email
+from utils.exports import EXPORT_CHUNK_SIZE, save_csv
+from utils.media.services import get_media_url
+from utils.snippets import create_email, send_email, send_emails
 
 from .exceptions import PaymentError
-from .models import BankAccount, Payment, PaymentUser
+from .models import BankAccount, Payment, PaymentUser, ThaliaPayLedger
 from .payables import Payable, payables
 from .signals import processed_batch
 
+logger = logging.getLogger(__name__)
+
+# How long the link to an export that is generated in the background is valid.
+EXPORT_URL_LIFETIME = 3 * 60 * 60
+
 
 def create_payment(
     model_payable: Model | Payable,
@@ -158,32 +179,47 @@ def revoke_old_mandates() -> int:
 
     :return: number of affected rows
     """
-    return BankAccount.objects.filter(
+    mandates = BankAccount.objects.filter(
         last_used__lte=(timezone.now() - timezone.timedelta(days=36 * 30))
-    ).update(valid_until=timezone.now().date())
+    )
+    with transaction.atomic():
+        owners = set(mandates.values_list("owner", flat=True))
+        result = mandates.update(valid_until=timezone.now().date())
+        ThaliaPayLedger.objects.refresh(owners)
+    return result
 
 
 def process_batch(batch):
     """Process a Thalia Pay batch.
 
+    The bank accounts of the payers are updated with a fixed number of queries,
+    regardless of the number of payments in the batch.
+
     :param batch: the batch to be processed
     :return:
     """
+    start = perf_counter()
     batch.processed = True
 
-    payments = batch.payments_set.select_related("paid_by")
-    for payment in payments:
-        bank_account = payment.paid_by.bank_accounts.last()
-        if not bank_account:  # pragma: no cover
-            # This should not happen, cannot happen, does not happen (right... ;p)
-            # but if it does, we don't want to crash, but just remove the payment from the batch (make it unprocessed)
-            payment.batch = None
-            payment.save()
-        else:
-            bank_account.last_used = batch.withdrawal_date
-            bank_account.save(update_fields=["last_used"])
+    with transaction.atomic():
+        # This should not happen, cannot happen, does not happen (right... ;p)
+        # but if it does, we don't want to crash, but just remove the payments
+        # from the batch (make them unprocessed)
+        batch.payments_set.exclude(
+            Exists(BankAccount.objects.filter(owner=OuterRef("paid_by")))
+        ).update(batch=None)
+
+        last_bank_account = BankAccount.objects.filter(
+            owner=OuterRef("paid_by")
+        ).order_by("-created_at")
+        BankAccount.objects.filter(
+            pk__in=batch.payments_set.values(
+                bank_account=Subquery(last_bank_account.values("pk")[:1])
+            )
+        ).update(last_used=batch.withdrawal_date)
 
-    batch.save()
+        batch.save()
+    logger.info("Processed batch %d in %.2fs", batch.pk, perf_counter() - start)
     processed_batch.send(sender=None, instance=batch)
 
     send_tpay_batch_processing_emails(batch)
@@ -202,37 +238,89 @@ def derive_next_mandate_no(member) -> str:
 
 
 def send_tpay_batch_processing_emails(batch):
-    """Send withdrawal notice emails to all members in a batch."""
-    member_payments = batch.payments_set.values("paid_by").annotate(total=Sum("amount"))
-    with mail.get_connection() as connection:
-        for member_row in member_payments:
-            member = PaymentUser.objects.get(pk=member_row["paid_by"])
-            total_amount = member_row["total"]
-
-            send_email(
-                to=[member.email],
-                subject="Thalia Pay withdrawal notice",
-                txt_template="payments/email/tpay_withdrawal_notice_mail.txt",
-                html_template="payments/email/tpay_withdrawal_notice_mail.html",
-                connection=connection,
-                context={
-                    "name": member.get_full_name(),
-                    "batch": batch,
-                    "bank_account": member.bank_accounts.filter(
-                        mandate_no__isnull=False
-                    ).last(),
-                    "creditor_id": settings.SEPA_CREDITOR_ID,
-                    "payments": batch.payments_set.filter(paid_by=member),
-                    "total_amount": total_amount,
-                    "payments_url": (
-                        settings.BASE_URL
-                        + reverse(
-                            "payments:payment-list",
-                        )
-                    ),
-                },
-            )
-    return len(member_payments)
+    """Send withdrawal notice emails to all members in a batch.
+
+    The payers, their payments and their mandates are fetched at once, after
+    which the emails are rendered and sent in chunks over a single connection.
+    """
+    start = perf_counter()
+    members = list(
+        PaymentUser.objects.filter(paid_payment_set__batch=batch)
+        .distinct()
+        .prefetch_related(
+            Prefetch(
+                "paid_payment_set",
+                queryset=Payment.objects.filter(batch=batch).order_by("created_at"),
+                to_attr="batch_payments",
+            ),
+            Prefetch(
+                "bank_accounts",
+                queryset=BankAccount.objects.filter(mandate_no__isnull=False),
+                to_attr="mandates",
+            ),
+        )
+    )
+    fetched = perf_counter()
+
+    payments_url = settings.BASE_URL + reverse("payments:payment-list")
+    messages = [
+        create_email(
+            to=[member.email],
+            subject="Thalia Pay withdrawal notice",
+            txt_template="payments/email/tpay_withdrawal_notice_mail.txt",
+            html_template="payments/email/tpay_withdrawal_notice_mail.html",
+            context={
+                "name": member.get_full_name(),
+                "batch": batch,
+                "bank_account": member.mandates[-1] if member.mandates else None,
+                "creditor_id": settings.SEPA_CREDITOR_ID,
+                "payments": member.batch_payments,
+                "total_amount": sum(
+                    payment.amount for payment in member.batch_payments
+                ),
+                "payments_url": payments_url,
+            },
+        )
+        for member in members
+    ]
+    rendered = perf_counter()
+
+    send_emails(messages)
+    logger.info(
+        "Sent %d withdrawal notices of batch %d: "
+        "fetched in %.2fs, rendered in %.2fs, sent in %.2fs",
+        len(messages),
+        batch.pk,
+        fetched - start,
+        rendered - fetched,
+        perf_counter() - rendered,
+    )
+    return len(members)
+
+
+def check_tpay_ledgers(fix=False) -> list[int]:
+    """Compare the Thalia Pay ledgers with the payments and bank accounts.
+
+    :param fix: whether to recompute the ledgers that are not consistent
+    :return: the pks of the members with an inconsistent ledger
+    """
+    expected = ThaliaPayLedger.objects.compute()
+    actual = {
+        ledger.member_id: (
+            ledger.balance,
+            ledger.mandate_valid_from,
+            ledger.mandate_valid_until,
+        )
+        for ledger in ThaliaPayLedger.objects.all()
+    }
+    inconsistent = sorted(
+        member
+        for member in expected.keys() | actual.keys()
+        if expected.get(member) != actual.get(member)
+    )
+    if fix and inconsistent:
+        ThaliaPayLedger.objects.refresh(inconsistent)
+    return inconsistent
 
 
 def execute_data_minimisation(dry_run=False):
@@ -273,8 +361,210 @@ def execute_data_minimisation(dry_run=False):
     )
 
     if not dry_run:
-        queryset_payments.update(paid_by=None, processed_by=None)
-        queryset_bankaccounts.delete()
-        queryset_mandates.update(valid_until=timezone.now())
+        with transaction.atomic():
+            members = set(
+                queryset_payments.filter(type=Payment.TPAY)
+                .values_list("paid_by", flat=True)
+                .distinct()
+            ) | set(queryset_mandates.values_list("owner", flat=True))
+            queryset_payments.update(paid_by=None, processed_by=None)
+            queryset_bankaccounts.delete()
+            queryset_mandates.update(valid_until=timezone.now())
+            ThaliaPayLedger.objects.refresh(members)
 
     return queryset_payments
+
+
+PAYMENT_EXPORT_HEADERS = [
+    capfirst(header)
+    for header in (
+        _("created"),
+        _("amount"),
+        _("type"),
+        _("processor"),
+        _("payer id"),
+        _("payer name"),
+        _("notes"),
+    )
+]
+
+
+def _payment_export_row(payment):
+    return [
+        payment.created_at,
+        payment.amount,
+        payment.get_type_display(),
+        payment.processed_by.get_full_name() if payment.processed_by else "-",
+        payment.paid_by.pk if payment.paid_by else "-",
+        payment.paid_by.get_full_name() if payment.paid_by else "-",
+        payment.notes,
+    ]
+
+
+def export_payments(queryset: QuerySet):
+    """Return the headers and an iterator of the rows of a CSV export of payments."""
+    payments = queryset.select_related("processed_by", "paid_by").iterator(
+        chunk_size=EXPORT_CHUNK_SIZE
+    )
+    return PAYMENT_EXPORT_HEADERS, map(_payment_export_row, payments)
+
+
+def export_payments_to_file(payment_ids: list[str], member: Member) -> str:
+    """Export payments to a CSV file, and email a link to it to a member.
+
+    This is meant for exports that are too large to be generated during
+    a request, like those of a whole year. Returns the name of the file.
+    """
+
+    def rows():
+        # Keep the order of the ids, with a fixed number of queries per chunk.
+        for start in range(0, len(payment_ids), EXPORT_CHUNK_SIZE):
+            chunk = payment_ids[start : start + EXPORT_CHUNK_SIZE]
+            payments = {
+                str(pk): payment
+                for pk, payment in Payment.objects.select_related(
+                    "processed_by", "paid_by"
+                )
+                .in_bulk(chunk)
+                .items()
+            }
+            for pk in chunk:
+                if pk in payments:
+                    yield _payment_export_row(payments[pk])
+
+    name = save_csv("payments", PAYMENT_EXPORT_HEADERS, rows())
+
+    send_email(
+        to=[member.email],
+        subject="Your export of payments is ready",
+        txt_template="payments/email/export_ready.txt",
+        context={
+            "name": member.first_name,
+            "count": len(payment_ids),
+            "url": get_media_url(
+                name,
+                attachment="payments.csv",
+                absolute_url=True,
+                expire_seconds=EXPORT_URL_LIFETIME,
+            ),
+        },
+    )
+    return name
+
+
+def export_bank_accounts(queryset: QuerySet):
+    """Return the headers and an iterator of the rows of a CSV export of bank accounts."""
+    headers = [
+        capfirst(header)
+        for header in (
+            _("created"),
+            _("name"),
+            _("reference"),
+            _("IBAN"),
+            _("BIC"),
+            _("valid from"),
+            _("valid until"),
+            _("signature"),
+        )
+    ]
+    rows = (
+        [
+            account.created_at,
+            account.name,
+            account.mandate_no,
+            account.iban,
+            account.bic or "",
+            account.valid_from or "",
+            account.valid_until or "",
+            account.signature or "",
+        ]
+        for account in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    return headers, rows
+
+
+def export_batch(batch):
+    """Return the headers and an iterator of the rows of the CSV export of a batch.
+
+    There is a row for every member with the total of their payments,
+    and their last bank account, from which it is withdrawn.
+    """
+    headers = [
+        capfirst(header)
+        for header in (
+            _("Account holder"),
+            _("IBAN"),
+            _("Mandate Reference"),
+            _("Amount"),
+            _("Description"),
+            _("Mandate Date"),
+        )
+    ]
+
+    last_account = BankAccount.objects.filter(owner=OuterRef("paid_by")).order_by(
+        "-created_at"
+    )
+    member_rows = (
+        batch.payments_set.values("paid_by")
+        .annotate(
+            total=Sum("amount"),
+            initials=Subquery(last_account.values("initials")[:1]),
+            last_name=Subquery(last_account.values("last_name")[:1]),
+            iban=Subquery(last_account.values("iban")[:1]),
+            mandate_no=Subquery(last_account.values("mandate_no")[:1]),
+            valid_from=Subquery(last_account.values("valid_from")[:1]),
+        )
+        .order_by("paid_by")
+    )
+
+    rows = (
+        [
+            f"{row['initials']} {row['last_name']}" if row["iban"] else "",
+            row["iban"] or "",
+            row["mandate_no"] or "",
+            f"{row['total']:.2f}",
+            batch.description,
+            row["valid_from"] or "",
+        ]
+        for row in member_rows.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    return headers, rows
+
+
+def get_batch_topics(batch) -> QuerySet:
+    """Get the number, total amount and first and last date of payments per topic."""
+    return (
+        batch.payments_set.values("topic")
+        .annotate(
+            total=Sum("amount"),
+            count=Count("paid_by"),
+            min_date=Min("created_at"),
+            max_date=Max("created_at"),
+        )
+        .order_by("topic")
+    )
+
+
+def export_batch_topics(batch):
+    """Return the headers and an iterator of the rows of the topic export of a batch."""
+    headers = [
+        capfirst(header)
+        for header in (
+            _("Topic"),
+            _("No. of payments"),
+            _("First payment"),
+            _("Last payment"),
+            _("Total amount"),
+        )
+    ]
+    rows = (
+        [
+            row["topic"],
+            row["count"],
+            timezone.localtime(row["min_date"]).date(),
+            timezone.localtime(row["max_date"]).date(),
+            f"{row['total']:.2f}",
+        ]
+        for row in get_batch_topics(batch).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    return headers, rows
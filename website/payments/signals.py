@@ -1,3 +1,35 @@
-from django.dispatch import Signal
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from .models import BankAccount, Batch, Payment, ThaliaPayLedger
 
 processed_batch = Signal()
+
+
+# The ledgers are not updated with a suspendingreceiver, because they must
+# always match the payments and bank accounts, also when testing.
+@receiver(
+    (post_save, post_delete), sender=Payment, dispatch_uid="update_payment_ledger"
+)
+def update_payment_ledger(sender, instance, **kwargs):
+    """Update the Thalia Pay balance of the payer of a changed payment."""
+    if Payment.TPAY in (instance.type, instance._type):
+        ThaliaPayLedger.objects.refresh({instance.paid_by_id, instance._paid_by_id})
+    instance._paid_by_id = instance.paid_by_id
+
+
+@receiver(
+    (post_save, post_delete), sender=BankAccount, dispatch_uid="update_mandate_ledger"
+)
+def update_mandate_ledger(sender, instance, **kwargs):
+    """Update the Thalia Pay mandate of the owner of a changed bank account."""
+    ThaliaPayLedger.objects.refresh([instance.owner_id])
+
+
+@receiver(post_save, sender=Batch, dispatch_uid="update_batch_ledger")
+def update_batch_ledger(sender, instance, **kwargs):
+    """Update the Thalia Pay balances of the payers in a processed batch."""
+    if instance.processed:
+        ThaliaPayLedger.objects.refresh(
+            instance.payments_set.values_list("paid_by", flat=True).distinct()
+        )
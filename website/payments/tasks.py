@@ -1,8 +1,29 @@
+import logging
+
 from celery import shared_task
 
+from members.models import Member
 from payments import services
 
+logger = logging.getLogger(__name__)
+
 
 @shared_task
 def revoke_mandates():
     services.revoke_old_mandates()
+
+
+@shared_task
+def check_tpay_ledgers():
+    inconsistent = services.check_tpay_ledgers(fix=True)
+    if inconsistent:
+        logger.warning(
+            "Repaired the Thalia Pay ledgers of %d members: %s",
+            len(inconsistent),
+            inconsistent,
+        )
+
+
+@shared_task
+def export_payments(payment_ids, member_id):
+    services.export_payments_to_file(payment_ids, Member.objects.get(pk=member_id))
@@ -1,9 +1,12 @@
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 
 from freezegun import freeze_time
 
+from events.models import Event, EventRegistration
 from payments.models import BankAccount, Batch, Payment, PaymentUser
 
 
@@ -89,3 +92,65 @@ class PaymentListViewTest(TestCase):
         )
         self.assertEqual(200, response.status_code)
         self.assertNotContains(response, "Testing Payment 1")
+
+
+@freeze_time("2019-04-01")
+@override_settings(SUSPEND_SIGNALS=True, THALIA_PAY_ENABLED_PAYMENT_METHOD=True)
+class PayableDetailViewTest(TestCase):
+    """Test for the PayableDetailView."""
+
+    fixtures = ["members.json"]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.member = PaymentUser.objects.filter(last_name="Wiggers").first()
+        BankAccount.objects.create(
+            owner=cls.member,
+            initials="J1",
+            last_name="Test",
+            iban="NL91ABNA0417164300",
+            valid_from="2019-03-01",
+            signature="sig",
+            mandate_no="11-2",
+        )
+        event = Event.objects.create(
+            title="testevent",
+            description="desc",
+            start=timezone.now(),
+            end=timezone.now() + timezone.timedelta(hours=1),
+            location="test location",
+            map_location="test map location",
+            price=5.00,
+            fine=0.00,
+        )
+        cls.registration = EventRegistration.objects.create(
+            event=event, member=cls.member
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.member)
+
+    def test_pay(self):
+        url = reverse(
+            "api:v2:payments:payments-payable-detail",
+            args=["events", "eventregistration", self.registration.pk],
+        )
+        table = EventRegistration._meta.db_table
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch(url)
+
+        self.assertEqual(201, response.status_code)
+        self.registration.refresh_from_db()
+        self.assertEqual(self.registration.payment.type, Payment.TPAY)
+        self.assertEqual(self.registration.payment.amount, 5)
+
+        # The registration is fetched by the view, locked while paying and
+        # refreshed afterwards, but not fetched again to check immutable fields.
+        selects = [
+            query["sql"]
+            for query in context.captured_queries
+            if query["sql"].startswith(f'SELECT "{table}"')
+        ]
+        self.assertEqual(len(selects), 3)
@@ -375,7 +375,9 @@ class PaymentAdminTest(TestCase):
         response = self.client.get(reverse("admin:payments_payment_changelist"))
 
         actions = self.admin.get_actions(response.wsgi_request)
-        self.assertCountEqual(actions, ["delete_selected", "export_csv"])
+        self.assertCountEqual(
+            actions, ["delete_selected", "export_csv", "export_csv_async"]
+        )
 
         self._give_user_permissions()
         response = self.client.get(reverse("admin:payments_payment_changelist"))
@@ -388,6 +390,7 @@ class PaymentAdminTest(TestCase):
                 "add_to_new_batch",
                 "add_to_last_batch",
                 "export_csv",
+                "export_csv_async",
             ],
         )
 
@@ -433,6 +436,8 @@ class PaymentAdminTest(TestCase):
 
         response = self.admin.export_csv(HttpRequest(), Payment.objects.all())
 
+        with self.assertNumQueries(1):
+            content = response.getvalue()
         self.assertEqual(
             f"Created,Amount,Type,Processor,Payer id,Payer name,"
             f"Notes\r\n2019-01-01 00:00:00+00:00,"
@@ -440,9 +445,23 @@ class PaymentAdminTest(TestCase):
             f"\r\n2019-01-01 00:00:00+00:00,17.50,"
             f"Cash payment,Sébastiaan Versteeg,{self.user.pk},Sébastiaan Versteeg,"
             f"\r\n",
-            response.content.decode("utf-8"),
+            content.decode("utf-8"),
+        )
+
+    @mock.patch("payments.admin.export_payments.delay")
+    def test_export_csv_async(self, delay) -> None:
+        payment = Payment.objects.create(
+            amount=7.5, processed_by=self.user, paid_by=self.user, type=Payment.CARD
         )
 
+        response = self.client.post(
+            reverse("admin:payments_payment_changelist"),
+            {"action": "export_csv_async", "_selected_action": [payment.pk]},
+        )
+
+        self.assertEqual(response.status_code, 302)
+        delay.assert_called_once_with([str(payment.pk)], self.user.pk)
+
     def test_get_field_queryset(self) -> None:
         b1 = Batch.objects.create(id=1)
         Batch.objects.create(id=2, processed=True)
@@ -890,7 +909,7 @@ class BankAccountAdminTest(TestCase):
             b"12-1,NL91ABNA0417164300,,2018-12-27,2019-01-01,"
             b"sig\r\n2019-01-01 00:00:00+00:00,J4 Test,11-1,"
             b"DE12500105170648489890,NBBEBEBB,2019-01-01,2019-01-06,sig\r\n",
-            response.content,
+            response.getvalue(),
         )
 
     @mock.patch("django.contrib.admin.ModelAdmin.message_user")
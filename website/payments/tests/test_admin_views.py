@@ -381,8 +381,10 @@ class BatchExportAdminViewTest(TestCase):
 
         response = self.client.post(f"/admin/payments/batch/{self.batch.id}/export/")
 
+        with self.assertNumQueries(1):
+            content = response.getvalue()
         self.assertEqual(
-            response.content,
+            content,
             b"Account holder,IBAN,Mandate Reference,Amount,Description,Mandate Date\r\n"
             b"T.E.S.T. ersssss,DE75512108001245126199,2,3.00,Thalia Pay payments for 2020-1,2020-01-01\r\n"
             b"T.E.S.T. ersssss2,NL02ABNA0123456789,1,6.00,Thalia Pay payments for 2020-1,2020-01-01\r\n",
@@ -498,7 +500,7 @@ class BatchTopicExportAdminViewTest(TestCase):
         )
 
         self.assertEqual(
-            response.content,
+            response.getvalue(),
             b"Topic,No. of payments,First payment,Last payment,Total amount\r\n"
             b"test1,2,2020-01-01,2020-01-01,5.00\r\n"
             b"test2,2,2020-01-01,2020-01-01,4.00\r\n",
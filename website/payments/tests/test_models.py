@@ -1,17 +1,33 @@
 import datetime
 from decimal import Decimal
+from importlib import import_module
+from time import perf_counter
 from unittest.mock import PropertyMock, patch
 
+from django.apps import apps
+from django.contrib import admin
 from django.core.exceptions import ValidationError
+from django.db import connection, models
+from django.db.models import DEFERRED
 from django.db.models.deletion import ProtectedError
-from django.test import TestCase, override_settings
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
 from freezegun import freeze_time
 
 from events.models import Event, EventRegistration
+from members.models import Member
 from payments import services
-from payments.models import BankAccount, Batch, Payment, PaymentUser, validate_not_zero
+from payments.exceptions import PaymentError
+from payments.models import (
+    BankAccount,
+    Batch,
+    Payment,
+    PaymentUser,
+    ThaliaPayLedger,
+    validate_not_zero,
+)
 from payments.tests.__mocks__ import MockModel, MockPayable
 from sales import payables
 
@@ -224,6 +240,131 @@ class PaymentTest(TestCase):
             with self.assertNumQueries(0):
                 self.assertEqual(payment.payable_object, registration)
 
+    def _create_paid_registrations(self, count):
+        event = Event.objects.create(
+            title="testevent",
+            description="desc",
+            start=timezone.now(),
+            end=(timezone.now() + datetime.timedelta(hours=1)),
+            location="test location",
+            map_location="test map location",
+            price=1.00,
+            fine=0.00,
+        )
+        registrations = []
+        for i in range(count):
+            registration = EventRegistration.objects.create(
+                event=event, name=f"guest {i}"
+            )
+            services.create_payment(registration, self.member, Payment.CASH)
+            registration.refresh_from_db()
+            registrations.append(registration)
+        return registrations
+
+    def test_save_paid_payable_without_refetching(self):
+        (registration,) = self._create_paid_registrations(1)
+        registration = EventRegistration.objects.get(pk=registration.pk)
+        table = EventRegistration._meta.db_table
+
+        registration.remarks = "changed"
+        with CaptureQueriesContext(connection) as context:
+            registration.save()
+        # Only the uniqueness checks of full_clean() query the registrations.
+        self.assertFalse(
+            [
+                query["sql"]
+                for query in context.captured_queries
+                if query["sql"].startswith(f'SELECT "{table}"')
+            ]
+        )
+
+        registration.name = "changed"
+        with self.assertRaises(PaymentError):
+            registration.save()
+
+    def test_save_paid_payable_in_admin_without_refetching(self):
+        (registration,) = self._create_paid_registrations(1)
+        registration_admin = admin.site._registry[EventRegistration]
+        request = RequestFactory().post("/")
+        request.user = request.member = Member.objects.get(pk=self.member.pk)
+        table = EventRegistration._meta.db_table
+
+        # Like the change view, load the registration and then save it.
+        with CaptureQueriesContext(connection) as context:
+            obj = registration_admin.get_object(request, str(registration.pk))
+            obj.remarks = "changed"
+            registration_admin.save_model(request, obj, None, True)
+
+        self.assertEqual(
+            len(
+                [
+                    query["sql"]
+                    for query in context.captured_queries
+                    if query["sql"].startswith(f'SELECT "{table}"')
+                ]
+            ),
+            1,
+        )
+
+    def test_deferred_fields_are_not_loaded(self):
+        with self.assertNumQueries(1):
+            payment = Payment.objects.only("pk").get(pk=self.payment.pk)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(payment.type, Payment.CASH)
+
+    def test_hydration_speed(self):
+        """Test that loading payments is not much slower than loading plain models."""
+        values = [
+            getattr(self.payment, field.attname)
+            for field in Payment._meta.concrete_fields
+        ]
+
+        def hydrate(init):
+            best = float("inf")
+            for __ in range(5):
+                start = perf_counter()
+                for __ in range(5000):
+                    init(Payment.__new__(Payment), *values)
+                best = min(best, perf_counter() - start)
+            return best
+
+        # Timings vary too much on shared machines to check them closely, so the
+        # deterministic checks below guard what makes loading payments slow.
+        hydrate(Payment.__init__)
+        self.assertLess(hydrate(Payment.__init__), 3 * hydrate(models.Model.__init__))
+
+        def count_field_scans(init, values):
+            with patch.object(
+                type(Payment._meta),
+                "concrete_fields",
+                new_callable=PropertyMock,
+                return_value=Payment._meta.concrete_fields,
+            ) as concrete_fields:
+                init(Payment.__new__(Payment), *values)
+            return concrete_fields.call_count
+
+        # Payment.__init__ does not scan the fields itself.
+        self.assertEqual(
+            count_field_scans(Payment.__init__, values),
+            count_field_scans(models.Model.__init__, values),
+        )
+
+        # Nor does it load deferred fields.
+        deferred = [
+            DEFERRED if field.attname in ("type", "batch_id", "paid_by_id") else value
+            for field, value in zip(Payment._meta.concrete_fields, values, strict=True)
+        ]
+        with self.assertNumQueries(0):
+            payment = Payment.from_db(
+                "default",
+                [field.attname for field in Payment._meta.concrete_fields],
+                deferred,
+            )
+        self.assertEqual(
+            payment.get_deferred_fields(), {"type", "batch_id", "paid_by_id"}
+        )
+
 
 @freeze_time("2019-01-01")
 @override_settings(SUSPEND_SIGNALS=True, THALIA_PAY_ENABLED_PAYMENT_METHOD=True)
@@ -549,6 +690,77 @@ class PaymentUserTest(TestCase):
         self.assertEqual(self.member.tpay_balance, 0)
         payables.payables._unregister(MockModel)
 
+    def test_tpay_ledger(self):
+        self.assertFalse(ThaliaPayLedger.objects.exists())
+        account = BankAccount.objects.create(
+            owner=self.member,
+            initials="J",
+            last_name="Test2",
+            iban="NL91ABNA0417164300",
+            mandate_no="11-2",
+            valid_from=timezone.now().date() - timezone.timedelta(days=5),
+            signature="base64,png",
+        )
+        payment = Payment.objects.create(
+            paid_by=self.member, amount=5, type=Payment.TPAY, topic="test"
+        )
+        Payment.objects.create(
+            paid_by=self.member, amount=3, type=Payment.CASH, topic="test"
+        )
+
+        ledger = ThaliaPayLedger.objects.get()
+        self.assertEqual(ledger.member_id, self.member.pk)
+        self.assertEqual(ledger.balance, Decimal(-5))
+        self.assertEqual(ledger.mandate_valid_from, account.valid_from)
+        self.assertIsNone(ledger.mandate_valid_until)
+
+        account.valid_until = timezone.now().date() + timezone.timedelta(days=5)
+        account.save()
+        ledger.refresh_from_db()
+        self.assertEqual(ledger.mandate_valid_until, account.valid_until)
+
+        with freeze_time(account.valid_until):
+            self.assertFalse(self.member.tpay_enabled)
+
+        payment.type = Payment.CASH
+        payment.save()
+        account.delete()
+        self.assertFalse(ThaliaPayLedger.objects.exists())
+
+    def test_tpay_ledger_mandate_gap(self):
+        today = timezone.now().date()
+
+        def mandate(number, valid_from, valid_until):
+            return BankAccount.objects.create(
+                owner=self.member,
+                initials="J",
+                last_name="Test2",
+                iban="NL91ABNA0417164300",
+                mandate_no=f"11-{number}",
+                valid_from=today + timezone.timedelta(days=valid_from),
+                valid_until=today + timezone.timedelta(days=valid_until),
+                signature="base64,png",
+            )
+
+        first = mandate(1, -10, 5)
+        adjoining = mandate(2, 5, 10)
+        mandate(3, 20, 30)
+
+        ledger = ThaliaPayLedger.objects.get()
+        self.assertEqual(ledger.mandate_valid_from, first.valid_from)
+        self.assertEqual(ledger.mandate_valid_until, adjoining.valid_until)
+        with freeze_time(today + timezone.timedelta(days=15)):
+            self.assertFalse(PaymentUser.objects.get(pk=self.member.pk).tpay_enabled)
+
+        # The migration that fills the ledgers merges the mandates the same way.
+        ThaliaPayLedger.objects.all().delete()
+        import_module("payments.migrations.0026_thaliapayledger").fill_ledgers(
+            apps, None
+        )
+        ledger = ThaliaPayLedger.objects.get()
+        self.assertEqual(ledger.mandate_valid_from, first.valid_from)
+        self.assertEqual(ledger.mandate_valid_until, adjoining.valid_until)
+
     def test_allow_disallow_tpay(self):
         self.assertTrue(self.member.tpay_allowed)
         self.member.allow_tpay()
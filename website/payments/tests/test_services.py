@@ -1,6 +1,8 @@
 from unittest.mock import MagicMock, PropertyMock, patch
 
 from django.conf import settings
+from django.core import mail
+from django.core.files.storage import DefaultStorage
 from django.test import TestCase, override_settings
 from django.utils import timezone
 
@@ -8,7 +10,7 @@ from freezegun import freeze_time
 
 from payments import services
 from payments.exceptions import PaymentError
-from payments.models import BankAccount, Batch, Payment, PaymentUser
+from payments.models import BankAccount, Batch, Payment, PaymentUser, ThaliaPayLedger
 from payments.payables import payables
 from payments.tests.__mocks__ import MockModel, MockPayable
 
@@ -233,6 +235,102 @@ class ServicesTest(TestCase):
             ba.refresh_from_db()
             self.assertEqual(b.withdrawal_date, ba.last_used)
 
+    @patch("payments.services.send_tpay_batch_processing_emails")
+    def test_process_batch_without_bank_account(self, mock_mails):
+        other = PaymentUser.objects.exclude(pk=self.member.pk).first()
+        accounts = [
+            BankAccount.objects.create(
+                owner=owner,
+                initials="J",
+                last_name="Test",
+                iban="NL91ABNA0417164300",
+                mandate_no=f"{owner.pk}-1",
+                valid_from=timezone.now().date() - timezone.timedelta(days=2000),
+                signature="base64,png",
+            )
+            for owner in (self.member, other)
+        ]
+        batch = Batch.objects.create()
+        payments = [
+            Payment.objects.create(
+                paid_by=owner, amount=1, type=Payment.TPAY, topic="test", batch=batch
+            )
+            for owner in (self.member, other)
+        ]
+        accounts[1].delete()
+
+        with self.assertNumQueries(12):
+            services.process_batch(batch)
+
+        self.assertQuerySetEqual(batch.payments_set.all(), [payments[0]])
+        self.assertIsNone(Payment.objects.get(pk=payments[1].pk).batch)
+        accounts[0].refresh_from_db()
+        self.assertEqual(accounts[0].last_used, batch.withdrawal_date)
+
+    @override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+    @patch("utils.snippets.EMAIL_CHUNK_SIZE", 1)
+    def test_send_tpay_batch_processing_emails(self):
+        members = [self.member, PaymentUser.objects.exclude(pk=self.member.pk).first()]
+        batch = Batch.objects.create()
+        for i, member in enumerate(members):
+            member.email = f"member{i}@example.org"
+            member.save()
+            BankAccount.objects.create(
+                owner=member,
+                initials="J",
+                last_name="Test",
+                iban="NL91ABNA0417164300",
+                mandate_no=f"{member.pk}-1",
+                valid_from=timezone.now().date() - timezone.timedelta(days=2000),
+                signature="base64,png",
+            )
+            for amount in range(1, i + 3):
+                Payment.objects.create(
+                    paid_by=member,
+                    amount=amount,
+                    type=Payment.TPAY,
+                    topic=f"topic {amount}",
+                    batch=batch,
+                )
+
+        with self.assertNumQueries(3):
+            self.assertEqual(services.send_tpay_batch_processing_emails(batch), 2)
+
+        self.assertEqual(len(mail.outbox), 2)
+        emails = {email.to[0]: email.body for email in mail.outbox}
+        self.assertIn("€ 3.00", emails["member0@example.org"])
+        self.assertIn("€ 6.00", emails["member1@example.org"])
+        self.assertIn(f"{members[1].pk}-1", emails["member1@example.org"])
+        self.assertNotIn("topic 3", emails["member0@example.org"])
+
+    def test_check_tpay_ledgers(self):
+        other = PaymentUser.objects.exclude(pk=self.member.pk).first()
+        BankAccount.objects.create(
+            owner=self.member,
+            initials="J",
+            last_name="Test",
+            iban="NL91ABNA0417164300",
+            mandate_no="11-1",
+            valid_from=timezone.now().date() - timezone.timedelta(days=5),
+            signature="base64,png",
+        )
+        Payment.objects.create(
+            paid_by=self.member, amount=5, type=Payment.TPAY, topic="test"
+        )
+        self.assertEqual(services.check_tpay_ledgers(), [])
+
+        ThaliaPayLedger.objects.update(balance=0)
+        ThaliaPayLedger.objects.create(member=other, balance=-1)
+        self.assertEqual(
+            services.check_tpay_ledgers(), sorted([self.member.pk, other.pk])
+        )
+        self.assertEqual(ThaliaPayLedger.objects.count(), 2)
+
+        services.check_tpay_ledgers(fix=True)
+        self.assertEqual(services.check_tpay_ledgers(), [])
+        self.assertEqual(ThaliaPayLedger.objects.get().balance, -5)
+        self.assertEqual(PaymentUser.objects.get(pk=self.member.pk).tpay_balance, -5)
+
     def test_data_minimisation(self):
         with self.subTest("Payments that are 7 years old must be minimised"):
             p = Payment.objects.create(
@@ -269,3 +367,33 @@ class ServicesTest(TestCase):
             services.execute_data_minimisation(dry_run=True)
             payment = Payment.objects.get(pk=p.pk)
             self.assertIsNotNone(payment.paid_by)
+
+    @override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+    def test_export_payments_to_file(self):
+        payments = [
+            Payment.objects.create(
+                amount=amount, paid_by=self.member, type=Payment.CASH, topic="test"
+            )
+            for amount in (1, 2, 3)
+        ]
+        ids = [str(payment.pk) for payment in reversed(payments)]
+        self.member.email = "treasurer@example.org"
+
+        with patch("payments.services.EXPORT_CHUNK_SIZE", 2):
+            name = services.export_payments_to_file(ids, self.member)
+
+        storage = DefaultStorage()
+        self.addCleanup(storage.delete, name)
+        with storage.open(name) as file:
+            lines = file.read().decode().splitlines()
+
+        self.assertEqual(
+            lines[0], "Created,Amount,Type,Processor,Payer id,Payer name,Notes"
+        )
+        self.assertEqual(
+            [line.split(",")[1] for line in lines[1:]], ["3.00", "2.00", "1.00"]
+        )
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["treasurer@example.org"])
+        self.assertIn(f"/media/private/{name}?sig=", mail.outbox[0].body)
@@ -5,6 +5,7 @@ from django.utils.translation import gettext_lazy as _
 
 from .forms import AlbumForm
 from .models import Album, Like, Photo
+from .services import update_like_counts
 from .tasks import process_album_upload
 
 
@@ -27,11 +28,12 @@ class AlbumAdmin(admin.ModelAdmin):
         "event",
         "hidden",
         "is_processing",
+        "processing_progress",
         "shareable",
         "album_archive",
         "_cover",
     )
-    readonly_fields = ("is_processing",)
+    readonly_fields = ("is_processing", "processing_progress")
     search_fields = ("title", "date")
     list_filter = ("hidden", "shareable")
     date_hierarchy = "date"
@@ -61,6 +63,14 @@ class AlbumAdmin(admin.ModelAdmin):
     num_photos.short_description = _("Number of photos")
     num_photos.admin_order_field = "photos_count"
 
+    def processing_progress(self, obj):
+        """Show how many photos of the last uploaded archive have been processed."""
+        if not obj.processing_total:
+            return "-"
+        return f"{obj.processing_done} / {obj.processing_total}"
+
+    processing_progress.short_description = "Processing progress"
+
     def save_model(self, request, obj, form, change):
         """Save the new Album by extracting the archive."""
         super().save_model(request, obj, form, change)
@@ -122,6 +132,11 @@ class PhotoAdmin(admin.ModelAdmin):
         LikeInline,
     ]
 
+    def save_related(self, request, form, formsets, change):
+        """Recount the likes, which can be edited inline."""
+        super().save_related(request, form, formsets, change)
+        update_like_counts(Photo.objects.filter(pk=form.instance.pk))
+
     def get_deleted_objects(self, objs, request):
         (
             deleted_objects,
@@ -3,6 +3,7 @@ from django.urls import include, path
 from photos.api.v2.views import (
     AlbumDetailView,
     AlbumListView,
+    AlbumPhotoListView,
     LikedPhotosListView,
     PhotoLikeView,
 )
@@ -20,6 +21,11 @@ urlpatterns = [
                     AlbumDetailView.as_view(),
                     name="album-detail",
                 ),
+                path(
+                    "albums/<slug:slug>/photos/",
+                    AlbumPhotoListView.as_view(),
+                    name="album-photos",
+                ),
                 path(
                     "photos/<int:pk>/like/", PhotoLikeView.as_view(), name="photo-like"
                 ),
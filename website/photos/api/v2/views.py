@@ -1,9 +1,12 @@
 from django.db.models import Count, Prefetch, Q
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
 
 from oauth2_provider.contrib.rest_framework import IsAuthenticatedOrTokenHasScope
 from rest_framework import filters, status
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.generics import ListAPIView, RetrieveAPIView
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
@@ -13,7 +16,7 @@ from photos.api.v2.serializers.album import (
     AlbumSerializer,
     PhotoListSerializer,
 )
-from photos.models import Album, Like, Photo
+from photos.models import Album, Photo
 from utils.media.services import fetch_thumbnails
 
 
@@ -29,7 +32,7 @@ class AlbumListView(ListAPIView):
         return super().get_serializer(*args, **kwargs)
 
     queryset = Album.objects.filter(hidden=False, is_processing=False).select_related(
-        "_cover"
+        "_cover", "fallback_cover"
     )
 
     permission_classes = [
@@ -40,8 +43,34 @@ class AlbumListView(ListAPIView):
     search_fields = ("title", "date", "slug")
 
 
+def _album_photos(request):
+    """Return the photos with the annotations used by `PhotoListSerializer`."""
+    photos = Photo.objects.all()
+    if request.member:
+        photos = photos.annotate(
+            member_likes=Count("likes", filter=Q(likes__member=request.member))
+        )
+    return photos.order_by("pk")
+
+
+class AlbumPhotoPagination(CursorPagination):
+    """Paginate the photos of an album by their primary key.
+
+    Unlike offset pagination, each page is a single index range scan, no
+    matter how far into the album it is.
+    """
+
+    ordering = "pk"
+    page_size_query_param = "limit"
+    max_page_size = 200
+
+
 class AlbumDetailView(RetrieveAPIView):
-    """Returns the details of an album."""
+    """Returns the details of an album.
+
+    With `?paginate_photos=true`, only the first page of photos is included,
+    and `photos_next` links to the next page of `AlbumPhotoListView`.
+    """
 
     serializer_class = AlbumSerializer
     permission_classes = [
@@ -51,28 +80,63 @@ class AlbumDetailView(RetrieveAPIView):
     lookup_field = "slug"
 
     def retrieve(self, request, *args, **kwargs):
-        if not services.is_album_accessible(request, self.get_object()):
+        album = self.get_object()
+        if not services.is_album_accessible(request, album):
             raise PermissionDenied
-        return super().retrieve(request, *args, **kwargs)
 
-    def get_object(self):
-        object = super().get_object()
-        fetch_thumbnails([photo.file for photo in object.photo_set.all()])
-        return object
+        if request.query_params.get("paginate_photos") != "true":
+            fetch_thumbnails([photo.file for photo in album.photo_set.all()])
+            return Response(self.get_serializer(album).data)
+
+        paginator = AlbumPhotoPagination()
+        photos = paginator.paginate_queryset(
+            _album_photos(request).filter(album=album), request, view=self
+        )
+        # The next pages are served by the photo list endpoint.
+        paginator.base_url = request.build_absolute_uri(
+            reverse("api:v2:photos:album-photos", args=[album.slug])
+        )
+        fetch_thumbnails([photo.file for photo in photos])
+
+        context = self.get_serializer_context()
+        data = AlbumListSerializer(album, context=context).data
+        data["photos"] = PhotoListSerializer(photos, many=True, context=context).data
+        data["photos_next"] = paginator.get_next_link()
+        return Response(data)
 
     def get_queryset(self):
-        photos = Photo.objects.select_properties("num_likes")
-        if self.request.member:
-            photos = photos.annotate(
-                member_likes=Count("likes", filter=Q(likes__member=self.request.member))
-            )
+        albums = Album.objects.filter(hidden=False, is_processing=False)
+        if self.request.query_params.get("paginate_photos") == "true":
+            return albums
+        return albums.prefetch_related(
+            Prefetch("photo_set", queryset=_album_photos(self.request))
+        )
+
 
-        # Fix select_properties dropping the default ordering.
-        photos = photos.order_by("pk")
+class AlbumPhotoListView(ListAPIView):
+    """Returns the photos of an album, one page at a time."""
 
-        return Album.objects.filter(hidden=False, is_processing=False).prefetch_related(
-            Prefetch("photo_set", queryset=photos)
+    serializer_class = PhotoListSerializer
+    pagination_class = AlbumPhotoPagination
+    permission_classes = [
+        IsAuthenticatedOrTokenHasScope,
+    ]
+    required_scopes = ["photos:read"]
+
+    def get_serializer(self, *args, **kwargs):
+        if len(args) > 0:
+            photos = args[0]
+            fetch_thumbnails([photo.file for photo in photos])
+        return super().get_serializer(*args, **kwargs)
+
+    def get_queryset(self):
+        album = get_object_or_404(
+            Album.objects.filter(hidden=False, is_processing=False),
+            slug=self.kwargs["slug"],
         )
+        if not services.is_album_accessible(self.request, album):
+            raise PermissionDenied
+        return _album_photos(self.request).filter(album=album)
 
 
 class LikedPhotosListView(ListAPIView):
@@ -110,8 +174,6 @@ class LikedPhotosListView(ListAPIView):
             .annotate(
                 member_likes=Count("likes", filter=Q(likes__member=self.request.member))
             )
-            .select_properties("num_likes")
-            # Fix select_properties dropping the default ordering.
             .order_by("pk")
         )
 
@@ -146,7 +208,7 @@ class PhotoLikeView(APIView):
         except Photo.DoesNotExist:
             return Response(status=status.HTTP_404_NOT_FOUND)
 
-        _, created = Like.objects.get_or_create(photo=photo, member=request.member)
+        created = services.like_photo(photo, request.member)
 
         if created:
             return Response(
@@ -173,11 +235,7 @@ class PhotoLikeView(APIView):
         except Photo.DoesNotExist:
             return Response(status=status.HTTP_404_NOT_FOUND)
 
-        try:
-            like = Like.objects.filter(
-                photo__album__hidden=False, photo__album__is_processing=False
-            ).get(member=request.member, photo__pk=photo_id)
-        except Like.DoesNotExist:
+        if not services.unlike_photo(photo, request.member):
             return Response(
                 {
                     "liked": False,
@@ -186,8 +244,6 @@ class PhotoLikeView(APIView):
                 status=status.HTTP_204_NO_CONTENT,
             )
 
-        like.delete()
-
         return Response(
             {
                 "liked": False,
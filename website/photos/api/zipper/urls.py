@@ -0,0 +1,10 @@
+from django.urls import path
+
+from .views import album_zip, shared_album_zip
+
+app_name = "photos"
+
+urlpatterns = [
+    path("albums/<slug>/", album_zip, name="album"),
+    path("albums/<slug>/<token>/", shared_album_zip, name="shared-album"),
+]
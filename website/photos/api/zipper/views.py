@@ -0,0 +1,94 @@
+import threading
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+
+from photos.models import Album
+from photos.services import (
+    check_shared_album_token,
+    is_album_accessible,
+    stream_album_zip,
+)
+
+_download_slots = {}
+_download_slots_lock = threading.Lock()
+
+
+def _get_download_slots():
+    """Return the semaphore that limits the number of concurrent album downloads.
+
+    It is created on first use, with the limit from the settings at that time, so
+    changes to `PHOTO_ALBUM_DOWNLOADS` after import, e.g. in tests, take effect.
+    """
+    limit = settings.PHOTO_ALBUM_DOWNLOADS
+    with _download_slots_lock:
+        if limit not in _download_slots:
+            _download_slots[limit] = threading.BoundedSemaphore(limit)
+        return _download_slots[limit]
+
+
+class _ReleasingIterator:
+    """Iterate over `iterable`, and call `release` when the response is closed.
+
+    A generator that has not started yet does not run its `finally` block when it
+    is closed, so this makes sure that `release` is called even if the response
+    is closed before anything is sent.
+    """
+
+    def __init__(self, iterable, release):
+        self._iterator = iter(iterable)
+        self._release = release
+        self._released = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._iterator)
+
+    def close(self):
+        if hasattr(self._iterator, "close"):
+            self._iterator.close()
+        if not self._released:
+            self._released = True
+            self._release()
+
+
+def _album_zip_response(album):
+    download_slots = _get_download_slots()
+    if not download_slots.acquire(blocking=False):
+        return HttpResponse(
+            "Too many albums are being downloaded right now, please try again later.",
+            status=503,
+            headers={"Retry-After": "60"},
+        )
+
+    return StreamingHttpResponse(
+        _ReleasingIterator(stream_album_zip(album), download_slots.release),
+        content_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{album.slug}.zip"'},
+    )
+
+
+def _get_album(slug):
+    return get_object_or_404(
+        Album.objects.filter(hidden=False, is_processing=False), slug=slug
+    )
+
+
+@login_required
+def album_zip(request, slug):
+    """Download all photos of an album, if it is accessible by the user."""
+    album = _get_album(slug)
+    if not is_album_accessible(request, album):
+        raise Http404("Sorry, you're not allowed to view this album")
+    return _album_zip_response(album)
+
+
+def shared_album_zip(request, slug, token):
+    """Download all photos of a shared album if the album token is provided."""
+    album = _get_album(slug)
+    check_shared_album_token(album, token)
+    return _album_zip_response(album)
@@ -0,0 +1,91 @@
+import io
+import tempfile
+import zipfile
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from django.utils import timezone
+
+from PIL import Image
+
+from photos.models import Album
+from photos.services import extract_archive
+
+
+class Command(BaseCommand):
+    """Measure how fast a synthetic album archive is processed.
+
+    The album is created in a transaction that is rolled back afterwards, and
+    the stored photos are deleted, so this can safely be run against a real
+    database and storage.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--photos",
+            type=int,
+            default=50,
+            help="Number of photos in the archive",
+        )
+        parser.add_argument(
+            "--width", type=int, default=4000, help="Width of the photos"
+        )
+        parser.add_argument(
+            "--height", type=int, default=3000, help="Height of the photos"
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            nargs="+",
+            default=[1, 4],
+            help="Numbers of worker threads to compare",
+        )
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryFile() as archive:
+            self._create_archive(
+                archive, options["photos"], options["width"], options["height"]
+            )
+
+            for workers in options["workers"]:
+                with override_settings(PHOTO_UPLOAD_WORKERS=workers):
+                    self._time(archive, workers)
+
+    def _create_archive(self, archive, num_photos, width, height):
+        with zipfile.ZipFile(archive, "w") as zip_file:
+            for i in range(num_photos):
+                image = Image.merge(
+                    "RGB",
+                    [
+                        Image.effect_noise((width, height), 20 + 10 * c)
+                        for c in range(3)
+                    ],
+                )
+                photo = io.BytesIO()
+                image.save(photo, format="JPEG", quality=90)
+                zip_file.writestr(f"photo-{i:04}.jpg", photo.getvalue())
+
+    def _time(self, archive, workers):
+        with transaction.atomic():
+            album = Album.objects.create(
+                title="Album upload benchmark",
+                slug=f"album-upload-benchmark-{timezone.now():%Y%m%d%H%M%S%f}",
+                date=timezone.now().date(),
+                is_processing=True,
+            )
+
+            start = perf_counter()
+            warnings, count = extract_archive(album, archive)
+            duration = perf_counter() - start
+
+            self.stdout.write(
+                f"{workers} workers: {count} photos in {duration:.1f}s, "
+                f"{count / duration:.2f} photos/s, {len(warnings)} warnings"
+            )
+
+            # Delete the stored files and thumbnails.
+            for photo in album.photo_set.all():
+                photo.delete()
+            transaction.set_rollback(True)
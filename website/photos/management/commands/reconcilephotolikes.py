@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from photos.services import refresh_most_liked_photos, update_like_counts
+
+
+class Command(BaseCommand):
+    """Recount the likes of all photos, and refresh the most liked photos."""
+
+    def handle(self, *args, **options):
+        count = update_like_counts()
+        self.stdout.write(f"Repaired the number of likes of {count} photos.")
+
+        refresh_most_liked_photos()
+        self.stdout.write("Refreshed the most liked photos.")
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('photos', '0027_album_is_processing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='album',
+            name='processing_done',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='The number of photos in the last uploaded archive that have been processed', verbose_name='photos processed'),
+        ),
+        migrations.AddField(
+            model_name='album',
+            name='processing_total',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='The number of photos in the last uploaded archive', verbose_name='photos to process'),
+        ),
+    ]
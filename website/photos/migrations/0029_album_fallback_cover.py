@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:57
+
+import random
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def set_fallback_covers(apps, schema_editor):
+    """Choose the same photo that was shown as random cover until now."""
+    Album = apps.get_model("photos", "Album")
+    Photo = apps.get_model("photos", "Photo")
+    for album in Album.objects.all():
+        photos = list(
+            Photo.objects.filter(album=album).order_by("pk").values_list("pk", flat=True)
+        )
+        if photos:
+            album.fallback_cover_id = random.Random(album.dirname).choice(photos)
+            album.save(update_fields=["fallback_cover"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('photos', '0028_album_processing_progress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='album',
+            name='fallback_cover',
+            field=models.ForeignKey(blank=True, editable=False, help_text='The cover image that is shown if no cover image is set', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='photos.photo', verbose_name='fallback cover image'),
+        ),
+        migrations.RunPython(set_fallback_covers, migrations.RunPython.noop),
+    ]
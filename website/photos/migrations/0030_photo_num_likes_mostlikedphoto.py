@@ -0,0 +1,51 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_likes(apps, schema_editor):
+    Like = apps.get_model("photos", "Like")
+    Photo = apps.get_model("photos", "Photo")
+    Photo.objects.update(
+        num_likes=Coalesce(
+            Subquery(
+                Like.objects.filter(photo=OuterRef("pk"))
+                .values("photo")
+                .annotate(count=Count("pk"))
+                .values("count")
+            ),
+            0,
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('photos', '0029_album_fallback_cover'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='num_likes',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='number of likes'),
+        ),
+        migrations.CreateModel(
+            name='MostLikedPhoto',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lecture_year', models.PositiveSmallIntegerField(help_text='The lecture year of the album, or empty for the all-time ranking', null=True, verbose_name='lecture year')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='rank')),
+                ('photo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rankings', to='photos.photo')),
+            ],
+            options={
+                'ordering': ('lecture_year', 'rank'),
+                'indexes': [models.Index(fields=['lecture_year', 'rank'], name='photos_most_lecture_829883_idx')],
+            },
+        ),
+        migrations.RunPython(count_likes, migrations.RunPython.noop),
+    ]
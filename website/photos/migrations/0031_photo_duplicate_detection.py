@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('photos', '0030_photo_num_likes_mostlikedphoto'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='_perceptual_hash',
+            field=models.CharField(blank=True, editable=False, max_length=16, verbose_name='perceptual hash'),
+        ),
+        migrations.AlterField(
+            model_name='photo',
+            name='_digest',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=40, verbose_name='digest'),
+        ),
+    ]
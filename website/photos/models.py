@@ -1,23 +1,20 @@
 import hashlib
 import logging
 import os
-import random
 from secrets import token_hex
 
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.db import models
-from django.db.models import Count, IntegerField, Value
-from django.db.models.functions import Coalesce
 from django.urls import reverse
 from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 
 from queryable_properties.managers import QueryablePropertiesManager
-from queryable_properties.properties import AnnotationProperty
 from thumbnails.fields import ImageField
 
 from members.models import Member
+from photos.processing import perceptual_hash
 
 COVER_FILENAME = "cover.jpg"
 
@@ -56,10 +53,20 @@ class Photo(models.Model):
         max_length=40,
         blank=True,
         editable=False,
+        db_index=True,
     )
 
-    num_likes = AnnotationProperty(
-        Coalesce(Count("likes"), Value(0), output_field=IntegerField())
+    _perceptual_hash = models.CharField(
+        "perceptual hash",
+        max_length=16,
+        blank=True,
+        editable=False,
+    )
+
+    num_likes = models.PositiveIntegerField(
+        "number of likes",
+        default=0,
+        editable=False,
     )
 
     def __init__(self, *args, **kwargs):
@@ -82,6 +89,14 @@ class Photo(models.Model):
             digest = hash_sha1.hexdigest()
             self._digest = digest
 
+            try:
+                self.file.seek(0)
+                self._perceptual_hash = perceptual_hash(self.file)
+            except OSError:
+                # The file is not a valid image, which the field reports itself.
+                pass
+            self.file.seek(0)
+
             if (
                 Photo.objects.filter(album=self.album, _digest=digest)
                 .exclude(pk=self.pk)
@@ -115,6 +130,32 @@ class Like(models.Model):
         unique_together = ["photo", "member"]
 
 
+class MostLikedPhoto(models.Model):
+    """A photo in the ranking of most liked photos.
+
+    The ranking is refreshed periodically by
+    `photos.services.refresh_most_liked_photos`, for all time and for
+    each lecture year.
+    """
+
+    photo = models.ForeignKey(Photo, related_name="rankings", on_delete=models.CASCADE)
+
+    lecture_year = models.PositiveSmallIntegerField(
+        "lecture year",
+        null=True,
+        help_text="The lecture year of the album, or empty for the all-time ranking",
+    )
+
+    rank = models.PositiveSmallIntegerField("rank")
+
+    def __str__(self):
+        return f"{self.rank}. {self.photo}"
+
+    class Meta:
+        ordering = ("lecture_year", "rank")
+        indexes = [models.Index(fields=["lecture_year", "rank"])]
+
+
 class Album(models.Model):
     """Model for Album objects."""
 
@@ -150,6 +191,20 @@ class Album(models.Model):
         editable=False,
     )
 
+    processing_total = models.PositiveIntegerField(
+        verbose_name="photos to process",
+        help_text="The number of photos in the last uploaded archive",
+        default=0,
+        editable=False,
+    )
+
+    processing_done = models.PositiveIntegerField(
+        verbose_name="photos processed",
+        help_text="The number of photos in the last uploaded archive that have been processed",
+        default=0,
+        editable=False,
+    )
+
     event = models.ForeignKey(
         "events.Event",
         on_delete=models.SET_NULL,
@@ -166,6 +221,17 @@ class Album(models.Model):
         verbose_name=_("cover image"),
     )
 
+    fallback_cover = models.ForeignKey(
+        Photo,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        editable=False,
+        related_name="+",
+        verbose_name="fallback cover image",
+        help_text="The cover image that is shown if no cover image is set",
+    )
+
     shareable = models.BooleanField(verbose_name=_("shareable"), default=False)
 
     photosdir = "photos"
@@ -175,17 +241,13 @@ class Album(models.Model):
     def cover(self):
         """Return cover of Album.
 
-        If a cover is not set, return a random photo or None if there are no photos.
+        If a cover is not set, return the fallback cover, which is a random photo
+        chosen by `photos.services.update_fallback_cover`, or None if there are
+        no photos.
         """
         if self._cover is not None:
             return self._cover
-
-        # Not prefetched because this should be rare and is a lot of data
-        r = random.Random(self.dirname)
-        try:
-            return r.choice(self.photo_set.all())
-        except IndexError:
-            return None
+        return self.fallback_cover
 
     def __str__(self):
         """Get string representation of Album."""
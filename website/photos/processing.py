@@ -0,0 +1,69 @@
+"""Image processing for album uploads, which runs in a pool of threads."""
+
+import copy
+import io
+
+from da_vinci import images
+from PIL import Image, ImageOps
+from thumbnails import conf
+
+
+def _apply_size(image, size):
+    """Run an image through the processors of a size from `settings.THUMBNAILS`."""
+    size_dict = conf.SIZES[size]
+    if "FORMAT" in size_dict:
+        image.format = size_dict["FORMAT"]
+
+    for processor in size_dict["PROCESSORS"]:
+        image = processor["processor"](image, **processor["kwargs"])
+    return image
+
+
+def _encode(image) -> bytes:
+    image_io = io.BytesIO()
+    image.save(file=image_io)
+    return image_io.getvalue()
+
+
+def process_photo(path: str, source_size: str, sizes: list[str]) -> dict[str, bytes]:
+    """Process an uploaded photo into the source image and its thumbnails.
+
+    This does the same as django-thumbnails does when saving an `ImageField`,
+    but decodes the photo only once: the thumbnails are made from the resized
+    source image directly, instead of from the stored file.
+
+    Returns the encoded images by size.
+    """
+    source = _apply_size(images.from_file(path), source_size)
+    encoded = {source_size: _encode(source)}
+
+    for size in sizes:
+        if size not in encoded:
+            # The processors replace the PIL image of the wrapper, so a shallow
+            # copy keeps the source image intact.
+            encoded[size] = _encode(_apply_size(copy.copy(source), size))
+
+    return encoded
+
+
+def perceptual_hash(file) -> str:
+    """Compute the difference hash of a photo, as 16 hexadecimal digits.
+
+    Every bit tells whether a pixel is brighter than its right neighbour, in a
+    9x8 grayscale version of the photo. Unlike a digest, the hash hardly changes
+    when a photo is re-encoded or resized, so near-duplicates have hashes that
+    differ in only a few bits. JPEG photos are decoded at a reduced scale, so
+    this is cheap compared to processing a photo.
+
+    :param file: The path or file object of the photo.
+    """
+    with Image.open(file) as image:
+        image.draft("L", (64, 64))
+        image = ImageOps.exif_transpose(image).convert("L").resize((9, 8))
+        pixels = image.load()
+
+    value = 0
+    for y in range(8):
+        for x in range(8):
+            value = (value << 1) | (pixels[x, y] > pixels[x + 1, y])
+    return f"{value:016x}"
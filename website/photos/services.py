@@ -1,18 +1,39 @@
+import hashlib
 import logging
 import os
+import random
 import tarfile
-from zipfile import ZipFile, is_zipfile
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from zipfile import ZIP_STORED, ZipFile, ZipInfo, is_zipfile
 
-from django.core.files import File
+from django.conf import settings
+from django.core.files.base import ContentFile
 from django.db import transaction
-from django.db.models import BooleanField, Case, ExpressionWrapper, Q, Value, When
-from django.forms import ValidationError
+from django.db.models import (
+    BooleanField,
+    Case,
+    Count,
+    ExpressionWrapper,
+    F,
+    OuterRef,
+    Q,
+    Subquery,
+    Value,
+    When,
+    Window,
+)
+from django.db.models.functions import Coalesce, ExtractYear, RowNumber
 from django.http import Http404
 from django.utils.translation import gettext_lazy as _
 
-from PIL import UnidentifiedImageError
+from thumbnails import conf
+from thumbnails.images import save as save_thumbnail
 
-from photos.models import Photo
+from photos.models import Album, Like, MostLikedPhoto, Photo
+from photos.processing import perceptual_hash, process_photo
 
 logger = logging.getLogger(__name__)
 
@@ -36,6 +57,20 @@ def is_album_accessible(request, album):
     return False
 
 
+def update_fallback_cover(album):
+    """Choose the photo that is shown when the album has no cover set.
+
+    The choice is seeded with the directory name of the album, so it only
+    changes when the photos in the album change.
+    """
+    photos = list(album.photo_set.order_by("pk").values_list("pk", flat=True))
+    if photos:
+        album.fallback_cover_id = random.Random(album.dirname).choice(photos)
+    else:
+        album.fallback_cover_id = None
+    Album.objects.filter(pk=album.pk).update(fallback_cover=album.fallback_cover_id)
+
+
 def get_annotated_accessible_albums(request, albums):
     """Annotate the albums which are accessible by the user."""
     if request.member and request.member.has_active_membership():
@@ -64,75 +99,414 @@ def get_annotated_accessible_albums(request, albums):
     return albums
 
 
+def like_photo(photo, member) -> bool:
+    """Like a photo, return whether it was not liked by the member already."""
+    with transaction.atomic():
+        __, created = Like.objects.get_or_create(photo=photo, member=member)
+        if created:
+            Photo.objects.filter(pk=photo.pk).update(num_likes=F("num_likes") + 1)
+    photo.refresh_from_db(fields=["num_likes"])
+    return created
+
+
+def unlike_photo(photo, member) -> bool:
+    """Remove the like of a member from a photo, return whether there was one."""
+    with transaction.atomic():
+        deleted, __ = Like.objects.filter(photo=photo, member=member).delete()
+        if deleted:
+            Photo.objects.filter(pk=photo.pk).update(num_likes=F("num_likes") - 1)
+    photo.refresh_from_db(fields=["num_likes"])
+    return bool(deleted)
+
+
+def update_like_counts(photos=None) -> int:
+    """Recount the likes of photos that have drifted, return how many there were.
+
+    :param photos: the photos to recount, all photos if None.
+    """
+    if photos is None:
+        photos = Photo.objects.all()
+    num_likes = Coalesce(
+        Subquery(
+            Like.objects.filter(photo=OuterRef("pk"))
+            .values("photo")
+            .annotate(count=Count("pk"))
+            .values("count")
+        ),
+        0,
+    )
+    return photos.exclude(num_likes=num_likes).update(num_likes=num_likes)
+
+
+# The number of photos in each ranking of most liked photos.
+MOST_LIKED_PHOTOS = 12
+
+
+def _album_lecture_year():
+    """Return an expression for the lecture year of the album of a photo.
+
+    Like the tabs of the album index, this counts August as the first month
+    of a lecture year, as the introduction week is in August.
+    """
+    return ExtractYear("album__date") - Case(
+        When(album__date__month__lt=8, then=Value(1)), default=Value(0)
+    )
+
+
+def refresh_most_liked_photos():
+    """Rank the most liked photos of all time and of each lecture year."""
+    photos = Photo.objects.filter(
+        album__hidden=False, album__is_processing=False, num_likes__gt=0
+    )
+    order_by = [F("num_likes").desc(), F("pk").asc()]
+
+    rankings = [
+        MostLikedPhoto(photo_id=pk, lecture_year=None, rank=rank)
+        for rank, pk in enumerate(
+            photos.order_by(*order_by).values_list("pk", flat=True)[:MOST_LIKED_PHOTOS],
+            start=1,
+        )
+    ]
+    rankings += [
+        MostLikedPhoto(photo_id=pk, lecture_year=lecture_year, rank=rank)
+        for pk, lecture_year, rank in photos.annotate(
+            lecture_year=_album_lecture_year(),
+            rank=Window(RowNumber(), partition_by=F("lecture_year"), order_by=order_by),
+        )
+        .filter(rank__lte=MOST_LIKED_PHOTOS)
+        .values_list("pk", "lecture_year", "rank")
+    ]
+
+    with transaction.atomic():
+        MostLikedPhoto.objects.all().delete()
+        MostLikedPhoto.objects.bulk_create(rankings)
+
+
+class _ZipStream:
+    """A write-only file that collects what is written until it is taken out.
+
+    Because it cannot seek or tell, ZipFile writes the sizes and checksums of
+    entries in data descriptors after their contents, so that every entry can be
+    streamed in one pass.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def write(self, data):
+        self._buffer += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+# The size of the chunks in which photos are read from storage and streamed.
+ZIP_CHUNK_SIZE = 64 * 1024
+
+
+def stream_album_zip(album):
+    """Generate a zip file of all photos in an album, in chunks.
+
+    The photos are read from storage and written to the zip file in chunks, so
+    the archive is never kept in memory or on disk as a whole. The entries are
+    stored without compression, as the photos are compressed JPEGs already.
+    """
+    storage = Photo._meta.get_field("file").storage
+    names = list(album.photo_set.order_by("pk").values_list("file", flat=True))
+    date_time = (album.date.year, album.date.month, album.date.day, 0, 0, 0)
+
+    stream = _ZipStream()
+    with ZipFile(stream, "w", compression=ZIP_STORED) as zip_file:
+        for name in names:
+            entry = ZipInfo(f"{album.slug}/{os.path.basename(name)}", date_time)
+            with storage.open(name, "rb") as photo, zip_file.open(entry, "w") as f:
+                for chunk in iter(lambda: photo.read(ZIP_CHUNK_SIZE), b""):
+                    f.write(chunk)
+                    yield stream.take()
+    # Closing the zip file writes the central directory.
+    yield stream.take()
+
+
+# The number of photos that are inserted into the database at once.
+UPLOAD_BATCH_SIZE = 50
+
+
 def extract_archive(album, archive) -> tuple[dict[str, str], int]:
-    """Extract zip and tar files."""
+    """Extract zip and tar files, and add the photos in them to the album.
+
+    The photos go through a pipeline: they are streamed out of the archive one
+    by one to temporary files, processed into their source image and thumbnails
+    by a pool of threads, and stored and inserted into the database in batches.
+    The progress is saved on the album after every batch. Photos that exist
+    already, in any album, are skipped before they are processed.
+
+    The batches are committed as they go, so the progress can be followed. If
+    processing fails, the photos that were added so far are removed again, so
+    no partial upload is left in the album.
+
+    Returns the warnings by filename, and the number of photos that were added.
+    """
+    stored = []
+    try:
+        return _extract_archive(album, archive, stored)
+    except BaseException:
+        _remove_photos(album, stored)
+        raise
+
+
+def _extract_archive(album, archive, stored):
+    """Extract an archive into an album, adding every stored photo to `stored`."""
     warnings, count = {}, 0
-    pos = 1
+    field = Photo._meta.get_field("file")
+    duplicates = _DuplicateIndex(settings.PHOTO_UPLOAD_SIMILARITY_THRESHOLD)
+
+    with (
+        _open_archive(archive) as (filenames, open_file),
+        tempfile.TemporaryDirectory() as directory,
+        _photo_executor() as executor,
+    ):
+        photo_filenames = []
+        for filename in filenames:
+            if _has_photo_extension(filename):
+                photo_filenames.append(filename)
+            else:
+                warnings[filename] = "has an unknown extension."
+
+        album.processing_total = len(photo_filenames)
+        album.processing_done = 0
+        Album.objects.filter(pk=album.pk).update(
+            processing_total=album.processing_total, processing_done=0
+        )
+
+        pending = deque()
+        batch = []
+        done = 0
+
+        def collect():
+            nonlocal count, done
+            pos, filename, digest, phash, path, future = pending.popleft()
+            try:
+                encoded = future.result()
+            except OSError as e:  # Including UnidentifiedImageError.
+                logger.warning(f"Photo '{filename}' could not be read: {e}", exc_info=e)
+                warnings[filename] = "could not be read."
+            else:
+                photo = _store_photo(
+                    album, field, pos, filename, digest, phash, encoded
+                )
+                stored.append(photo)
+                batch.append(photo)
+                count += 1
+            finally:
+                os.remove(path)
+
+            done += 1
+            if len(batch) >= UPLOAD_BATCH_SIZE:
+                _save_batch(album, batch, done)
+
+        for pos, filename in enumerate(photo_filenames, start=1):
+            path = os.path.join(directory, str(pos))
+            with open_file(filename) as file, open(path, "wb") as temporary_file:
+                digest = _copy_with_digest(file, temporary_file)
+
+            try:
+                phash = perceptual_hash(path)
+            except OSError:
+                # Reported when the photo is processed.
+                phash = ""
+
+            # Skip duplicates before they are processed.
+            warning = duplicates.find(album, digest, phash)
+            if warning:
+                os.remove(path)
+                warnings[filename] = warning
+                done += 1
+                continue
+            duplicates.add(album, digest, phash)
+
+            future = executor.submit(
+                process_photo, path, field.resize_source_to, field.pregenerated_sizes
+            )
+            pending.append((pos, filename, digest, phash, path, future))
+
+            # Limit the number of photos that wait in temporary files.
+            if len(pending) > 2 * settings.PHOTO_UPLOAD_WORKERS:
+                collect()
+
+        while pending:
+            collect()
+        _save_batch(album, batch, done)
+
+    return warnings, count
+
+
+@contextmanager
+def _open_archive(archive):
+    """Open a zip or tar file.
+
+    Yields the sorted names of the files in the archive, and a function
+    that opens one of those files.
+    """
     if is_zipfile(archive):
         archive.seek(0)
         with ZipFile(archive) as zip_file:
-            for photo in sorted(zip_file.namelist()):
-                if zip_file.getinfo(photo).is_dir():
-                    continue
-                if not _has_photo_extension(photo):
-                    warnings[photo] = "has an unknown extension."
-                    continue
-
-                with zip_file.open(photo) as file:
-                    if warning := _try_save_photo(album, file, photo, pos):
-                        warnings[photo] = warning
-                    else:
-                        count += 1
-                pos += 1
-        return warnings, count
+            yield (
+                sorted(
+                    info.filename for info in zip_file.infolist() if not info.is_dir()
+                ),
+                zip_file.open,
+            )
+        return
 
     archive.seek(0)
     # is_tarfile only supports filenames, so we cannot use that
     try:
-        with tarfile.open(fileobj=archive) as tar_file:
-            for photo in sorted(tar_file.getnames()):
-                if not tar_file.getmember(photo).isfile():
-                    continue
-
-                if not _has_photo_extension(photo):
-                    warnings[photo] = "has an unknown extension."
-                    continue
-
-                with tar_file.extractfile(photo) as file:
-                    if warning := _try_save_photo(album, file, photo):
-                        warnings[photo] = warning
-                    else:
-                        count += 1
+        tar_file = tarfile.open(fileobj=archive)
     except tarfile.ReadError as e:
         raise ValueError(_("The uploaded file is not a zip or tar file.")) from e
 
-    return warnings, count
+    with tar_file:
+        yield (
+            sorted(member.name for member in tar_file.getmembers() if member.isfile()),
+            tar_file.extractfile,
+        )
 
 
-def _has_photo_extension(filename):
-    """Check if the filename has a photo extension."""
-    __, extension = os.path.splitext(filename)
-    return extension.lower() in (".jpg", ".jpeg", ".png", ".webp")
+def _photo_executor():
+    """Return an executor to process photos with, as configured in the settings.
+
+    This uses threads, because uploads are processed in Celery workers, which
+    are daemonic processes that cannot start processes of their own. Pillow
+    releases the GIL while it decodes, resizes and encodes images, so the
+    threads still process photos in parallel.
+    """
+    return ThreadPoolExecutor(max_workers=max(settings.PHOTO_UPLOAD_WORKERS, 1))
 
 
-def _try_save_photo(album, file, filename, pos) -> str | None:
-    """Try to save a photo to an album.
+class _DuplicateIndex:
+    """The digests of all photos, to find duplicates of uploaded photos.
 
-    Returns None, or a string describing a reason for failure.
+    Exact duplicates are found by their digest. If a similarity threshold is
+    given, near-duplicates are found by their perceptual hashes, which differ
+    in at most `threshold` bits. Those hashes are split into `threshold + 1`
+    blocks, of which near-duplicates have at least one in common, so only
+    photos that share a block need to be compared.
     """
-    filename = f"{pos}-{filename}"
-    instance = Photo(album=album)
-    instance.file = File(file, filename)
-    try:
-        with transaction.atomic():
-            instance.full_clean()
-            instance.save()
-    except ValidationError as e:
-        logger.warning(f"Photo '{filename}' could not be read: {e}", exc_info=e)
-        return "could not be read."
-    except UnidentifiedImageError as e:
-        logger.warning(f"Photo '{filename}' could not be read: {e}", exc_info=e)
-        return "could not be read."
-    except OSError as e:
-        logger.warning(f"Photo '{filename}' could not be read: {e}", exc_info=e)
-        return "could not be read."
+
+    def __init__(self, threshold=None):
+        self.threshold = threshold
+        self.digests = dict(
+            Photo.objects.exclude(_digest="").values_list("_digest", "album_id")
+        )
+        self.blocks = {}
+        self.albums = {}
+
+        if threshold is not None:
+            for phash, album_id in Photo.objects.exclude(
+                _perceptual_hash=""
+            ).values_list("_perceptual_hash", "album_id"):
+                self._add_hash(int(phash, 16), album_id)
+
+    def _split(self, value):
+        count = min(self.threshold + 1, 64)
+        for i in range(count):
+            start, end = 64 * i // count, 64 * (i + 1) // count
+            yield i, (value >> start) & ((1 << (end - start)) - 1)
+
+    def _add_hash(self, value, album_id):
+        for block in self._split(value):
+            self.blocks.setdefault(block, []).append((value, album_id))
+
+    def _similar_album_id(self, value):
+        for block in self._split(value):
+            for other, album_id in self.blocks.get(block, ()):
+                if (value ^ other).bit_count() <= self.threshold:
+                    return album_id
+        return None
+
+    def _album_name(self, album, album_id):
+        if album_id == album.pk:
+            return "this album"
+        if album_id not in self.albums:
+            self.albums[album_id] = Album.objects.filter(pk=album_id).first()
+        return f"album '{self.albums[album_id]}'"
+
+    def find(self, album, digest, phash) -> str | None:
+        """Return a warning if a photo is a duplicate, else None."""
+        album_id = self.digests.get(digest)
+        if album_id is not None:
+            return f"already exists in {self._album_name(album, album_id)}."
+
+        if self.threshold is not None and phash:
+            album_id = self._similar_album_id(int(phash, 16))
+            if album_id is not None:
+                return f"is similar to a photo in {self._album_name(album, album_id)}."
+        return None
+
+    def add(self, album, digest, phash):
+        """Add an uploaded photo, to find duplicates of it in the same upload."""
+        self.digests[digest] = album.pk
+        if self.threshold is not None and phash:
+            self._add_hash(int(phash, 16), album.pk)
+
+
+def _copy_with_digest(source, target) -> str:
+    """Copy a file in chunks, and return the SHA-1 digest of its contents."""
+    hash_sha1 = hashlib.sha1()
+    for chunk in iter(lambda: source.read(1024 * 1024), b""):
+        hash_sha1.update(chunk)
+        target.write(chunk)
+    return hash_sha1.hexdigest()
+
+
+def _store_photo(album, field, pos, filename, digest, phash, encoded) -> Photo:
+    """Store the processed images of a photo, and return the (unsaved) photo."""
+    photo = Photo(album=album, _digest=digest, _perceptual_hash=phash)
+    # The upload path contains the position of the photo, taken from its name.
+    photo.file.name = f"{pos}-{os.path.basename(filename)}"
+    source_format = conf.SIZES[field.resize_source_to]["FORMAT"]
+    name = field.generate_filename(photo, f"photo.{source_format}")
+
+    photo.file.name = field.storage.save(
+        name, ContentFile(encoded[field.resize_source_to])
+    )
+    field.metadata_backend.add_source(photo.file.name)
+    for size in field.pregenerated_sizes:
+        save_thumbnail(
+            photo.file.name,
+            size,
+            field.metadata_backend,
+            field.storage,
+            ContentFile(encoded[size]),
+        )
+    return photo
+
+
+def _save_batch(album, batch, done):
+    """Insert a batch of photos and update the progress of the album."""
+    Photo.objects.bulk_create(batch)
+    batch.clear()
+    album.processing_done = done
+    Album.objects.filter(pk=album.pk).update(processing_done=done)
+
+
+def _remove_photos(album, photos):
+    """Remove the photos of a failed upload, with their files."""
+    for photo in photos:
+        name = photo.file.name
+        photo.file.delete(save=False)
+        photo.file.metadata_backend.delete_source(name)
+    Photo.objects.filter(pk__in=[photo.pk for photo in photos if photo.pk]).delete()
+    Album.objects.filter(pk=album.pk).update(processing_done=0)
+
+
+def _has_photo_extension(filename):
+    """Check if the filename has a photo extension."""
+    __, extension = os.path.splitext(filename)
+    return extension.lower() in (".jpg", ".jpeg", ".png", ".webp")
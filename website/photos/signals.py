@@ -1,7 +1,10 @@
-from django.db.models.signals import pre_delete
+from django.db.models.signals import post_delete, post_save, pre_delete
 
 from utils.models.signals import suspendingreceiver
 
+from .models import Album
+from .services import update_fallback_cover
+
 
 @suspendingreceiver(
     pre_delete, sender="photos.Photo", dispatch_uid="photos_photo_delete"
@@ -13,3 +16,22 @@ def pre_photo_delete(sender, instance, **kwargs):
 
     # Clean up the source metadata, django-thumbnails does not do this.
     instance.file.metadata_backend.delete_source(name)
+
+
+@suspendingreceiver(
+    (post_save, post_delete),
+    sender="photos.Photo",
+    dispatch_uid="photos_photo_fallback_cover",
+)
+def update_album_fallback_cover(sender, instance, **kwargs):
+    """Choose a new fallback cover if the album has lost (or never had) one.
+
+    Deleting the fallback cover itself sets it to null, so this only does work
+    for the first photo added to an album and when the fallback cover is deleted.
+    """
+    if kwargs.get("created", True):
+        album = Album.objects.filter(
+            pk=instance.album_id, fallback_cover__isnull=True
+        ).first()
+        if album is not None:
+            update_fallback_cover(album)
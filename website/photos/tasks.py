@@ -1,7 +1,6 @@
 import logging
 import os
 
-from django.db import transaction
 from django.dispatch import Signal
 from django.utils import timezone
 
@@ -14,7 +13,12 @@ from members.models.member import Member
 from photos.models import Album
 from utils.snippets import send_email
 
-from .services import extract_archive
+from .services import (
+    extract_archive,
+    refresh_most_liked_photos,
+    update_fallback_cover,
+    update_like_counts,
+)
 
 logger = logging.getLogger(__name__)
 album_uploaded = Signal()
@@ -40,12 +44,12 @@ def process_album_upload(
     )
 
     try:
-        with transaction.atomic():
-            # We make the upload atomic separately, so we can keep using the db if it fails.
-            # See https://docs.djangoproject.com/en/4.2/topics/db/transactions/#handling-exceptions-within-postgresql-transactions.
-            warnings, count = extract_archive(album, upload.file)
-            album.is_processing = False
-            album.save()
+        # The photos are saved in batches, to show the progress on the album. If
+        # processing fails, they are removed again and the album stays hidden.
+        warnings, count = extract_archive(album, upload.file)
+        update_fallback_cover(album)
+        album.is_processing = False
+        album.save()
 
         # Send signal to notify that an album has been uploaded. This is used
         # by facedetection, and possibly in the future to notify the uploader.
@@ -94,3 +98,11 @@ def clean_broken_uploads():
         )
         filepond_storage.delete(upload_file)
         tuc.delete()
+
+
+@shared_task
+def refresh_photo_likes():
+    # Repair the like counters in case they drifted, e.g. by editing likes in the
+    # admin, before ranking the photos by them.
+    update_like_counts()
+    refresh_most_liked_photos()
@@ -3,7 +3,7 @@ from django.template.defaultfilters import date
 from django.urls import reverse
 
 from thaliawebsite.templatetags.grid_item import grid_item
-from utils.media.services import get_media_url
+from utils.media.services import get_thumbnail_url
 from django.utils.html import format_html
 
 register = template.Library()
@@ -16,7 +16,7 @@ def album_card(album):
     image_url = ""
 
     if album.cover:
-        image_url = album.cover.file.thumbnails.medium.url
+        image_url = get_thumbnail_url(album.cover.file, "medium")
 
     url = album.get_absolute_url
     if not album.accessible:
@@ -53,7 +53,7 @@ def photo_card(photo):
         f" data-likeUrl={reverse('api:v2:photos:photo-like', args=[photo.pk])}"
     )
 
-    image_url = get_media_url(photo.file.thumbnails.medium)
+    image_url = get_thumbnail_url(photo.file, "medium")
 
     return grid_item(
         title="",
@@ -0,0 +1,13 @@
+from django.conf import settings
+
+from thumbnails.models import Source, ThumbnailMeta
+
+
+def create_thumbnails(*names):
+    """Pretend that the thumbnails of the files exist, so they are not generated."""
+    for name in names:
+        source = Source.objects.create(name=name)
+        ThumbnailMeta.objects.bulk_create(
+            ThumbnailMeta(source=source, size=size, name=f"{name}_{size}.webp")
+            for size in settings.THUMBNAIL_SIZES
+        )
@@ -0,0 +1,148 @@
+from datetime import date
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from members.models import Member, Membership
+from photos.models import Album, Photo
+from photos.services import like_photo
+from photos.tests.__mocks__ import create_thumbnails
+
+
+@override_settings(SUSPEND_SIGNALS=True)
+class AlbumPhotosApiTest(TestCase):
+    fixtures = ["members.json"]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.member = Member.objects.filter(username="testuser").first()
+        Membership.objects.create(
+            type=Membership.MEMBER,
+            user=cls.member,
+            since=date(year=2015, month=1, day=1),
+        )
+        cls.album = Album.objects.create(
+            title="test_album", date=date(year=2017, month=9, day=5), slug="test"
+        )
+        cls.photos = Photo.objects.bulk_create(
+            Photo(album=cls.album, file=f"photos/test/{i}.jpg") for i in range(25)
+        )
+        like_photo(cls.photos[3], cls.member)
+        create_thumbnails(*(photo.file.name for photo in cls.photos))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_login(self.member)
+        self.url = reverse("api:v2:photos:album-photos", args=[self.album.slug])
+
+    def _get_all_pages(self, url):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.json()["results"])
+            url = response.json()["next"]
+        return pages
+
+    def test_list_photos(self):
+        pages = self._get_all_pages(self.url + "?limit=10")
+
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        photos = [photo for page in pages for photo in page]
+        self.assertEqual([p["pk"] for p in photos], [p.pk for p in self.photos])
+        self.assertEqual([p["pk"] for p in photos if p["liked"]], [self.photos[3].pk])
+        self.assertEqual(photos[3]["num_likes"], 1)
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        def count_queries(limit):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(self.url + f"?limit={limit}")
+            self.assertEqual(len(response.json()["results"]), limit)
+            return len(context.captured_queries)
+
+        self.assertEqual(count_queries(20), count_queries(2))
+
+    def test_detail_first_page(self):
+        url = reverse("api:v2:photos:album-detail", args=[self.album.slug])
+
+        response = self.client.get(url + "?paginate_photos=true&limit=10")
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["slug"], self.album.slug)
+        self.assertEqual(
+            [p["pk"] for p in data["photos"]], [p.pk for p in self.photos[:10]]
+        )
+        self.assertTrue(data["photos_next"].startswith(f"http://testserver{self.url}"))
+
+        pages = self._get_all_pages(data["photos_next"])
+        self.assertEqual(
+            [p["pk"] for page in pages for p in page],
+            [p.pk for p in self.photos[10:]],
+        )
+
+        with self.subTest("without pagination"):
+            response = self.client.get(url)
+            self.assertEqual(len(response.json()["photos"]), 25)
+            self.assertNotIn("photos_next", response.json())
+
+    def test_unaccessible(self):
+        self.member.membership_set.update(until=date(year=2016, month=1, day=1))
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+
+        response = self.client.get(
+            reverse("api:v2:photos:album-detail", args=[self.album.slug])
+            + "?paginate_photos=true"
+        )
+        self.assertEqual(response.status_code, 403)
+
+        self.album.is_processing = True
+        self.album.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(SUSPEND_SIGNALS=True)
+class PhotoLikeApiTest(TestCase):
+    fixtures = ["members.json"]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.member = Member.objects.get(pk=1)
+        album = Album.objects.create(
+            title="test_album", date=date(year=2017, month=9, day=5), slug="test"
+        )
+        cls.photo = Photo.objects.create(album=album, file="photos/test/0.jpg")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_login(self.member)
+        self.url = reverse("api:v2:photos:photo-like", args=[self.photo.pk])
+
+    def test_like_and_unlike(self):
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {"liked": True, "num_likes": 1})
+
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"liked": True, "num_likes": 1})
+
+        self.photo.refresh_from_db()
+        self.assertEqual(self.photo.num_likes, 1)
+
+        response = self.client.delete(self.url)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json(), {"liked": False, "num_likes": 0})
+
+        response = self.client.delete(self.url)
+        self.assertEqual(response.status_code, 204)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.json(), {"liked": False, "num_likes": 0})
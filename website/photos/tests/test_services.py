@@ -1,11 +1,30 @@
+import io
+import os
+import tarfile
+import zipfile
+from unittest import mock
+
+from django.conf import settings
 from django.test import RequestFactory, TestCase, override_settings
 from django.utils.timezone import datetime
 
 from freezegun import freeze_time
+from PIL import Image
 
 from members.models import Member, Membership
-from photos.models import Album
-from photos.services import get_annotated_accessible_albums, is_album_accessible
+from photos import services
+from photos.models import Album, Like, MostLikedPhoto, Photo
+from photos.services import (
+    MOST_LIKED_PHOTOS,
+    extract_archive,
+    get_annotated_accessible_albums,
+    is_album_accessible,
+    like_photo,
+    refresh_most_liked_photos,
+    unlike_photo,
+    update_fallback_cover,
+    update_like_counts,
+)
 
 
 @override_settings(SUSPEND_SIGNALS=True)
@@ -136,3 +155,319 @@ class GetAnnotatedAccessibleAlbumsTest(TestCase):
             albums = get_annotated_accessible_albums(request, albums)
             for album in albums:
                 self.assertTrue(album.accessible)
+
+
+@override_settings(SUSPEND_SIGNALS=False)
+class UpdateFallbackCoverTest(TestCase):
+    def setUp(self):
+        self.album = Album.objects.create(
+            title="test_album", date=datetime(year=2017, month=1, day=1), slug="test"
+        )
+
+    def _create_photos(self, num_photos):
+        return Photo.objects.bulk_create(
+            Photo(album=self.album, file=f"photos/test/{i}.jpg")
+            for i in range(num_photos)
+        )
+
+    def test_update_fallback_cover(self):
+        update_fallback_cover(self.album)
+        self.assertIsNone(Album.objects.get(pk=self.album.pk).cover)
+
+        photos = self._create_photos(10)
+        update_fallback_cover(self.album)
+        self.album.refresh_from_db()
+        cover = self.album.fallback_cover
+        self.assertIn(cover, photos)
+        self.assertEqual(Album.objects.get(pk=self.album.pk).cover, cover)
+
+        # The choice only depends on the album and its photos.
+        update_fallback_cover(self.album)
+        self.album.refresh_from_db()
+        self.assertEqual(self.album.fallback_cover, cover)
+
+        self.album._cover = photos[0] if cover != photos[0] else photos[1]
+        self.album.save()
+        self.assertEqual(Album.objects.get(pk=self.album.pk).cover, self.album._cover)
+
+    def test_photo_changes_update_fallback_cover(self):
+        photo = Photo.objects.create(album=self.album, file="photos/test/first.jpg")
+        self.album.refresh_from_db()
+        self.assertEqual(self.album.fallback_cover, photo)
+
+        # Other photos do not change the fallback cover.
+        photos = self._create_photos(5)
+        photos[0].delete()
+        self.album.refresh_from_db()
+        self.assertEqual(self.album.fallback_cover, photo)
+
+        photo.delete()
+        self.album.refresh_from_db()
+        self.assertIn(self.album.fallback_cover, photos[1:])
+
+
+@override_settings(SUSPEND_SIGNALS=True)
+class PhotoLikesTest(TestCase):
+    fixtures = ["members.json"]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.members = list(Member.objects.all()[:3])
+        cls.albums = [
+            Album.objects.create(
+                title=f"album{i}",
+                date=datetime(year=year, month=month, day=1),
+                slug=f"a{i}",
+            )
+            for i, (year, month) in enumerate([(2019, 9), (2020, 7), (2020, 8)])
+        ]
+        cls.photos = Photo.objects.bulk_create(
+            Photo(album=album, file=f"photos/{album.dirname}/{i}.jpg")
+            for album in cls.albums
+            for i in range(MOST_LIKED_PHOTOS + 1)
+        )
+
+    def test_like_photo(self):
+        photo = self.photos[0]
+        self.assertTrue(like_photo(photo, self.members[0]))
+        self.assertFalse(like_photo(photo, self.members[0]))
+        self.assertTrue(like_photo(photo, self.members[1]))
+        self.assertEqual(photo.num_likes, 2)
+
+        self.assertTrue(unlike_photo(photo, self.members[0]))
+        self.assertFalse(unlike_photo(photo, self.members[0]))
+        self.assertEqual(photo.num_likes, 1)
+        photo.refresh_from_db()
+        self.assertEqual(photo.num_likes, 1)
+
+    def test_update_like_counts(self):
+        like_photo(self.photos[0], self.members[0])
+        Like.objects.create(photo=self.photos[1], member=self.members[0])
+        Photo.objects.filter(pk=self.photos[2].pk).update(num_likes=5)
+
+        self.assertEqual(update_like_counts(), 2)
+        self.assertEqual(
+            list(
+                Photo.objects.filter(pk__in=[p.pk for p in self.photos[:3]])
+                .order_by("pk")
+                .values_list("num_likes", flat=True)
+            ),
+            [1, 1, 0],
+        )
+        self.assertEqual(update_like_counts(), 0)
+
+    def test_refresh_most_liked_photos(self):
+        # Give each photo a different number of likes.
+        for i, photo in enumerate(self.photos):
+            Photo.objects.filter(pk=photo.pk).update(num_likes=i % 7)
+        hidden = Album.objects.create(
+            title="hidden", date=datetime(2020, 9, 1), slug="hidden", hidden=True
+        )
+        Photo.objects.create(album=hidden, file="photos/hidden/0.jpg", num_likes=100)
+
+        refresh_most_liked_photos()
+
+        photos = Photo.objects.filter(album__hidden=False, num_likes__gt=0)
+        for lecture_year, albums in [
+            (None, self.albums),
+            (2019, self.albums[:2]),
+            (2020, self.albums[2:]),
+        ]:
+            with self.subTest(lecture_year=lecture_year):
+                self.assertEqual(
+                    [
+                        ranking.photo
+                        for ranking in MostLikedPhoto.objects.filter(
+                            lecture_year=lecture_year
+                        )
+                    ],
+                    list(
+                        photos.filter(album__in=albums).order_by("-num_likes", "pk")[
+                            :MOST_LIKED_PHOTOS
+                        ]
+                    ),
+                )
+        self.assertFalse(MostLikedPhoto.objects.filter(lecture_year=2018).exists())
+
+
+@override_settings(SUSPEND_SIGNALS=True, PHOTO_UPLOAD_WORKERS=2)
+class ExtractArchiveTest(TestCase):
+    fixtures_dir = os.path.join(settings.BASE_DIR, "photos/fixtures")
+
+    def setUp(self):
+        self.album = Album.objects.create(
+            title="test", date=datetime(year=2017, month=1, day=1), slug="test"
+        )
+
+    def tearDown(self):
+        # Remove the stored photos and their thumbnails.
+        for photo in self.album.photo_set.all():
+            photo.file.delete(save=False)
+
+    def _read_fixture(self, name):
+        with open(os.path.join(self.fixtures_dir, name), "rb") as f:
+            return f.read()
+
+    def _files(self):
+        return {
+            "b/poker_2.jpg": self._read_fixture("poker_2.jpg"),
+            "a/poker_1.jpg": self._read_fixture("poker_1.jpg"),
+            "c/thom_assessor.png": self._read_fixture("thom_assessor.png"),
+            "d/duplicate.jpg": self._read_fixture("poker_1.jpg"),
+            "e/broken.jpg": b"not a photo",
+            "notes.txt": b"not a photo either",
+        }
+
+    def _assert_extracted(self, warnings, count):
+        self.assertEqual(count, 3)
+        self.assertEqual(
+            warnings,
+            {
+                "d/duplicate.jpg": "already exists in this album.",
+                "e/broken.jpg": "could not be read.",
+                "notes.txt": "has an unknown extension.",
+            },
+        )
+
+        photos = list(self.album.photo_set.all())
+        self.assertEqual(len(photos), 3)
+        # The photos are saved in order of their filenames.
+        self.assertEqual(
+            [os.path.basename(p.file.name).split("-")[0] for p in photos],
+            ["1", "2", "3"],
+        )
+        for photo in photos:
+            self.assertTrue(photo.file.name.endswith(".jpg"))
+            self.assertTrue(photo.file.storage.exists(photo.file.name))
+            self.assertEqual(
+                set(photo.file.thumbnails.all()),
+                {"small", "medium", "photo_medium", "photo_large"},
+            )
+
+        self.album.refresh_from_db()
+        self.assertEqual(self.album.processing_total, 5)
+        self.assertEqual(self.album.processing_done, 5)
+
+    def test_extract_zip(self):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as zip_file:
+            for name, data in self._files().items():
+                zip_file.writestr(name, data)
+
+        with self.assertLogs("photos.services", "WARNING"):
+            result = extract_archive(self.album, archive)
+        self._assert_extracted(*result)
+
+    def test_extract_tar(self):
+        archive = io.BytesIO()
+        with tarfile.open(fileobj=archive, mode="w") as tar_file:
+            for name, data in self._files().items():
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                tar_file.addfile(info, io.BytesIO(data))
+
+        with self.assertLogs("photos.services", "WARNING"):
+            result = extract_archive(self.album, archive)
+        self._assert_extracted(*result)
+
+    def test_extract_invalid_archive(self):
+        with self.assertRaises(ValueError):
+            extract_archive(self.album, io.BytesIO(b"not an archive"))
+
+    @override_settings(PHOTO_UPLOAD_WORKERS=1)
+    @mock.patch("photos.services.UPLOAD_BATCH_SIZE", 1)
+    def test_remove_photos_of_failed_upload(self):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as zip_file:
+            for name, data in self._files().items():
+                zip_file.writestr(name, data)
+
+        store_photo = services._store_photo
+        stored = []
+
+        def store_two_photos(*args):
+            if len(stored) == 2:
+                raise RuntimeError("storing failed")
+            photo = store_photo(*args)
+            stored.append(photo.file.name)
+            return photo
+
+        with (
+            mock.patch("photos.services._store_photo", store_two_photos),
+            self.assertRaises(RuntimeError),
+        ):
+            extract_archive(self.album, archive)
+
+        self.assertEqual(len(stored), 2)
+        self.assertFalse(self.album.photo_set.exists())
+        storage = Photo._meta.get_field("file").storage
+        for name in stored:
+            self.assertFalse(storage.exists(name))
+        self.album.refresh_from_db()
+        self.assertEqual(self.album.processing_done, 0)
+
+    @override_settings(PHOTO_UPLOAD_WORKERS=1)
+    def test_skip_photos_already_in_album(self):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as zip_file:
+            zip_file.writestr("poker_1.jpg", self._read_fixture("poker_1.jpg"))
+
+        self.assertEqual(extract_archive(self.album, archive), ({}, 1))
+        self.assertEqual(
+            extract_archive(self.album, archive),
+            ({"poker_1.jpg": "already exists in this album."}, 0),
+        )
+
+    def _zip(self, files):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as zip_file:
+            for name, data in files.items():
+                zip_file.writestr(name, data)
+        return archive
+
+    @override_settings(PHOTO_UPLOAD_WORKERS=1)
+    def test_skip_photos_in_other_albums(self):
+        other_album = Album.objects.create(
+            title="other", date=datetime(year=2017, month=1, day=2), slug="other"
+        )
+        self.addCleanup(
+            lambda: [p.file.delete(save=False) for p in other_album.photo_set.all()]
+        )
+        archive = self._zip({"poker_1.jpg": self._read_fixture("poker_1.jpg")})
+
+        self.assertEqual(extract_archive(other_album, archive), ({}, 1))
+        self.assertEqual(
+            extract_archive(self.album, archive),
+            ({"poker_1.jpg": "already exists in album '2017-01-02 other'."}, 0),
+        )
+
+    @override_settings(PHOTO_UPLOAD_WORKERS=1)
+    def test_skip_similar_photos(self):
+        with Image.open(os.path.join(self.fixtures_dir, "poker_1.jpg")) as image:
+            reencoded = io.BytesIO()
+            image.resize((image.width // 2, image.height // 2)).save(
+                reencoded, "JPEG", quality=50
+            )
+
+        archive = self._zip(
+            {
+                "a.jpg": self._read_fixture("poker_1.jpg"),
+                "b.jpg": reencoded.getvalue(),
+                "c.png": self._read_fixture("thom_assessor.png"),
+            }
+        )
+
+        with override_settings(PHOTO_UPLOAD_SIMILARITY_THRESHOLD=4):
+            self.assertEqual(
+                extract_archive(self.album, archive),
+                ({"b.jpg": "is similar to a photo in this album."}, 2),
+            )
+
+        photos = list(self.album.photo_set.all())
+        self.assertTrue(all(len(photo._perceptual_hash) == 16 for photo in photos))
+
+        # Without a threshold, only exact duplicates are skipped.
+        for photo in photos:
+            photo.file.delete(save=False)
+        self.album.photo_set.all().delete()
+        self.assertEqual(extract_archive(self.album, archive), ({}, 3))
@@ -0,0 +1,74 @@
+import io
+import multiprocessing
+import os
+import zipfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.utils.timezone import datetime
+
+from django_drf_filepond.models import TemporaryUpload
+
+from photos.models import Album
+from photos.tasks import process_album_upload
+
+
+def _process_in_worker(connection, upload_id, album_id):
+    """Process an upload like a Celery worker, and report the resulting album."""
+    try:
+        process_album_upload(upload_id, album_id)
+        album = Album.objects.get(pk=album_id)
+        photos = list(album.photo_set.all())
+        # The parent process cannot see these photos to clean them up.
+        for photo in photos:
+            photo.file.delete(save=False)
+        connection.send((album.is_processing, len(photos)))
+    except BaseException as e:
+        connection.send(e)
+    finally:
+        connection.close()
+
+
+@override_settings(SUSPEND_SIGNALS=True, PHOTO_UPLOAD_WORKERS=2)
+class ProcessAlbumUploadTest(TestCase):
+    def setUp(self):
+        self.album = Album.objects.create(
+            title="test",
+            date=datetime(year=2017, month=1, day=1),
+            slug="test",
+            is_processing=True,
+        )
+
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as zip_file:
+            for name in ("poker_1.jpg", "poker_2.jpg"):
+                zip_file.write(
+                    os.path.join(settings.BASE_DIR, "photos/fixtures", name), name
+                )
+        self.upload = TemporaryUpload.objects.create(
+            upload_id="a" * 22,
+            file_id="b" * 22,
+            file=ContentFile(archive.getvalue(), name="album.zip"),
+            upload_name="album.zip",
+            upload_type=TemporaryUpload.FILE_DATA,
+        )
+        self.addCleanup(self.upload.file.delete, save=False)
+
+    def test_process_in_daemonic_worker(self):
+        # Celery runs tasks in daemonic worker processes, which are not allowed
+        # to start processes of their own.
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        worker = multiprocessing.get_context("fork").Process(
+            target=_process_in_worker,
+            args=(sender, self.upload.upload_id, self.album.pk),
+            daemon=True,
+        )
+        worker.start()
+        sender.close()
+        result = receiver.recv()
+        worker.join()
+
+        if isinstance(result, BaseException):
+            raise result
+        self.assertEqual(result, (False, 2))
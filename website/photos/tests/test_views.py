@@ -1,13 +1,25 @@
+import io
 import os
+import tracemalloc
+import zipfile
 from datetime import date
 
 from django.conf import settings
+from django.core.files.base import ContentFile
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from members.models import Member, Membership
 from photos.models import Album, Photo
+from photos.services import (
+    like_photo,
+    refresh_most_liked_photos,
+    update_fallback_cover,
+)
+from photos.tests.__mocks__ import create_thumbnails
 
 
 @override_settings(SUSPEND_SIGNALS=True)
@@ -130,6 +142,37 @@ class AlbumIndexTest(TestCase):
             self.assertEqual(len(response.context["albums"]), 8)
             self.assertEqual(response.context["page_range"], range(4, 9))
 
+    def test_query_count_does_not_depend_on_albums(self):
+        def create_albums(prefix, num_albums):
+            for i in range(num_albums):
+                album = Album.objects.create(
+                    title=f"{prefix}{i}",
+                    date=date(year=2018, month=9, day=5),
+                    slug=f"{prefix}{i}",
+                )
+                Photo.objects.bulk_create(
+                    Photo(album=album, file=f"photos/{album.dirname}/{j}.jpg")
+                    for j in range(20)
+                )
+                update_fallback_cover(album)
+                create_thumbnails(album.fallback_cover.file.name)
+
+        def count_queries(url):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            return len(context.captured_queries)
+
+        create_albums("a", 2)
+        index_queries = count_queries(reverse("photos:index"))
+        api_queries = count_queries(reverse("api:v2:photos:album-list"))
+
+        create_albums("b", 14)
+        self.assertEqual(count_queries(reverse("photos:index")), index_queries)
+        self.assertEqual(
+            count_queries(reverse("api:v2:photos:album-list")), api_queries
+        )
+
 
 @override_settings(SUSPEND_SIGNALS=True)
 class AlbumTest(TestCase):
@@ -364,3 +407,172 @@ class SharedDownloadTest(_DownloadBaseTestCase):
                 f"{settings.MEDIA_URL}{self.photo.file.name}",
                 response.headers["Location"],
             )
+
+
+@override_settings(SUSPEND_SIGNALS=True)
+class AlbumZipTest(TestCase):
+    fixtures = ["members.json"]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.member = Member.objects.filter(username="testuser").first()
+        Membership.objects.create(
+            type=Membership.MEMBER,
+            user=cls.member,
+            since=date(year=2015, month=1, day=1),
+        )
+
+    def setUp(self):
+        self.album = Album.objects.create(
+            title="test_album",
+            date=date(year=2017, month=9, day=5),
+            slug="test_album",
+        )
+        self.url = reverse("api:zipper:photos:album", args=(self.album.slug,))
+
+    def _create_photos(self, num_photos, size):
+        """Store photos of random data, which are removed after the test."""
+        storage = Photo._meta.get_field("file").storage
+        photos = []
+        for i in range(num_photos):
+            name = storage.save(
+                f"photos/{self.album.dirname}/{i}.jpg", ContentFile(os.urandom(size))
+            )
+            self.addCleanup(storage.delete, name)
+            photos.append(Photo(album=self.album, file=name))
+        return Photo.objects.bulk_create(photos)
+
+    def test_download(self):
+        photos = self._create_photos(3, 1000)
+        self.client.force_login(self.member)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/zip")
+        self.assertIn('filename="test_album.zip"', response["Content-Disposition"])
+        with zipfile.ZipFile(io.BytesIO(response.getvalue())) as zip_file:
+            self.assertIsNone(zip_file.testzip())
+            self.assertEqual(
+                zip_file.namelist(),
+                [f"test_album/{os.path.basename(p.file.name)}" for p in photos],
+            )
+            for photo, info in zip(photos, zip_file.infolist()):
+                self.assertEqual(info.compress_type, zipfile.ZIP_STORED)
+                with photo.file.open("rb") as f:
+                    self.assertEqual(zip_file.read(info), f.read())
+
+    def test_unaccessible(self):
+        with self.subTest("logged out"):
+            response = self.client.get(self.url)
+            self.assertEqual(response.status_code, 302)
+
+        self.client.force_login(self.member)
+        self.member.membership_set.update(until=date(year=2016, month=1, day=1))
+        with self.subTest("no membership"):
+            response = self.client.get(self.url)
+            self.assertEqual(response.status_code, 404)
+
+    def test_shared_download(self):
+        self._create_photos(1, 1000)
+
+        response = self.client.get(
+            reverse(
+                "api:zipper:photos:shared-album",
+                args=(self.album.slug, self.album.access_token),
+            )
+        )
+        self.assertEqual(response.status_code, 200)
+        response.close()
+
+        response = self.client.get(
+            reverse("api:zipper:photos:shared-album", args=(self.album.slug, "wrong"))
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_constant_memory(self):
+        self._create_photos(100, 512 * 1024)
+        self.client.force_login(self.member)
+
+        response = self.client.get(self.url)
+        tracemalloc.start()
+        try:
+            size = sum(len(chunk) for chunk in response.streaming_content)
+            __, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+            response.close()
+
+        self.assertGreater(size, 50 * 1024 * 1024)
+        # The memory used does not depend on the size of the album.
+        self.assertLess(peak, 2 * 1024 * 1024)
+
+    @override_settings(PHOTO_ALBUM_DOWNLOADS=2)
+    def test_concurrent_downloads(self):
+        self._create_photos(2, 1000)
+        self.client.force_login(self.member)
+
+        downloads = [self.client.get(self.url) for _ in range(2)]
+        for download in downloads:
+            self.assertEqual(download.status_code, 200)
+            next(iter(download.streaming_content))
+
+        rejected = self.client.get(self.url)
+        self.assertEqual(rejected.status_code, 503)
+        self.assertIn("Retry-After", rejected)
+
+        downloads[0].close()
+        download = self.client.get(self.url)
+        self.assertEqual(download.status_code, 200)
+        download.close()
+        downloads[1].close()
+
+
+@override_settings(SUSPEND_SIGNALS=True)
+class MostLikedPhotoTest(TestCase):
+    fixtures = ["members.json"]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.member = Member.objects.get(pk=1)
+        cls.albums = [
+            Album.objects.create(
+                title=f"album{year}",
+                date=date(year=year, month=9, day=1),
+                slug=str(year),
+            )
+            for year in (2017, 2018)
+        ]
+        cls.photos = Photo.objects.bulk_create(
+            Photo(album=album, file=f"photos/{album.dirname}/{i}.jpg")
+            for album in cls.albums
+            for i in range(2)
+        )
+        for photo in cls.photos[1:]:
+            like_photo(photo, cls.member)
+        create_thumbnails(*(photo.file.name for photo in cls.photos[1:]))
+        like_photo(cls.photos[3], Member.objects.get(pk=2))
+        refresh_most_liked_photos()
+
+    def setUp(self):
+        self.client.force_login(self.member)
+
+    def test_most_liked(self):
+        response = self.client.get(reverse("photos:mostliked-photos"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(response.context["photos"]),
+            [self.photos[3], self.photos[1], self.photos[2]],
+        )
+
+        response = self.client.get(
+            reverse("photos:mostliked-photos-filter", args=[2018])
+        )
+        self.assertEqual(
+            list(response.context["photos"]), [self.photos[3], self.photos[2]]
+        )
+
+        response = self.client.get(
+            reverse("photos:mostliked-photos-filter", args=[2016])
+        )
+        self.assertEqual(list(response.context["photos"]), [])
@@ -21,6 +21,11 @@ urlpatterns = [
                     views.MostLikedPhotoView.as_view(),
                     name="mostliked-photos",
                 ),
+                path(
+                    "mostliked/<int:year>/",
+                    views.MostLikedPhotoView.as_view(),
+                    name="mostliked-photos-filter",
+                ),
                 path(
                     "<slug>/",
                     include(
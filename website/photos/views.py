@@ -10,7 +10,7 @@ from django.shortcuts import get_object_or_404, redirect
 from django.views.generic import TemplateView
 
 from facedetection.models import ReferenceFace
-from photos.models import Album, Photo
+from photos.models import Album, MostLikedPhoto, Photo
 from photos.services import (
     check_shared_album_token,
     get_annotated_accessible_albums,
@@ -44,7 +44,7 @@ class IndexView(LoginRequiredMixin, PagedView):
 
     def get_queryset(self) -> QuerySet:
         albums = Album.objects.filter(hidden=False, is_processing=False).select_related(
-            "_cover"
+            "_cover", "fallback_cover"
         )
         # We split on greater than the 7th month of the year (July),
         # to make sure the introduction week photos (from August) are the first on each year page.
@@ -101,10 +101,7 @@ class _BaseAlbumView(TemplateView):
         album = self.get_album(**kwargs)
 
         context["album"] = album
-        photos = album.photo_set.select_properties("num_likes")
-
-        # Fix select_properties dropping the default ordering.
-        photos = photos.order_by("pk")
+        photos = album.photo_set.order_by("pk")
 
         # Prefetch thumbnails for efficiency
         fetch_thumbnails([p.file for p in photos])
@@ -147,9 +144,7 @@ def _photo_path(obj, filename):
     """Return the path to a Photo."""
     photoname = os.path.basename(filename)
     albumpath = os.path.join(obj.photosdir, obj.dirname)
-    photopath = os.path.join(albumpath, photoname)
-    get_object_or_404(Photo.objects.filter(album=obj, file=photopath))
-    return photopath
+    return os.path.join(albumpath, photoname)
 
 
 def _download(request, obj, filename):
@@ -192,7 +187,6 @@ class LikedPhotoView(LoginRequiredMixin, PagedView):
                 album__is_processing=False,
             )
             .select_related("album")
-            .select_properties("num_likes")
             .order_by("-album__date")
         )
         return photos
@@ -210,22 +204,37 @@ class MostLikedPhotoView(LoginRequiredMixin, PagedView):
     paginate_by = 16
     template_name = "photos/mostliked-photos.html"
     context_object_name = "photos"
+    year_range = []
+
+    def setup(self, request, *args, **kwargs):
+        super().setup(request, *args, **kwargs)
+        current_lectureyear = datetime_to_lectureyear(date.today())
+        self.year_range = list(
+            reversed(range(current_lectureyear - 5, current_lectureyear + 1))
+        )
 
     def get_queryset(self):
+        # The rankings are refreshed periodically by refresh_most_liked_photos.
+        rankings = MostLikedPhoto.objects.filter(lecture_year=self.kwargs.get("year"))
         photos = (
             Photo.objects.filter(
+                rankings__in=rankings,
                 album__hidden=False,
                 album__is_processing=False,
             )
             .select_related("album")
-            .select_properties("num_likes")
-            .filter(num_likes__gt=0)
-            .order_by("-num_likes")[:12]
+            .order_by("rankings__rank")
         )
         return photos
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        context.update(
+            {
+                "filter": self.kwargs.get("year"),
+                "year_range": self.year_range,
+            }
+        )
 
         fetch_thumbnails([p.file for p in context["photos"]])
 
@@ -7,6 +7,7 @@ from django.utils.translation import gettext_lazy as _
 import members
 from events.models import Event
 from payments.models import Payment, PaymentAmountField
+from payments.payables import PayableSnapshotMixin
 from payments.services import delete_payment
 
 
@@ -141,7 +142,7 @@ class Product(models.Model):
         permissions = (("order_restricted_products", _("Order restricted products")),)
 
 
-class FoodOrder(models.Model):
+class FoodOrder(PayableSnapshotMixin, models.Model):
     """Describes an order of an item during a food event."""
 
     member = models.ForeignKey(
@@ -125,7 +125,16 @@ class MessageAdmin(ModelAdmin):
 class ScheduledMessageAdmin(ModelAdmin):
     """Manage scheduled messages."""
 
-    list_display = ("title", "body", "time", "category", "sent", "success", "failure")
+    list_display = (
+        "title",
+        "body",
+        "time",
+        "category",
+        "sent",
+        "lag",
+        "success",
+        "failure",
+    )
     date_hierarchy = "time"
     filter_horizontal = ("users",)
     list_filter = (MessageSentFilter, "category")
@@ -143,6 +152,7 @@ class ScheduledMessageAdmin(ModelAdmin):
                 "failure",
                 "time",
                 "executed",
+                "lag",
             )
         return (
             "users",
@@ -166,9 +176,14 @@ class ScheduledMessageAdmin(ModelAdmin):
                 "failure",
                 "time",
                 "executed",
+                "lag",
             )
         return ("executed",)
 
+    @admin.display(description=_("lag"))
+    def lag(self, obj):
+        return obj.lag
+
 
 @method_decorator(staff_member_required, name="dispatch")
 @method_decorator(organiser_only, name="dispatch")
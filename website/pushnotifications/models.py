@@ -1,4 +1,6 @@
 import datetime
+import logging
+from time import perf_counter
 
 from django.conf import settings
 from django.db import models
@@ -7,6 +9,11 @@ from django.utils.translation import gettext_lazy as _
 
 from firebase_admin import exceptions, messaging
 
+logger = logging.getLogger(__name__)
+
+# FCM accepts at most 500 tokens per multicast message.
+MULTICAST_BATCH_SIZE = 500
+
 
 class Category(models.Model):
     """Describes a Message category."""
@@ -146,35 +153,64 @@ class Message(models.Model):
             data["title"] = self.title
             data["body"] = str(self.body)
 
-            message = messaging.Message(
-                notification=messaging.Notification(
-                    title=data["title"],
-                    body=data["body"],
-                ),
-                data=data,
-                android=messaging.AndroidConfig(
-                    ttl=datetime.timedelta(seconds=ttl),
-                    priority="normal",
-                    notification=messaging.AndroidNotification(
-                        color="#E62272",
-                        sound="default",
-                    ),
+            notification = messaging.Notification(
+                title=data["title"],
+                body=data["body"],
+            )
+            android = messaging.AndroidConfig(
+                ttl=datetime.timedelta(seconds=ttl),
+                priority="normal",
+                notification=messaging.AndroidNotification(
+                    color="#E62272",
+                    sound="default",
                 ),
             )
 
-            for reg_id in reg_ids:
-                message.token = reg_id
+            unregistered_ids = []
+            invalid_ids = []
+            start = perf_counter()
+            for i in range(0, len(reg_ids), MULTICAST_BATCH_SIZE):
+                batch = reg_ids[i : i + MULTICAST_BATCH_SIZE]
+                message = messaging.MulticastMessage(
+                    tokens=batch, notification=notification, data=data, android=android
+                )
                 try:
-                    messaging.send(message, dry_run=kwargs.get("dry_run", False))
-                    success_total += 1
-                except messaging.UnregisteredError:
-                    failure_total += 1
-                    Device.objects.filter(registration_id=reg_id).delete()
-                except exceptions.InvalidArgumentError:
-                    failure_total += 1
-                    Device.objects.filter(registration_id=reg_id).update(active=False)
+                    response = messaging.send_each_for_multicast(
+                        message, dry_run=kwargs.get("dry_run", False)
+                    )
                 except exceptions.FirebaseError:
-                    failure_total += 1
+                    logger.exception("Failed to send push notification %d", self.pk)
+                    failure_total += len(batch)
+                    continue
+
+                success_total += response.success_count
+                failure_total += response.failure_count
+                for reg_id, result in zip(batch, response.responses):
+                    if isinstance(result.exception, messaging.UnregisteredError):
+                        unregistered_ids.append(reg_id)
+                    elif isinstance(result.exception, exceptions.InvalidArgumentError):
+                        invalid_ids.append(reg_id)
+            duration = perf_counter() - start
+
+            if unregistered_ids:
+                Device.objects.filter(registration_id__in=unregistered_ids).delete()
+            if invalid_ids:
+                Device.objects.filter(registration_id__in=invalid_ids).update(
+                    active=False
+                )
+
+            logger.info(
+                "Sent push notification %d to %d devices in %.2fs (%.0f devices/s): "
+                "%d succeeded, %d failed, %d unregistered, %d deactivated",
+                self.pk,
+                len(reg_ids),
+                duration,
+                len(reg_ids) / duration if duration else 0,
+                success_total,
+                failure_total,
+                len(unregistered_ids),
+                len(invalid_ids),
+            )
 
             self.sent = timezone.now()
             self.success = success_total
@@ -195,6 +231,13 @@ class ScheduledMessage(Message):
     time = models.DateTimeField()
     executed = models.DateTimeField(null=True)
 
+    @property
+    def lag(self):
+        """Return how long after its scheduled time the message was sent."""
+        if self.sent is None:
+            return None
+        return max(self.sent - self.time, datetime.timedelta(0))
+
 
 class NewAlbumMessageManager(models.Manager):
     """Returns new album messages only."""
@@ -1,6 +1,8 @@
 import logging
 from datetime import timedelta
 
+from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
 
 from celery import shared_task
@@ -9,20 +11,76 @@ from pushnotifications.models import ScheduledMessage
 
 logger = logging.getLogger(__name__)
 
+# Claimed messages that have not been sent after this time, for example because
+# the worker sending them died, are claimed again. Messages that are still being
+# sent are locked, and are not claimed again.
+CLAIM_TIMEOUT = timedelta(minutes=30)
+
 
 @shared_task
 def send_scheduled_messages(interval_time):
-    """Send a scheduled push notifications."""
+    """Dispatch the scheduled push notifications that are due.
+
+    Due messages are claimed by marking them as executed, while locking them
+    with `skip_locked`, so multiple dispatchers never claim the same message.
+    Every claimed message is sent in a separate task, so a slow broadcast does
+    not hold up the other messages.
+    """
     interval = int(interval_time)
     now = timezone.now()
 
-    logger.info("Start sending scheduled notifications")
+    with transaction.atomic():
+        messages = list(
+            ScheduledMessage.objects.select_for_update(skip_locked=True, of=("self",))
+            .filter(
+                Q(executed__isnull=True) | Q(executed__lt=now - CLAIM_TIMEOUT),
+                sent__isnull=True,
+                time__lte=now + timedelta(seconds=interval / 2),
+            )
+            .order_by("time")
+            .only("pk", "time")
+        )
+        ScheduledMessage.objects.filter(pk__in=[m.pk for m in messages]).update(
+            executed=now
+        )
+
+        for message in messages:
+            transaction.on_commit(
+                lambda pk=message.pk: send_scheduled_message.delay(pk)
+            )
+
+    if messages:
+        logger.info(
+            "Dispatched %d scheduled notifications, the oldest was due %.0fs ago",
+            len(messages),
+            max((now - messages[0].time).total_seconds(), 0),
+        )
+
+
+@shared_task
+def send_scheduled_message(pk):
+    """Send a claimed scheduled push notification.
+
+    The message is locked while it is sent, so the dispatcher does not claim it
+    again when sending takes longer than `CLAIM_TIMEOUT`, and another task for
+    the same message waits for this one, and then finds it sent.
+    """
+    with transaction.atomic():
+        locked = ScheduledMessage.objects.select_for_update(of=("self",)).filter(pk=pk)
+        if not list(locked.values_list("pk", flat=True)):
+            # The message was deleted after it was claimed, e.g. with its event.
+            return
+
+        # Fetched after the lock is acquired, to see if a previous task sent it.
+        message = ScheduledMessage.objects.get(pk=pk)
+        if message.sent is not None:
+            return
 
-    before_time = timezone.now() + timedelta(seconds=interval / 2)
-    messages = ScheduledMessage.objects.filter(sent__isnull=True, time__lte=before_time)
+        logger.info("Sending push notification %d", message.pk)
+        message.send()
 
-    for message in messages:
-        if (timezone.now() - now).seconds < interval:
-            logger.info("Sending push notification %d", message.pk)
-            message.executed = timezone.now()
-            message.send()
+    logger.info(
+        "Sent push notification %d, %.0fs after it was scheduled",
+        message.pk,
+        message.lag.total_seconds(),
+    )
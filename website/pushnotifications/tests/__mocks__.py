@@ -0,0 +1,24 @@
+from firebase_admin import messaging
+
+
+class FakeMessaging:
+    """A stub for the multicast sending of `firebase_admin.messaging`.
+
+    Sending to a token in `errors` fails with the corresponding exception,
+    all other tokens succeed. The sent multicast messages are recorded.
+    """
+
+    def __init__(self, errors=None):
+        self.errors = errors or {}
+        self.sent = []
+
+    def send_each_for_multicast(self, multicast_message, dry_run=False):
+        self.sent.append(multicast_message)
+        return messaging.BatchResponse(
+            [
+                messaging.SendResponse(None, self.errors[token])
+                if token in self.errors
+                else messaging.SendResponse({"name": f"messages/{token}"}, None)
+                for token in multicast_message.tokens
+            ]
+        )
@@ -0,0 +1,80 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from firebase_admin import exceptions, messaging
+
+from members.models import Member
+from pushnotifications.models import Category, Device, Message
+from pushnotifications.tests.__mocks__ import FakeMessaging
+
+
+class MessageSendTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        members = Member.objects.bulk_create(
+            Member(username=f"user{i}") for i in range(3)
+        )
+        cls.devices = Device.objects.bulk_create(
+            Device(registration_id=f"token{i}", type="android", user=members[i % 3])
+            for i in range(1200)
+        )
+        Device.receive_category.through.objects.bulk_create(
+            Device.receive_category.through(device=device, category_id=Category.GENERAL)
+            for device in cls.devices
+        )
+        cls.message = Message.objects.create(title="title", body="body")
+        cls.message.users.set(members)
+
+    def test_send_in_multicast_batches(self):
+        fake = FakeMessaging(
+            errors={
+                "token1": messaging.UnregisteredError("unregistered"),
+                "token2": exceptions.InvalidArgumentError("invalid"),
+                "token3": exceptions.UnavailableError("unavailable"),
+                "token700": messaging.UnregisteredError("unregistered"),
+            }
+        )
+
+        with (
+            mock.patch(
+                "pushnotifications.models.messaging.send_each_for_multicast",
+                fake.send_each_for_multicast,
+            ),
+            self.assertNumQueries(6),
+        ):
+            self.message.send()
+
+        self.assertEqual([len(m.tokens) for m in fake.sent], [500, 500, 200])
+        self.assertEqual(
+            sorted(token for m in fake.sent for token in m.tokens),
+            sorted(device.registration_id for device in self.devices),
+        )
+        self.assertEqual(fake.sent[0].data["title"], "title")
+
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.success, 1196)
+        self.assertEqual(self.message.failure, 4)
+        self.assertFalse(
+            Device.objects.filter(registration_id__in=["token1", "token700"]).exists()
+        )
+        self.assertFalse(Device.objects.get(registration_id="token2").active)
+        self.assertTrue(Device.objects.get(registration_id="token3").active)
+
+    def test_failing_batch_counts_as_failures(self):
+        def send_each_for_multicast(multicast_message, dry_run=False):
+            raise exceptions.UnavailableError("unavailable")
+
+        with (
+            mock.patch(
+                "pushnotifications.models.messaging.send_each_for_multicast",
+                send_each_for_multicast,
+            ),
+            self.assertLogs("pushnotifications.models", "ERROR"),
+        ):
+            self.message.send()
+
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.success, 0)
+        self.assertEqual(self.message.failure, 1200)
+        self.assertEqual(Device.objects.filter(active=True).count(), 1200)
@@ -0,0 +1,83 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from freezegun import freeze_time
+
+from pushnotifications.models import ScheduledMessage
+from pushnotifications.tasks import send_scheduled_message, send_scheduled_messages
+from pushnotifications.tests.__mocks__ import FakeMessaging
+
+
+@freeze_time("2024-01-01 12:00:00")
+class SendScheduledMessagesTest(TestCase):
+    def _create_message(self, title, time, **kwargs):
+        return ScheduledMessage.objects.create(
+            title=title, body="body", time=time, **kwargs
+        )
+
+    def test_sends_due_messages(self):
+        now = timezone.now()
+        due = self._create_message("due", now - timedelta(minutes=5))
+        almost_due = self._create_message("almost due", now + timedelta(seconds=30))
+        future = self._create_message("future", now + timedelta(minutes=5))
+        claimed = self._create_message(
+            "claimed", now - timedelta(minutes=5), executed=now - timedelta(minutes=1)
+        )
+        stale = self._create_message(
+            "stale", now - timedelta(hours=1), executed=now - timedelta(minutes=45)
+        )
+
+        fake = FakeMessaging()
+        with (
+            mock.patch(
+                "pushnotifications.models.messaging.send_each_for_multicast",
+                fake.send_each_for_multicast,
+            ),
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            send_scheduled_messages(120)
+
+        for message in (due, almost_due, stale):
+            message.refresh_from_db()
+            self.assertEqual(message.executed, now)
+            self.assertEqual(message.sent, now)
+
+        for message in (future, claimed):
+            message.refresh_from_db()
+            self.assertIsNone(message.sent)
+        self.assertIsNone(future.executed)
+
+        self.assertEqual(due.lag, timedelta(minutes=5))
+        self.assertEqual(almost_due.lag, timedelta(0))
+        self.assertEqual(stale.lag, timedelta(hours=1))
+
+    def test_does_not_send_twice(self):
+        message = self._create_message("due", timezone.now())
+
+        with (
+            mock.patch("pushnotifications.models.Message.send") as send,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            send_scheduled_messages(120)
+            send_scheduled_messages(120)
+
+        send.assert_called_once()
+        message.refresh_from_db()
+        self.assertIsNotNone(message.executed)
+
+    def test_skips_deleted_and_sent_messages(self):
+        sent = self._create_message(
+            "sent", timezone.now(), executed=timezone.now(), sent=timezone.now()
+        )
+        deleted = self._create_message("deleted", timezone.now())
+        deleted_pk = deleted.pk
+        deleted.delete()
+
+        with mock.patch("pushnotifications.models.Message.send") as send:
+            send_scheduled_message(sent.pk)
+            send_scheduled_message(deleted_pk)
+
+        send.assert_not_called()
@@ -17,6 +17,7 @@ from localflavor.generic.models import BICField, IBANField
 
 from members.models import Membership, Profile
 from payments.models import PaymentAmountField
+from payments.payables import PayableSnapshotMixin
 from utils import countries
 
 
@@ -147,7 +148,7 @@ class Entry(models.Model):
         )
 
 
-class Registration(Entry):
+class Registration(PayableSnapshotMixin, Entry):
     """Describes a new registration for the association."""
 
     # Payment field is duplicated between Registration and Renewal to allow
@@ -478,7 +479,7 @@ class Registration(Entry):
         verbose_name_plural = _("registrations")
 
 
-class Renewal(Entry):
+class Renewal(PayableSnapshotMixin, Entry):
     """Describes a renewal for the association membership."""
 
     # Payment field is duplicated between Registration and Renewal to allow
@@ -16,6 +16,7 @@ from queryable_properties.properties import AnnotationProperty
 
 from members.models import Member
 from payments.models import Payment, PaymentAmountField
+from payments.payables import PayableSnapshotMixin
 from sales.models.product import ProductListItem
 from sales.models.shift import Shift
 
@@ -24,7 +25,7 @@ def default_order_shift():
     return Shift.objects.filter(active=True).only("pk").first()
 
 
-class Order(models.Model):
+class Order(PayableSnapshotMixin, models.Model):
     objects = QueryablePropertiesManager()
 
     class Meta:
@@ -204,7 +205,7 @@ class Order(models.Model):
         return f"Order {self.id} ({self.shift})"
 
 
-class OrderItem(models.Model):
+class OrderItem(PayableSnapshotMixin, models.Model):
     class Meta:
         verbose_name = "item"
         verbose_name_plural = "items"
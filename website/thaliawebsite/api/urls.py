@@ -22,6 +22,10 @@ urlpatterns = [
                         namespace="facedetection",
                     ),
                 ),
+                path(
+                    "zipper/",
+                    include("thaliawebsite.api.zipper.urls", namespace="zipper"),
+                ),
                 path(
                     "docs",
                     TemplateView.as_view(
@@ -0,0 +1,7 @@
+from django.urls import include, path
+
+app_name = "thaliawebsite"
+
+urlpatterns = [
+    path("", include("photos.api.zipper.urls")),
+]
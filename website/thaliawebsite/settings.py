@@ -183,6 +183,15 @@ FACEDETECTION_LAMBDA_BATCH_SIZE = int(
     os.environ.get("FACEDETECTION_LAMBDA_BATCH_SIZE", 20)
 )
 
+# Engine used to match face encodings, see facedetection/matching.py.
+FACEDETECTION_MATCHING_ENGINE = os.environ.get(
+    "FACEDETECTION_MATCHING_ENGINE", "facedetection.matching.NumpyMatchingEngine"
+)
+
+# Optional file in which the index of photo face encodings is persisted by the
+# `rebuild_facedetection_index` management command, to speed up loading it.
+FACEDETECTION_MATCHING_INDEX_PATH = os.environ.get("FACEDETECTION_MATCHING_INDEX_PATH")
+
 # The scheme the app uses for oauth redirection
 APP_OAUTH_SCHEME = os.environ.get("APP_OAUTH_SCHEME", "nu.thalia")
 
@@ -263,6 +272,8 @@ SENDFILE_BACKEND = setting(
     development="django_sendfile.backends.development",
     production="django_sendfile.backends.nginx",
 )
+# Private media views check whether files exist (cached) themselves.
+SENDFILE_CHECK_FILE_EXISTS = False
 
 PRIVATE_MEDIA_LOCATION = ""
 PUBLIC_MEDIA_LOCATION = "public"
@@ -367,6 +378,11 @@ CELERY_BEAT_SCHEDULE = {
         "task": "moneybirdsynchronization.tasks.synchronize_moneybird",
         "schedule": crontab(minute=30, hour=1),
     },
+    "synchronize_moneybird_changes": {
+        "task": "moneybirdsynchronization.tasks.synchronize_moneybird",
+        "schedule": crontab(minute="*/15"),
+        "kwargs": {"full": False},
+    },
     "sendpromooverviewweekly": {
         "task": "promotion.tasks.promo_update_weekly",
         "schedule": crontab(minute=0, hour=8, day_of_week=1),
@@ -375,6 +391,10 @@ CELERY_BEAT_SCHEDULE = {
         "task": "promotion.tasks.promo_update_daily",
         "schedule": crontab(minute=0, hour=8),
     },
+    "refreshphotolikes": {
+        "task": "photos.tasks.refresh_photo_likes",
+        "schedule": crontab(minute=15),
+    },
     "facedetectlambda": {
         "task": "facedetection.tasks.trigger_facedetect_lambda",
         "schedule": crontab(minute=0, hour=1),
@@ -383,6 +403,10 @@ CELERY_BEAT_SCHEDULE = {
         "task": "payments.tasks.revoke_mandates",
         "schedule": crontab(minute=0, hour=1),
     },
+    "checktpayledgers": {
+        "task": "payments.tasks.check_tpay_ledgers",
+        "schedule": crontab(minute=30, hour=2),
+    },
     "inforequest": {
         "task": "members.tasks.info_request",
         "schedule": crontab(minute=0, hour=6, day_of_month=15, month_of_year=2),
@@ -1103,6 +1127,23 @@ THUMBNAILS = {
 
 THUMBNAIL_SIZES = set(THUMBNAILS["SIZES"].keys())
 
+# The number of threads that resize photos while an album upload is processed.
+PHOTO_UPLOAD_WORKERS = int(os.environ.get("PHOTO_UPLOAD_WORKERS", 4))
+
+# Uploaded photos of which the perceptual hash differs in at most this many bits
+# from that of another photo are skipped as near-duplicates, e.g. re-encoded
+# copies. Exact duplicates are always skipped. Leave empty to only skip those.
+PHOTO_UPLOAD_SIMILARITY_THRESHOLD = (
+    int(os.environ["PHOTO_UPLOAD_SIMILARITY_THRESHOLD"])
+    if os.environ.get("PHOTO_UPLOAD_SIMILARITY_THRESHOLD")
+    else None
+)
+
+# The number of album zip files that each server process streams at the same time.
+# Every download occupies a thread for as long as it takes, so keep this below
+# the number of threads per process.
+PHOTO_ALBUM_DOWNLOADS = int(os.environ.get("PHOTO_ALBUM_DOWNLOADS", 1))
+
 # TinyMCE config
 TINYMCE_DEFAULT_CONFIG = {
     "max_height": 500,
@@ -1179,6 +1220,9 @@ MONEYBIRD_API_KEY = os.environ.get("MONEYBIRD_API_KEY")
 
 MONEYBIRD_SYNC_ENABLED = MONEYBIRD_ADMINISTRATION_ID and MONEYBIRD_API_KEY
 
+# The number of objects that are pushed to Moneybird concurrently while synchronizing.
+MONEYBIRD_SYNC_WORKERS = int(os.environ.get("MONEYBIRD_SYNC_WORKERS", 4))
+
 MONEYBIRD_MEMBER_PK_CUSTOM_FIELD_ID: int | None = (
     int(os.environ.get("MONEYBIRD_MEMBER_PK_CUSTOM_FIELD_ID"))
     if os.environ.get("MONEYBIRD_MEMBER_PK_CUSTOM_FIELD_ID")
@@ -64,6 +64,14 @@ class PrivateS3Storage(S3RenameMixin, S3Boto3Storage):
 
         return super().url(name, params, expire=expire_seconds)
 
+    def url_lifetime(self, expire_seconds=None):
+        """Return the number of seconds for which a url from `url` is valid.
+
+        This makes `utils.media.services.get_media_url` cache the urls, as
+        signing them for CloudFront is relatively slow.
+        """
+        return expire_seconds or self.querystring_expire
+
 
 class StaticS3Storage(S3ManifestStaticStorage):
     location = settings.STATICFILES_LOCATION
@@ -0,0 +1,55 @@
+"""Streaming CSV exports, which never hold the complete file in memory."""
+
+import csv
+import tempfile
+from secrets import token_hex
+
+from django.core.files import File
+from django.core.files.storage import DefaultStorage
+from django.http import StreamingHttpResponse
+
+# The number of rows that are fetched from the database at once by exports.
+EXPORT_CHUNK_SIZE = 2000
+
+
+class _Echo:
+    """A file-like object of which `write` returns what is written."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(headers, rows):
+    """Yield the lines of a CSV file."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(headers)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def streaming_csv_response(filename, headers, rows) -> StreamingHttpResponse:
+    """Return a response that streams a CSV file as it is being generated.
+
+    :param filename: The name of the downloaded file.
+    :param headers: The column names.
+    :param rows: An iterable of rows, which is consumed while the response is sent.
+    """
+    response = StreamingHttpResponse(csv_lines(headers, rows), content_type="text/csv")
+    response["Content-Disposition"] = f'attachment;filename="{filename}"'
+    return response
+
+
+def save_csv(prefix, headers, rows) -> str:
+    """Write a CSV file to the private storage, and return its name.
+
+    The file gets an unguessable name, which starts with `exports/<prefix>-`.
+    Exports are not referenced by any model, so they are eventually removed
+    by the `remove_unused_media` command.
+    """
+    with tempfile.TemporaryFile() as file:
+        for line in csv_lines(headers, rows):
+            file.write(line.encode())
+        file.seek(0)
+        return DefaultStorage().save(
+            f"exports/{prefix}-{token_hex(16)}.csv", File(file)
+        )
@@ -0,0 +1,65 @@
+from time import perf_counter
+
+from django.core.cache import cache
+from django.core.files.storage import DefaultStorage
+from django.core.management.base import BaseCommand
+
+from utils.media import services
+
+
+class Command(BaseCommand):
+    """Measure how fast urls of private media files are generated.
+
+    Urls are generated for a number of (not necessarily existing) files in the
+    default storage: signed directly by the storage, through `get_media_url`
+    with an empty cache, and with only the shared cache filled. Only storages
+    with a `url_lifetime`, i.e. S3, use the cache.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--files", type=int, default=500, help="Number of distinct files"
+        )
+        parser.add_argument(
+            "--rounds",
+            type=int,
+            default=4,
+            help="Number of times a url is generated for each file",
+        )
+
+    def handle(self, *args, **options):
+        names = [f"benchmark/{i}.jpg" for i in range(options["files"])]
+        rounds = options["rounds"]
+        storage = DefaultStorage()
+
+        def sign_urls():
+            for __ in range(rounds):
+                for name in names:
+                    storage.url(name)
+
+        def get_urls(rounds):
+            for __ in range(rounds):
+                for name in names:
+                    services.get_media_url(name)
+
+        self._time("Signed by the storage", sign_urls, len(names) * rounds)
+
+        services._local_url_cache.clear()
+        self._time("Cached", lambda: get_urls(rounds), len(names) * rounds)
+
+        keys = list(services._local_url_cache.keys())
+        services._local_url_cache.clear()
+        self._time("Shared cache only", lambda: get_urls(1), len(names))
+
+        cache.delete_many(keys)
+        services._local_url_cache.clear()
+
+    def _time(self, label, function, count):
+        services.url_cache_stats.clear()
+        start = perf_counter()
+        function()
+        duration = perf_counter() - start
+        self.stdout.write(
+            f"{label}: {count} urls in {duration:.3f}s, {count / duration:.0f} urls/s "
+            f"{dict(services.url_cache_stats)}"
+        )
@@ -0,0 +1,100 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from thumbnails.fields import ImageField
+
+from utils.media.services import generate_thumbnails
+
+
+def get_thumbnail_fields(model_labels=None):
+    """Get all thumbnail ImageFields, optionally of only some models."""
+    if model_labels:
+        models = [apps.get_model(label) for label in model_labels]
+    else:
+        models = apps.get_models()
+
+    return [
+        field
+        for model in models
+        for field in model._meta.get_fields()
+        if isinstance(field, ImageField)
+    ]
+
+
+class Command(BaseCommand):
+    help = "Generate missing thumbnails of all images"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model",
+            dest="models",
+            action="append",
+            help="Only generate thumbnails for this model, e.g. photos.Photo",
+        )
+        parser.add_argument(
+            "--size",
+            dest="sizes",
+            action="append",
+            choices=sorted(settings.THUMBNAIL_SIZES),
+            help="The sizes to generate, instead of the pregenerated sizes of each field",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="The number of threads that generate thumbnails",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            default=False,
+            help="Also regenerate thumbnails that exist already",
+        )
+
+    def _generate(self, model_label, field_name, name, sizes, force):
+        try:
+            return generate_thumbnails(model_label, field_name, name, sizes, force)
+        except Exception as e:
+            self.stderr.write(f"Failed to generate thumbnails of {name}: {e}")
+            return []
+        finally:
+            if self.workers > 1:
+                # Each worker thread has its own database connection.
+                connection.close()
+
+    def handle(self, *args, **options):
+        self.workers = options["workers"]
+
+        jobs = []
+        for field in get_thumbnail_fields(options["models"]):
+            sizes = options["sizes"] or field.pregenerated_sizes
+            if not sizes:
+                continue
+
+            names = (
+                field.model._base_manager.exclude(**{field.name: ""})
+                .exclude(**{f"{field.name}__isnull": True})
+                .values_list(field.name, flat=True)
+                .distinct()
+            )
+            jobs += [
+                (field.model._meta.label, field.name, name, sizes, options["force"])
+                for name in names
+            ]
+
+        self.stdout.write(f"Checking the thumbnails of {len(jobs)} images.")
+
+        if self.workers > 1:
+            with ThreadPoolExecutor(self.workers) as executor:
+                results = list(executor.map(lambda job: self._generate(*job), jobs))
+        else:
+            results = [self._generate(*job) for job in jobs]
+
+        self.stdout.write(
+            f"Generated {sum(map(len, results))} thumbnails "
+            f"of {sum(map(bool, results))} images."
+        )
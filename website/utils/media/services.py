@@ -1,8 +1,13 @@
+import hashlib
 import os
+import time
+from collections import Counter
 from functools import partial
 from secrets import token_hex
 
+from django.apps import apps
 from django.conf import settings
+from django.core.cache import cache
 from django.core.files.storage import DefaultStorage
 from django.db.models.fields.files import FieldFile, ImageFieldFile
 
@@ -10,6 +15,9 @@ from thumbnails.backends.metadata import ImageMeta
 from thumbnails.fields import fetch_thumbnails as fetch_thumbnails_redis
 from thumbnails.files import ThumbnailedImageFile
 from thumbnails.images import Thumbnail
+from thumbnails.images import create as create_thumbnail
+from thumbnails.images import delete as delete_thumbnail
+from thumbnails.images import get as get_existing_thumbnail
 from thumbnails.models import ThumbnailMeta
 
 
@@ -52,7 +60,15 @@ def get_media_url(
         storage = file.storage
         file_name = file.name
 
-    url = storage.url(file_name, attachment, expire_seconds)
+    url_lifetime = getattr(storage, "url_lifetime", None)
+    if url_lifetime is not None:
+        # Storages that are slow to sign urls tell how long they are valid,
+        # so that they can be reused.
+        url = _get_cached_url(
+            storage, file_name, attachment, expire_seconds, url_lifetime(expire_seconds)
+        )
+    else:
+        url = storage.url(file_name, attachment, expire_seconds)
 
     # If the url is not absolute, but we want an absolute url, add the base url.
     if absolute_url and not url.startswith(("http://", "https://")):
@@ -61,6 +77,61 @@ def get_media_url(
     return url
 
 
+# A cached signed url is only used while it stays valid for at least this long.
+SIGNED_URL_MIN_VALIDITY = 15 * 60
+
+# The maximum number of signed urls that are cached in each process.
+LOCAL_URL_CACHE_SIZE = 10000
+
+_local_url_cache = {}
+
+# The numbers of signed urls found in the process's cache ("local_hits"), found
+# in the shared cache ("shared_hits") and signed ("misses") by this process.
+url_cache_stats = Counter()
+
+
+def _get_cached_url(storage, name, attachment, expire_seconds, lifetime):
+    """Get a signed url of a file, from the cache if possible.
+
+    Time is divided into buckets of `lifetime - SIGNED_URL_MIN_VALIDITY` seconds.
+    A url is cached for the rest of the bucket in which it is signed, so it is
+    still valid for at least SIGNED_URL_MIN_VALIDITY seconds when it is used.
+    """
+    bucket_size = lifetime - SIGNED_URL_MIN_VALIDITY
+    if bucket_size <= 0:
+        url_cache_stats["misses"] += 1
+        return storage.url(name, attachment, expire_seconds)
+
+    now = time.time()
+    bucket = int(now // bucket_size)
+    storage_class = f"{storage.__class__.__module__}.{storage.__class__.__name__}"
+    key = (
+        "signed_url_"
+        + hashlib.sha1(
+            f"{storage_class}:{name}:{attachment}:{expire_seconds}:{bucket}".encode()
+        ).hexdigest()
+    )
+
+    url = _local_url_cache.get(key)
+    if url is not None:
+        url_cache_stats["local_hits"] += 1
+        return url
+
+    url = cache.get(key)
+    if url is not None:
+        url_cache_stats["shared_hits"] += 1
+    else:
+        url_cache_stats["misses"] += 1
+        url = storage.url(name, attachment, expire_seconds)
+        cache.set(key, url, timeout=(bucket + 1) * bucket_size - now)
+
+    if len(_local_url_cache) >= LOCAL_URL_CACHE_SIZE:
+        # Most of these are from past buckets, so simply start over.
+        _local_url_cache.clear()
+    _local_url_cache[key] = url
+    return url
+
+
 def get_thumbnail_url(
     file,
     size: str,
@@ -74,14 +145,79 @@ def get_thumbnail_url(
     if isinstance(file, ThumbnailedImageFile):
         if not name.endswith(".svg"):
             if size in settings.THUMBNAIL_SIZES:
-                return get_media_url(
-                    getattr(file.thumbnails, size),
-                    absolute_url=absolute_url,
-                )
+                thumbnail = get_thumbnail(file, size)
+                # Until a missing thumbnail has been generated, fall back to the
+                # source image, instead of resizing it during the request.
+                if thumbnail is not None:
+                    return get_media_url(thumbnail, absolute_url=absolute_url)
 
     return get_media_url(file, absolute_url=absolute_url)
 
 
+def get_thumbnail(file: ThumbnailedImageFile, size: str) -> Thumbnail | None:
+    """Return a thumbnail of an image, or queue its generation if it does not exist.
+
+    Unlike `file.thumbnails.<size>`, this never generates a thumbnail in the
+    current process, but returns None until a celery task has generated it.
+    """
+    thumbnails = file.thumbnails
+    if thumbnails._thumbnails is None:
+        thumbnails._refresh_cache()
+
+    thumbnail = thumbnails._thumbnails.get(size)
+    if thumbnail is None:
+        queue_thumbnails(file, [size])
+    return thumbnail
+
+
+# How long a thumbnail is not queued again after it has been queued, so that
+# requests for it do not queue it over and over again, also if generating it fails.
+THUMBNAIL_QUEUE_TIMEOUT = 10 * 60
+
+
+def queue_thumbnails(file: ThumbnailedImageFile, sizes):
+    """Queue the generation of thumbnails of an image, unless they are queued already."""
+    from utils.tasks import generate_thumbnails
+
+    key = f"thumbnails_queued_{hashlib.sha1(file.name.encode()).hexdigest()}"
+    sizes = [
+        size
+        for size in sizes
+        if cache.add(f"{key}_{size}", True, timeout=THUMBNAIL_QUEUE_TIMEOUT)
+    ]
+    if sizes:
+        generate_thumbnails.delay(
+            file.field.model._meta.label, file.field.name, file.name, sizes
+        )
+
+
+def generate_thumbnails(
+    model_label: str, field_name: str, name: str, sizes, force: bool = False
+) -> list[str]:
+    """Generate the thumbnails of an image that do not exist yet.
+
+    :param model_label: The label of the model with the image field, e.g. `photos.Photo`.
+    :param field_name: The name of the image field, which has the storage and
+        metadata backend of the thumbnails.
+    :param name: The name of the source image.
+    :param sizes: The sizes to generate.
+    :param force: Whether to regenerate thumbnails that exist already.
+    :return: The sizes that were generated.
+    """
+    field = apps.get_model(model_label)._meta.get_field(field_name)
+    metadata_backend, storage = field.metadata_backend, field.storage_backend
+
+    generated = []
+    for size in sizes:
+        if get_existing_thumbnail(name, size, metadata_backend, storage) is not None:
+            if not force:
+                continue
+            delete_thumbnail(name, size, metadata_backend, storage)
+        create_thumbnail(name, size, metadata_backend, storage)
+        generated.append(size)
+    return generated
+
+
 def fetch_thumbnails(images: list, sizes=None):
     """Prefetches thumbnails from the database or redis efficiently.
 
@@ -106,7 +242,12 @@ def fetch_thumbnails(images: list, sizes=None):
         source__name__in=image_dict.keys()
     )
     if sizes:
-        thumbnails.filter(size__in=sizes)
+        thumbnails = thumbnails.filter(size__in=sizes)
+    else:
+        # Images without thumbnails have none, rather than unknown thumbnails
+        # that would be looked up again one by one.
+        for image in images:
+            image.thumbnails._thumbnails = {}
 
     for source_name, thumb_name, thumb_size in thumbnails.values_list(
         "source__name", "name", "size"
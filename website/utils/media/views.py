@@ -1,3 +1,4 @@
+import hashlib
 from datetime import timedelta
 
 from django.core import signing
@@ -6,24 +7,44 @@ from django.core.exceptions import PermissionDenied
 from django.core.signing import BadSignature
 from django.http import Http404
 from django.shortcuts import redirect
-from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from django.utils.module_loading import import_string
 
 from django_sendfile import sendfile
 
+# How long the modification time of a served file is cached.
+FILE_INFO_TIMEOUT = 60 * 60
 
-def get_thumb_modified_time(storage, path):
-    storage_value = cache.get(
-        f"thumbnails_{path}", timezone.make_aware(timezone.datetime.min)
+# How long it is cached that a file does not exist. This is shorter, since
+# the file might still be uploaded.
+MISSING_FILE_TIMEOUT = 60
+
+# How long browsers may reuse a served file before revalidating it.
+PRIVATE_MEDIA_MAX_AGE = 60 * 60
+
+
+def get_modified_time(storage, path):
+    """Get the modification time of a file as timestamp, or None if it does not exist.
+
+    The result is cached, also when the file does not exist, so repeated
+    requests for a file do not hit the storage.
+    """
+    storage_class = f"{storage.__class__.__module__}.{storage.__class__.__name__}"
+    key = (
+        "media_modified_" + hashlib.sha1(f"{storage_class}:{path}".encode()).hexdigest()
     )
-    if storage_value.timestamp() <= 0:
+
+    modified = cache.get(key)
+    if modified is None:
         try:
-            storage_value = storage.get_modified_time(path)
-            cache.set(f"thumbnails_{path}", storage_value, 60 * 60)
-        except:  # noqa: E722
-            # File probably does not exist
-            pass
-    return storage_value
+            modified = int(storage.get_modified_time(path).timestamp())
+            cache.set(key, modified, FILE_INFO_TIMEOUT)
+        except OSError:
+            # The file does not exist.
+            modified = False
+            cache.set(key, modified, MISSING_FILE_TIMEOUT)
+    return modified or None
 
 
 def _get_signature_info(request):
@@ -36,32 +57,57 @@ def _get_signature_info(request):
     raise PermissionDenied
 
 
+def _add_cache_headers(response, etag, modified):
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(modified)
+    patch_cache_control(response, private=True, max_age=PRIVATE_MEDIA_MAX_AGE)
+    return response
+
+
 def private_media(request, request_path):
     """Serve private media files.
 
+    The path in the signature is trusted, so the storage is never asked whether
+    the file exists. Only its (cached) modification time is used, to answer
+    conditional requests of browsers that have the file already.
+
     :param request: the request
     :return: the media file
     """
     # Get image information from signature
     # raises PermissionDenied if bad signature
     sig_info = _get_signature_info(request)
-    storage = import_string(sig_info["storage"])()
     serve_path = sig_info["serve_path"]
-
-    if not storage.exists(serve_path) or not serve_path == request_path:
-        # 404 if the file does not exist
+    if serve_path != request_path:
         raise Http404("Media not found.")
 
-    # Serve the file, or redirect to a signed bucket url in the case of S3
+    storage = import_string(sig_info["storage"])()
+
+    # Redirect to a signed bucket url in the case of S3,
+    # which answers a request for a missing file itself.
     if hasattr(storage, "bucket"):
-        serve_url = storage.url(sig_info["serve_path"])
+        serve_url = storage.url(serve_path)
         return redirect(
             f"{serve_url}",
             permanent=False,
         )
-    return sendfile(
-        request,
-        serve_path,
-        attachment=bool(sig_info.get("attachment", False)),
-        attachment_filename=sig_info.get("attachment", None),
+
+    modified = get_modified_time(storage, serve_path)
+    if modified is None:
+        # 404 if the file does not exist
+        raise Http404("Media not found.")
+
+    etag = quote_etag(
+        hashlib.sha1(
+            f"{serve_path}:{modified}:{sig_info.get('attachment')}".encode()
+        ).hexdigest()
     )
+    response = get_conditional_response(request, etag=etag, last_modified=modified)
+    if response is None:
+        response = sendfile(
+            request,
+            serve_path,
+            attachment=bool(sig_info.get("attachment", False)),
+            attachment_filename=sig_info.get("attachment", None),
+        )
+    return _add_cache_headers(response, etag, modified)
@@ -6,7 +6,7 @@ from hashlib import sha1
 
 from django.conf import settings
 from django.contrib.admin.models import LogEntry
-from django.core.mail import EmailMultiAlternatives
+from django.core.mail import EmailMultiAlternatives, get_connection
 from django.template import loader
 from django.template.defaultfilters import urlencode
 from django.templatetags.static import static
@@ -207,7 +207,7 @@ def overlaps(check, others, can_equal=True):
     return False
 
 
-def send_email(
+def create_email(
     to: list[str],
     subject: str,
     txt_template: str,
@@ -216,7 +216,7 @@ def send_email(
     bcc: list[str] | None = None,
     from_email: str | None = None,
     connection=None,
-) -> None:
+) -> EmailMultiAlternatives:
     txt_message = loader.render_to_string(txt_template, context)
 
     mail = EmailMultiAlternatives(
@@ -232,7 +232,43 @@ def send_email(
         html_message = loader.render_to_string(html_template, context)
         mail.attach_alternative(html_message, "text/html")
 
-    mail.send()
+    return mail
+
+
+def send_email(
+    to: list[str],
+    subject: str,
+    txt_template: str,
+    context: dict,
+    html_template: str | None = None,
+    bcc: list[str] | None = None,
+    from_email: str | None = None,
+    connection=None,
+) -> None:
+    create_email(
+        to, subject, txt_template, context, html_template, bcc, from_email, connection
+    ).send()
+
+
+# The number of emails that are sent in one session with the mail server.
+EMAIL_CHUNK_SIZE = 100
+
+
+def send_emails(messages: list[EmailMultiAlternatives], chunk_size=None) -> int:
+    """Send many emails, reusing a single connection to the mail server.
+
+    The emails are sent in chunks. The connection is reopened between chunks,
+    because mail servers limit the number of messages in a single session.
+
+    :return: the number of emails that were sent.
+    """
+    chunk_size = chunk_size or EMAIL_CHUNK_SIZE
+    connection = get_connection()
+    sent = 0
+    for i in range(0, len(messages), chunk_size):
+        with connection:
+            sent += connection.send_messages(messages[i : i + chunk_size]) or 0
+    return sent
 
 
 def minimise_logentries_data(dry_run=False):
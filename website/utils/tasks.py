@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from utils.media import services
+
+
+@shared_task
+def generate_thumbnails(model_label, field_name, name, sizes):
+    """Generate the missing thumbnails of an image, queued by `queue_thumbnails`."""
+    services.generate_thumbnails(model_label, field_name, name, sizes)
@@ -1,6 +1,25 @@
 import doctest
+import io
+import os
+from datetime import date
+from unittest import mock
 
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import DefaultStorage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from freezegun import freeze_time
+
+from photos.models import Album, Photo
 from utils import snippets
+from utils.media import services
+from utils.media.services import (
+    generate_thumbnails,
+    get_media_url,
+    get_thumbnail_url,
+)
 
 
 def load_tests(_loader, tests, _ignore):
@@ -8,3 +27,189 @@ def load_tests(_loader, tests, _ignore):
     # Adds the doctests in snippets
     tests.addTests(doctest.DocTestSuite(snippets))
     return tests
+
+
+@override_settings(SUSPEND_SIGNALS=True)
+class ThumbnailQueueTest(TestCase):
+    def setUp(self):
+        album = Album.objects.create(title="test", date=date(2023, 1, 1), slug="test")
+        storage = Photo._meta.get_field("file").storage
+        with open(
+            os.path.join(settings.BASE_DIR, "photos/fixtures/poker_1.jpg"), "rb"
+        ) as f:
+            name = storage.save("photos/test/photo.jpg", f)
+        self.photo = Photo.objects.create(album=album, file=name)
+        self.addCleanup(self.photo.file.delete, save=False)
+        cache.clear()
+
+    def _get_photo(self):
+        return Photo.objects.get(pk=self.photo.pk)
+
+    @freeze_time("2023-01-02 12:00:00")
+    def test_missing_thumbnail_is_queued(self):
+        with mock.patch("utils.tasks.generate_thumbnails.delay") as delay:
+            url = get_thumbnail_url(self._get_photo().file, "medium")
+            get_thumbnail_url(self._get_photo().file, "medium")
+
+        # The source image is used until the thumbnail has been generated.
+        self.assertEqual(url, get_media_url(self.photo.file))
+        delay.assert_called_once_with(
+            "photos.Photo", "file", self.photo.file.name, ["medium"]
+        )
+
+        self.assertEqual(
+            generate_thumbnails(
+                "photos.Photo", "file", self.photo.file.name, ["medium"]
+            ),
+            ["medium"],
+        )
+        self.assertEqual(
+            generate_thumbnails(
+                "photos.Photo", "file", self.photo.file.name, ["medium"]
+            ),
+            [],
+        )
+
+        with mock.patch("utils.tasks.generate_thumbnails.delay") as delay:
+            url = get_thumbnail_url(self._get_photo().file, "medium")
+        self.assertEqual(url, get_media_url(self._get_photo().file.thumbnails.medium))
+        self.assertIn("_medium.webp", url)
+        delay.assert_not_called()
+
+    def test_generate_thumbnails_command(self):
+        stdout = io.StringIO()
+        call_command(
+            "generate_thumbnails",
+            "--model=photos.Photo",
+            "--size=small",
+            "--size=medium",
+            "--workers=1",
+            stdout=stdout,
+        )
+        self.assertIn("Generated 2 thumbnails of 1 images.", stdout.getvalue())
+        self.assertEqual(
+            set(self._get_photo().file.thumbnails.all().keys()), {"small", "medium"}
+        )
+
+        stdout = io.StringIO()
+        call_command(
+            "generate_thumbnails", "--model=photos.Photo", "--workers=1", stdout=stdout
+        )
+        self.assertIn("Generated 2 thumbnails of 1 images.", stdout.getvalue())
+        self.assertEqual(
+            set(self._get_photo().file.thumbnails.all().keys()),
+            {"small", "medium", "photo_medium", "photo_large"},
+        )
+
+
+class FakeSigningStorage:
+    """A storage that signs urls by counting them."""
+
+    signed = 0
+
+    def url(self, name, attachment=False, expire_seconds=None):
+        FakeSigningStorage.signed += 1
+        return f"/media/{name}?signature={FakeSigningStorage.signed}"
+
+    def url_lifetime(self, expire_seconds=None):
+        return expire_seconds or 3600
+
+
+@mock.patch("utils.media.services.DefaultStorage", FakeSigningStorage)
+class SignedUrlCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        services._local_url_cache.clear()
+        services.url_cache_stats.clear()
+
+    def _at(self, timestamp):
+        """Pretend that it is `timestamp`, only for the url cache."""
+        return mock.patch(
+            "utils.media.services.time", **{"time.return_value": timestamp}
+        )
+
+    def test_urls_are_reused(self):
+        with self._at(3600 * 1000):
+            url = get_media_url("file.jpg")
+            self.assertEqual(get_media_url("file.jpg"), url)
+            self.assertNotEqual(get_media_url("file.jpg", attachment="a.jpg"), url)
+            self.assertNotEqual(get_media_url("other.jpg"), url)
+
+            services._local_url_cache.clear()
+            self.assertEqual(get_media_url("file.jpg"), url)
+
+        self.assertEqual(
+            services.url_cache_stats,
+            {"misses": 3, "local_hits": 1, "shared_hits": 1},
+        )
+
+    def test_urls_are_not_used_shortly_before_expiry(self):
+        # Urls are reused for 3600 - 15 * 60 = 2700 seconds.
+        with self._at(2700 * 1000):
+            url = get_media_url("file.jpg")
+        with self._at(2700 * 1001 - 1):
+            self.assertEqual(get_media_url("file.jpg"), url)
+        with self._at(2700 * 1001):
+            self.assertNotEqual(get_media_url("file.jpg"), url)
+
+    def test_short_lived_urls_are_not_cached(self):
+        url = get_media_url("file.jpg", expire_seconds=60)
+        self.assertNotEqual(get_media_url("file.jpg", expire_seconds=60), url)
+
+
+class PrivateMediaTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.storage = DefaultStorage()
+        self.name = self.storage.save("test/private.txt", io.BytesIO(b"private"))
+        self.addCleanup(self.storage.delete, self.name)
+        self.url = get_media_url(self.name)
+
+    def test_serve(self):
+        with mock.patch.object(
+            self.storage.__class__, "exists", side_effect=AssertionError
+        ):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"private")
+        self.assertIn("private", response["Cache-Control"])
+        self.assertIn("max-age", response["Cache-Control"])
+
+        response = self.client.get(
+            self.url, headers={"if-none-match": response["ETag"]}
+        )
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(
+            self.url, headers={"if-modified-since": response["Last-Modified"]}
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_modified_time_is_cached(self):
+        with mock.patch.object(
+            self.storage.__class__,
+            "get_modified_time",
+            wraps=self.storage.get_modified_time,
+        ) as get_modified_time:
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        get_modified_time.assert_called_once()
+
+    def test_missing_file(self):
+        url = get_media_url("test/missing.txt")
+        with mock.patch.object(
+            self.storage.__class__,
+            "get_modified_time",
+            wraps=self.storage.get_modified_time,
+        ) as get_modified_time:
+            self.assertEqual(self.client.get(url).status_code, 404)
+            self.assertEqual(self.client.get(url).status_code, 404)
+        get_modified_time.assert_called_once()
+
+    def test_bad_signature(self):
+        self.assertEqual(self.client.get(self.url[:-2]).status_code, 403)
+        path, signature = self.url.split("?")
+        response = self.client.get(
+            path.replace("private.txt", "other.txt") + "?" + signature
+        )
+        self.assertEqual(response.status_code, 404)